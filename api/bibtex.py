@@ -1,76 +1,103 @@
-import requests
-from openai import OpenAI
-import os
-from config import get_openai_api_key
+import logging
 
-os.environ["OPENAI_API_KEY"] = get_openai_api_key()
-client = OpenAI()
+from config import FETCH_TIMEOUT, LLM_TIMEOUT, BIBTEX_LLM_FALLBACK
+from api.concurrency import iter_fetch
+from api.llm import complete
+from api.prompts import fit
+from api.render import fragments, pane
+from api.local_bibtex import citation_keys, format_bibtex, missing_fields
+from api.metadata import get_bibtex_entries
+
+logger = logging.getLogger("research.bibtex")
 
 def format_bibtex_box(content):
-    html = f"""
-    <div style="border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;">
-        <h2>BibTeX References</h2>
-        {content}
-    </div>
-    """
-    return html
+    return pane(content, "BibTeX References")
 
-def get_bibtex(paper_ids, paper_title_map, papers=None):
-    """
-    For each paper in paper_ids, call the BibTeX endpoint to fetch the BibTeX reference,
-    then format the results in HTML so that each paper's BibTeX is displayed under its title.
+def bibtex_fragment(pid, paper_title, bibtex_text):
+    return str(fragments.render("reference.html", f"bibtex:{pid}", heading=f"BibTeX for {paper_title}", text=bibtex_text))
+
+def gpt_bibtex(paper):
+    """Asks GPT to write an entry; only used when BIBTEX_LLM_FALLBACK is enabled."""
+    details = f"""Title: {paper.get("title", "Unknown Title")}
+Year: {paper.get("year") or "Unknown"}
+Venue: {paper.get("venue") or paper.get("journal") or "Unknown"}
+PDF URL: {paper.get("pdf", "N/A")}
+External IDs: {paper.get("external_ids", {})}
+Authors: {", ".join(paper.get("authors", []))}"""
+    instructions = "\nPlease generate a BibTeX citation entry for the following paper information:\n\n"
+    closing = "\n\nEnsure it's well-structured and ready to be used in academic BibTeX format.\n"
+    # Authors go last, so a very long author list is what gets cut
+    prompt = instructions + fit("bibtex", details, instructions + closing) + closing
+    return complete("bibtex", prompt, timeout=LLM_TIMEOUT)
+
+def fetch_bibtex_html(pid, paper_title_map, papers=None, entries=None, keys=None):
     """
-    lookup_bibtex_url = "http://recommendpapers.xyz/api/bibtex"
-    if not paper_ids:
-        return "<div>No papers available.</div>"
+    Formats the BibTeX reference for a single paper as an HTML fragment under its
+    title. When the endpoint has no entry, one is built locally from the search
+    metadata; GPT is only asked if BIBTEX_LLM_FALLBACK is on and the metadata
+    lacks required fields.
 
-    all_bibtex_html = ""
-    for pid in paper_ids:
-        paper_title = paper_title_map.get(pid, pid)
-        url = f"{lookup_bibtex_url}?id=CorpusId:{pid}"
-        bibtex_text = ""
+    :param entries: Dict paper_id -> BibTeX from get_bibtex_entries (None values
+                    mean the endpoint had no entry).
+    :param keys: Dict paper_id -> citation key from citation_keys, so locally
+                 built entries of one export never share a key.
+    """
+    paper_title = paper_title_map.get(pid, pid)
+    key = (keys or {}).get(str(pid))
+    bibtex_text = (entries or {}).get(str(pid))
 
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            bibtex_results = data.get("papers", [])
-            if bibtex_results:
-                bibtex_text = bibtex_results[0].get("bibtex", "No BibTeX found.")
-            else:
-                raise Exception("BibTeX not found in API response")
+    if not bibtex_text:
+        matched = next((p for p in papers or [] if str(p.get("id")) == str(pid)), None)
+        if matched is None:
+            bibtex_text = f"❌ Error retrieving BibTeX for paper {pid}: BibTeX not found in API response"
+        elif BIBTEX_LLM_FALLBACK and missing_fields(matched):
+            try:
+                bibtex_text = gpt_bibtex(matched)
+            except Exception as gpt_e:
+                logger.warning("GPT BibTeX fallback failed for %s: %s", pid, gpt_e)
+                bibtex_text = format_bibtex(matched, key)
+        else:
+            bibtex_text = format_bibtex(matched, key)
 
-        except Exception as e:
-            # If papers info is available, try GPT fallback
-            if papers:
-                matched = next((p for p in papers if str(p.get("id")) == str(pid)), None)
-                if matched:
-                    try:
-                        prompt = f"""
-Please generate a BibTeX citation entry for the following paper information:
+    return bibtex_fragment(pid, paper_title, bibtex_text)
 
-Title: {matched.get("title", "Unknown Title")}
-Authors: {", ".join(matched.get("authors", []))}
-Citation Count: {matched.get("citations", 0)}
-PDF URL: {matched.get("pdf", "N/A")}
-External IDs: {matched.get("external_ids", {})}
+def get_bibtex(paper_ids, paper_title_map, papers=None, progress=None):
+    """
+    Fetch the BibTeX references for paper_ids in bulk (mapping paperIds to CorpusIds),
+    then format the results in HTML so that each paper's BibTeX is displayed under its title.
+    Missing entries are generated locally; opt-in GPT fallbacks run concurrently and keep
+    the original paper order.
 
-Ensure it's well-structured and ready to be used in academic BibTeX format.
-"""
-                        completion = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[{"role": "user", "content": prompt}]
-                        )
-                        bibtex_text = completion.choices[0].message.content
-                    except Exception as gpt_e:
-                        bibtex_text = f"❌ GPT Fallback failed: {str(gpt_e)}"
-                else:
-                    bibtex_text = f"❌ Error retrieving BibTeX for paper {pid}: {str(e)}"
-            else:
-                bibtex_text = f"❌ Error retrieving BibTeX for paper {pid}: {str(e)}"
+    :param progress: Optional callable (done, total, partial_html) called as each paper finishes.
+    """
+    if not paper_ids:
+        return "<div>No papers available.</div>"
 
-        # Append final output once per paper
-        bibtex_html = f"<h3>BibTeX for {paper_title}</h3><pre>{bibtex_text}</pre><hr>"
-        all_bibtex_html += bibtex_html
+    # One bulk lookup for the whole selection (usually already prefetched)
+    try:
+        entries = get_bibtex_entries(paper_ids, papers)
+    except Exception as e:
+        logger.warning("Bulk BibTeX lookup failed: %s", e)
+        entries = {}
+    # Keys for the entries built locally, made unique across this export
+    by_id = {str(paper.get("id")): paper for paper in papers or []}
+    keys = citation_keys([by_id[str(pid)] for pid in paper_ids if not entries.get(str(pid)) and str(pid) in by_id])
 
-    return format_bibtex_box(all_bibtex_html)
+    if not BIBTEX_LLM_FALLBACK:
+        # Everything left is local formatting, so there is nothing to parallelize
+        finished = ((index, fetch_bibtex_html(pid, paper_title_map, papers, entries, keys)) for index, pid in enumerate(paper_ids))
+    else:
+        finished = iter_fetch(
+            lambda pid: fetch_bibtex_html(pid, paper_title_map, papers, entries, keys),
+            paper_ids,
+            # GPT fallbacks can take much longer than the endpoint itself
+            timeout=FETCH_TIMEOUT + LLM_TIMEOUT,
+            on_error=lambda pid, e: bibtex_fragment(pid, paper_title_map.get(pid, pid), f"❌ Error retrieving BibTeX for paper {pid}: {str(e)}")
+        )
+    bibtex_html = [""] * len(paper_ids)
+    for done, (index, entry_html) in enumerate(finished, 1):
+        bibtex_html[index] = entry_html
+        if progress:
+            progress(done, len(paper_ids), format_bibtex_box("".join(bibtex_html)))
 
+    return format_bibtex_box("".join(bibtex_html))
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from api.concurrency import SingleFlight
+from api.serialization import dumps, loads
+from api.telemetry import metrics
+from config import CACHE_BACKEND, CACHE_PATH, CACHE_MAX_ENTRIES
+
+class LRUCache:
+    """In-process cache with per-entry TTLs and least-recently-used eviction."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    """
+    On-disk cache that survives restarts. Values are stored as JSON; once the
+    table grows past max_entries the least recently used rows are evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return False, None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return True, loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, dumps(value), now + ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+class ResponseCache:
+    """
+    Caches upstream responses per endpoint (namespace) with its own TTL.
+    Concurrent misses for the same key are coalesced into one upstream call,
+    and hits, misses and coalesced waits are counted per namespace.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LRUCache()
+        self._flight = SingleFlight()
+        self._async_calls = {}
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0})
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, counter):
+        with self._lock:
+            self._stats[namespace][counter] += 1
+        if counter == "coalesced":
+            metrics.inc("coalesced_calls_total", source=namespace)
+
+    def get(self, namespace, key):
+        """Returns (hit, value) for (namespace, key) without fetching on a miss."""
+        hit, value = self.backend.get(f"{namespace}:{key}")
+        self._count(namespace, "hits" if hit else "misses")
+        return hit, value
+
+    def set(self, namespace, key, value, ttl):
+        self.backend.set(f"{namespace}:{key}", value, ttl)
+
+    def contains(self, namespace, key):
+        """Checks for a cached value without touching the hit/miss counters (used by prefetching)."""
+        return self.backend.get(f"{namespace}:{key}")[0]
+
+    def get_or_fetch(self, namespace, key, fetch, ttl):
+        """
+        Returns the cached value for (namespace, key), calling fetch() on a miss.
+        Exceptions raised by fetch are not cached.
+        """
+        cache_key = f"{namespace}:{key}"
+        hit, value = self.backend.get(cache_key)
+        if hit:
+            self._count(namespace, "hits")
+            return value
+
+        def load():
+            value = fetch()
+            self.backend.set(cache_key, value, ttl)
+            return value
+
+        value, shared = self._flight.do(cache_key, load)
+        self._count(namespace, "coalesced" if shared else "misses")
+        return value
+
+    async def get_or_fetch_async(self, namespace, key, fetch, ttl):
+        """
+        asyncio variant of get_or_fetch where fetch() returns an awaitable.
+        Concurrent misses on the same event loop share one upstream call.
+        """
+        cache_key = f"{namespace}:{key}"
+        hit, value = self.backend.get(cache_key)
+        if hit:
+            self._count(namespace, "hits")
+            return value
+
+        async def load():
+            value = await fetch()
+            self.backend.set(cache_key, value, ttl)
+            return value
+
+        task = self._async_calls.get(cache_key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(load())
+            self._async_calls[cache_key] = task
+            task.add_done_callback(lambda _: self._async_calls.pop(cache_key, None))
+        self._count(namespace, "coalesced" if shared else "misses")
+        # Shield so one caller timing out does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """Returns {namespace: {"hits", "misses", "coalesced", "hit_rate"}}."""
+        with self._lock:
+            stats = {}
+            for namespace, counts in self._stats.items():
+                total = sum(counts.values())
+                saved = counts["hits"] + counts["coalesced"]
+                stats[namespace] = dict(counts, hit_rate=saved / total if total else 0.0)
+            return stats
+
+def create_backend(name=CACHE_BACKEND, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+    if name == "sqlite":
+        return SQLiteCache(path, max_entries)
+    if name == "memory":
+        return LRUCache(max_entries)
+    raise ValueError(f"Unknown cache backend: {name}")
+
+# Shared cache for paper search, citation and BibTeX responses
+response_cache = ResponseCache(create_backend())
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+from array import array
+
+from api.concurrency import fetch_all
+from api.http_client import upstream
+from api.render import fragments, join, message, pane, render
+from api.telemetry import span
+from config import (
+    CITATION_GRAPH_PATH,
+    CITATION_GRAPH_HOPS,
+    CITATION_GRAPH_FANOUT,
+    CITATION_GRAPH_MAX_NODES,
+    CITATION_GRAPH_RESULTS,
+)
+
+CITATIONS_PATH = "/api/lookup_citations"
+GRAPH_FIELDS = "title,authors,citationCount"
+
+class CitationGraph:
+    """
+    Every citation edge seen in lookup_citations responses, kept in SQLite and
+    loaded into memory on start. Paper IDs are mapped to compact integer node
+    IDs, and each node keeps an array of the nodes that cite it.
+
+    A node is "fetched" up to some limit once its citations were requested
+    with that limit, so expansions only ask the API for what is missing.
+    """
+
+    def __init__(self, path=CITATION_GRAPH_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.node_ids = {}   # paper id -> node
+        self.paper_ids = []  # node -> paper id
+        self.meta = []       # node -> (title, authors, citation count)
+        self.cited_by = []   # node -> array of citing nodes
+        self.fetched = {}    # node -> (limit requested, whether the API had no more)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS nodes (node INTEGER PRIMARY KEY, paper_id TEXT UNIQUE NOT NULL, "
+                "title TEXT, authors TEXT, citation_count INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS edges (citing INTEGER NOT NULL, cited INTEGER NOT NULL, "
+                "PRIMARY KEY (cited, citing)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fetched (node INTEGER PRIMARY KEY, lim INTEGER NOT NULL, exhausted INTEGER NOT NULL)"
+            )
+            for node, paper_id, title, authors, count in self._conn.execute(
+                "SELECT node, paper_id, title, authors, citation_count FROM nodes ORDER BY node"
+            ):
+                # Node numbers are dense and assigned in order, so list positions match
+                self.node_ids[paper_id] = node
+                self.paper_ids.append(paper_id)
+                self.meta.append((title, tuple(json.loads(authors or "[]")), count))
+                self.cited_by.append(array("i"))
+            for citing, cited in self._conn.execute("SELECT citing, cited FROM edges"):
+                self.cited_by[cited].append(citing)
+            for node, limit, exhausted in self._conn.execute("SELECT node, lim, exhausted FROM fetched"):
+                self.fetched[node] = (limit, bool(exhausted))
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def _node(self, paper_id, title=None, authors=None, citation_count=None):
+        """Returns the node for paper_id, adding it (or filling in missing metadata). Call with the lock held."""
+        node = self.node_ids.get(paper_id)
+        if node is None:
+            node = len(self.paper_ids)
+            self.node_ids[paper_id] = node
+            self.paper_ids.append(paper_id)
+            self.meta.append((title, tuple(authors or ()), citation_count))
+            self.cited_by.append(array("i"))
+            self._conn.execute(
+                "INSERT INTO nodes (node, paper_id, title, authors, citation_count) VALUES (?, ?, ?, ?, ?)",
+                (node, paper_id, title, json.dumps(list(authors or [])), citation_count)
+            )
+        elif title is not None and self.meta[node][0] is None:
+            self.meta[node] = (title, tuple(authors or ()), citation_count)
+            self._conn.execute(
+                "UPDATE nodes SET title = ?, authors = ?, citation_count = ? WHERE node = ?",
+                (title, json.dumps(list(authors or [])), citation_count, node)
+            )
+        return node
+
+    def add_citations(self, paper_id, data, offset=0, limit=None):
+        """
+        Records the citing papers in a lookup_citations response for paper_id.
+        A first page fetched with limit marks the paper as fetched up to it.
+        """
+        citations = data.get("citations") or []
+        with self._lock, self._conn:
+            cited = self._node(str(paper_id))
+            existing = set(self.cited_by[cited])
+            for citation in citations:
+                citing_paper = citation.get("citingPaper") or {}
+                citing_id = citing_paper.get("paperId")
+                if not citing_id:
+                    continue
+                citing = self._node(
+                    citing_id,
+                    citing_paper.get("title"),
+                    [author.get("name", "Unknown") for author in citing_paper.get("authors") or []],
+                    citing_paper.get("citationCount"),
+                )
+                if citing not in existing:
+                    existing.add(citing)
+                    self.cited_by[cited].append(citing)
+                    self._conn.execute("INSERT OR IGNORE INTO edges (citing, cited) VALUES (?, ?)", (citing, cited))
+            if offset == 0 and limit:
+                previous = self.fetched.get(cited, (0, False))[0]
+                if limit >= previous:
+                    self.fetched[cited] = (limit, len(citations) < limit)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO fetched (node, lim, exhausted) VALUES (?, ?, ?)",
+                        (cited, limit, int(len(citations) < limit))
+                    )
+
+    def needs_fetch(self, paper_id, limit):
+        node = self.node_ids.get(str(paper_id))
+        if node is None:
+            return True
+        fetched_limit, exhausted = self.fetched.get(node, (0, False))
+        return not exhausted and fetched_limit < limit
+
+    def citers(self, paper_id, limit=None):
+        """Paper IDs citing paper_id that are in the graph, at most limit of them."""
+        node = self.node_ids.get(str(paper_id))
+        if node is None:
+            return []
+        nodes = self.cited_by[node]
+        return [self.paper_ids[citing] for citing in (nodes[:limit] if limit else nodes)]
+
+    def describe(self, paper_id):
+        title, authors, citation_count = self.meta[self.node_ids[paper_id]]
+        return {"id": paper_id, "title": title or "Unknown Title", "authors": list(authors), "citations": citation_count or 0}
+
+def fetch_citation_edges(paper_id, limit, graph):
+    """Fetches up to limit citing papers of paper_id into the graph."""
+    data = upstream.get_json(CITATIONS_PATH, params={"id": paper_id, "offset": 0, "limit": limit, "fields": GRAPH_FIELDS})
+    graph.add_citations(paper_id, data, limit=limit)
+
+def expand(seed_ids, hops=CITATION_GRAPH_HOPS, fanout=CITATION_GRAPH_FANOUT,
+           max_nodes=CITATION_GRAPH_MAX_NODES, limit=CITATION_GRAPH_RESULTS, graph=None):
+    """
+    Breadth-first expansion along "cited by" edges from the seed papers, up to
+    hops levels, fanout citing papers per node and max_nodes papers in total.
+    Each level fetches the nodes the graph does not cover yet concurrently;
+    everything already stored costs no request.
+
+    Candidates (papers reached that are not seeds) are ranked by in-degree
+    within the expansion, i.e. how many of the explored papers they cite, and
+    then by their own citation count.
+
+    :return: Up to limit dicts with id, title, authors, citations and links.
+    """
+    graph = graph or get_citation_graph()
+    seeds = list(dict.fromkeys(str(pid) for pid in seed_ids))
+    with span("citation_graph") as current:
+        visited = set(seeds)
+        frontier = seeds
+        in_degree = {}
+        fetched = 0
+        for _ in range(hops):
+            missing = [pid for pid in frontier if graph.needs_fetch(pid, fanout)]
+            fetch_all(lambda pid: fetch_citation_edges(pid, fanout, graph), missing, on_error=lambda pid, e: None)
+            fetched += len(missing)
+
+            next_frontier = []
+            for pid in frontier:
+                for citing in graph.citers(pid, fanout):
+                    if citing in seeds:
+                        continue
+                    in_degree[citing] = in_degree.get(citing, 0) + 1
+                    if citing not in visited and len(visited) < max_nodes:
+                        visited.add(citing)
+                        next_frontier.append(citing)
+            frontier = next_frontier
+            if not frontier:
+                break
+        current.set(cache_hit=fetched == 0, fetched=fetched, nodes=len(visited))
+
+    ranked = sorted(
+        in_degree,
+        key=lambda pid: (in_degree[pid], graph.describe(pid)["citations"]),
+        reverse=True
+    )
+    return [dict(graph.describe(pid), links=in_degree[pid]) for pid in ranked[:limit]]
+
+def format_related_html(seed_ids, paper_title_map, related):
+    """Renders expand() results for the details pane."""
+    selected = ", ".join(paper_title_map.get(pid, pid) for pid in seed_ids)
+    papers = join(fragments.render("related.html", paper["id"], r=paper) for paper in related)
+    content = join([message(f"Explored from: {selected}"), papers or message("No citing papers found.")])
+    return pane(render("section.html", heading="Papers citing your selection", content=content))
+
+def get_related_papers(paper_ids, paper_title_map):
+    """Expands the citation graph around the selected papers and returns the ranked results as HTML."""
+    if not paper_ids:
+        return "<div>No papers available.</div>"
+    try:
+        related = expand(paper_ids)
+    except Exception as e:
+        return str(message(f"Error exploring the citation graph: {str(e)}"))
+    return format_related_html(paper_ids, paper_title_map, related)
+
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_citation_graph():
+    """Returns the shared graph, loading it from disk on first use."""
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = CitationGraph()
+        return _graph
@@ -1,18 +1,86 @@
-import requests
+from api.cache import response_cache
+from api.citation_graph import get_citation_graph
+from api.concurrency import fetch_all
+from api.http_client import upstream
+from api.render import fragments, join, message, pane, render
+from api.telemetry import span
+from config import CACHE_TTL_CITATIONS, CITATIONS_PAGE_SIZE
 
 def format_citations_box(content):
-    html = f"""
-    <div style="border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;">
-        <h2>Citations</h2>
-        {content}
-    </div>
+    return pane(content, "Citations")
+
+def fetch_citations(pid, offset=0):
+    """
+    Returns one page of the lookup_citations response (CITATIONS_PAGE_SIZE
+    citations starting at offset) for a single paper, cached per paper ID and
+    offset. Concurrent callers (e.g. a prefetch and a button click) share one
+    request.
     """
-    return html
+    params = {
+        "id": pid,
+        "offset": offset,
+        "limit": CITATIONS_PAGE_SIZE,
+        # What the citations view shows, plus citationCount for the citation graph
+        "fields": "contexts,title,authors,citationCount"
+    }
+
+    def fetch():
+        data = upstream.get_json("/api/lookup_citations", params=params)
+        # Keep the edges so citation graph expansions do not fetch them again
+        get_citation_graph().add_citations(pid, data, offset, CITATIONS_PAGE_SIZE)
+        return data
+
+    # The first page keeps the bare paper ID as its key, as prefetched
+    key = pid if offset == 0 else f"{pid}:{offset}"
+    with span("citations") as current:
+        current.set(cache_hit=response_cache.contains("citations", key))
+        return response_cache.get_or_fetch("citations", key, fetch, ttl=CACHE_TTL_CITATIONS)
+
+def next_citations_offset(data, offset):
+    """Offset of the next page of citations, or None when this page was the last."""
+    if "next" in data:
+        return data["next"]
+    count = len(data.get("citations", []))
+    return offset + count if count >= CITATIONS_PAGE_SIZE else None
+
+def format_citation(pid, citation):
+    """The cached fragment for one citation of paper pid (contexts differ per cited paper)."""
+    citing_id = (citation.get("citingPaper") or {}).get("paperId")
+    return fragments.render("citation.html", f"{pid}<-{citing_id}", c=citation)
+
+def citations_error(pid, e):
+    return message(f"Error retrieving citations for paper {pid}: {str(e)}", rule=True)
+
+def fetch_citations_page_html(pid, paper_title_map, offset=0):
+    """
+    Fetches one page of citations for a single paper. Returns the HTML fragment
+    and the offset of the next page (None when there are no more).
+    """
+    heading = "Citations" if offset == 0 else "More citations"
+    try:
+        data = fetch_citations(pid, offset)
+        citations = data.get("citations", [])
+        if citations:
+            content = join(format_citation(pid, citation) for citation in citations)
+        else:
+            content = message("No citations found." if offset == 0 else "No more citations.")
+        html = render("section.html", heading=f"{heading} for {paper_title_map.get(pid, pid)}", content=content, rule=True)
+        return str(html), next_citations_offset(data, offset)
+    except Exception as e:
+        return str(citations_error(pid, e)), offset
+
+def fetch_citations_html(pid, paper_title_map):
+    """
+    Fetches the first page of citations for a single paper and formats them as an HTML fragment.
+    """
+    citations_html, _ = fetch_citations_page_html(pid, paper_title_map)
+    return citations_html
 
 def get_citations(paper_ids, paper_title_map):
     """
     For each paper in paper_ids, call the lookup_citations endpoint
     to fetch 3 citations, and then format the results in HTML.
+    Lookups run concurrently and are returned in the original paper order.
     
     :param paper_ids: List of paper IDs (strings).
     :param paper_title_map: Dict mapping paper_id to paper title.
@@ -21,27 +89,31 @@ def get_citations(paper_ids, paper_title_map):
     if not paper_ids:
         return "<div>No papers available.</div>"
     
-    all_citations_html = ""
-    for pid in paper_ids:
-        paper_title = paper_title_map.get(pid, pid)
-        citations_html = f"<h3>Citations for {paper_title}</h3>"
-        url = f"http://recommendpapers.xyz/api/lookup_citations?id={pid}&offset=0&limit=3&fields=contexts,intents,citationCount,referenceCount,title,authors"
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            citations = data.get("citations", [])
-            if citations:
-                for citation in citations:
-                    citing = citation.get("citingPaper", {})
-                    citing_title = citing.get("title", "No Title")
-                    citing_authors = ", ".join([author.get("name", "Unknown") for author in citing.get("authors", [])])
-                    contexts = citation.get("contexts", [])
-                    context_text = "<br>".join([f"&nbsp;&nbsp;- {ctx}" for ctx in contexts]) if contexts else "&nbsp;&nbsp;- No context provided."
-                    citations_html += f"<p>* <strong>{citing_title}</strong><br>&nbsp;&nbsp;Authors: {citing_authors}<br>&nbsp;&nbsp;Contexts:<br>{context_text}</p>"
-            else:
-                citations_html += "<p>No citations found.</p>"
-            all_citations_html += citations_html + "<hr>"
-        except Exception as e:
-            all_citations_html += f"<p>Error retrieving citations for paper {pid}: {str(e)}</p><hr>"
+    citations_html = fetch_all(
+        lambda pid: fetch_citations_html(pid, paper_title_map),
+        paper_ids,
+        on_error=lambda pid, e: str(citations_error(pid, e))
+    )
+    all_citations_html = "".join(citations_html)
     
     return format_citations_box(all_citations_html)
+
+def get_citations_page(paper_ids, paper_title_map, offsets=None):
+    """
+    Fetches the next page of citations for each paper, concurrently and in
+    paper order. offsets maps paper ID to the offset to fetch (missing means
+    the first page); papers whose offset is None have no more citations and
+    are skipped.
+
+    :return: (HTML fragment for the fetched pages, dict of paper ID to next offset).
+    """
+    offsets = offsets or {}
+    pending = [pid for pid in paper_ids if offsets.get(pid, 0) is not None]
+    pages = fetch_all(
+        lambda pid: fetch_citations_page_html(pid, paper_title_map, offsets.get(pid, 0)),
+        pending,
+        on_error=lambda pid, e: (str(citations_error(pid, e)), offsets.get(pid, 0))
+    )
+    next_offsets = dict(offsets)
+    next_offsets.update((pid, following) for pid, (_, following) in zip(pending, pages))
+    return "".join(fragment for fragment, _ in pages), next_offsets
@@ -1,20 +1,52 @@
-from config import get_openai_api_key
-from openai import OpenAI
-import os
+from config import SUMMARY_MODE
 
-os.environ["OPENAI_API_KEY"] = get_openai_api_key()
-client = OpenAI()
+from api.llm import complete, stream_complete
+from api.prompts import fit_each
+from api.render import text_pane
+from api.summarizer import summarize_each
 
-def compare_papers(paper_ids, paper_title_map):
+def format_comparison_box(comparison):
+    return text_pane("Paper Comparison", comparison)
+
+def stream_comparison(prompt, selected_ids, template, cache=True):
+    """
+    Yields the comparison pane as HTML, growing as GPT streams its answer. On an
+    error, yields the pane with the error appended and then re-raises it.
+    """
+    comparison = ""
+    try:
+        for comparison in stream_complete("compare", prompt, key_parts=selected_ids, template=template, cache=cache):
+            yield format_comparison_box(comparison)
+    except Exception as e:
+        yield format_comparison_box(f"{comparison}\n\n❌ Error generating comparison: {str(e)}")
+        raise
+
+def compare_papers(paper_ids, paper_title_map, stream=False, mode=SUMMARY_MODE):
+    """
+    Compares the selected papers with GPT. With stream=True, returns a generator
+    that yields partial HTML as tokens arrive instead of the finished HTML.
+    In "per_paper" mode the cached per-paper summaries are given to GPT as
+    input, so only papers that were never summarized cost an extra call.
+    """
     selected_ids = paper_ids  # Only compare first 3 papers
 
+    if mode == "per_paper":
+        summaries = summarize_each(selected_ids, paper_title_map)
+    else:
+        summaries = [None] * len(selected_ids)
+
     paper_infos = []
-    for pid in selected_ids:
-        title = paper_title_map.get(pid, "Unknown Title")
-        paper_infos.append(f"- {title}")
+    complete_inputs = True  # False when a summary failed, so the comparison is not cached
+    for pid, summary in zip(selected_ids, summaries):
+        info = f"- {paper_title_map.get(pid, 'Unknown Title')}"
+        if summary and not summary.startswith("❌"):
+            info += "\n  Summary:\n" + "\n".join(f"    {line}" for line in summary.splitlines())
+        elif mode == "per_paper":
+            complete_inputs = False
+        paper_infos.append(info)
 
-    prompt = (
-        "You are a senior academic researcher. Your task is to compare the following research papers given their titles. "
+    instructions = (
+        "You are a senior academic researcher. Your task is to compare the following research papers given their titles (and summaries, where provided). "
         "Use your expert-level understanding of research to infer what each paper is about.\n\n"
         "For each paper, analyse and compare the **methodologies**, **experiments**, **results**, and **contributions**, and then write a **structured comparison** "
         "highlighting similarities and differences.\n\n"
@@ -33,23 +65,21 @@ def compare_papers(paper_ids, paper_title_map):
         "- Point out overlaps in methods or aims\n"
         "- Note any differences in scope, domain, or novelty\n"
         "- Comment on how the papers may complement or contrast each other\n\n"
-        f"### Papers to Compare:\n" + "\n".join(paper_infos) +
-        "\n\nNow provide the structured markdown comparison below."
     )
+    closing = "\n\nNow provide the structured markdown comparison below."
+    # Each paper gets an equal share of the budget; titles come first and survive truncation
+    paper_infos = fit_each("compare", paper_infos, instructions + closing)
+    prompt = instructions + "### Papers to Compare:\n" + "\n".join(paper_infos) + closing
+    # Comparisons with and without summaries are cached apart
+    template = f"{mode}\n{instructions}{closing}"
+
+    if stream:
+        return stream_comparison(prompt, selected_ids, template, cache=complete_inputs)
 
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        comparison = completion.choices[0].message.content
+        # The same selection in any order maps to the same cached comparison
+        comparison = complete("compare", prompt, key_parts=selected_ids, template=template, cache=complete_inputs)
     except Exception as e:
         comparison = f"❌ Error generating comparison: {str(e)}"
 
-    html = f"""
-    <div style="border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;">
-        <h2>Paper Comparison</h2>
-        <pre>{comparison}</pre>
-    </div>
-    """
-    return html
+    return format_comparison_box(comparison)
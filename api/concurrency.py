@@ -0,0 +1,137 @@
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import contextvars
+import threading
+import time
+
+from config import MAX_CONCURRENT_REQUESTS, FETCH_TIMEOUT
+
+def iter_fetch(fetch, items, max_workers=None, timeout=None, on_error=None):
+    """
+    Runs fetch(item) for every item on a bounded thread pool and yields
+    (index, result) pairs as soon as each item finishes.
+
+    :param fetch: Callable taking one item (e.g. a paper ID).
+    :param items: Items to fetch.
+    :param max_workers: Concurrency limit, defaults to MAX_CONCURRENT_REQUESTS.
+    :param timeout: Seconds to wait for each item, defaults to FETCH_TIMEOUT
+                    (enough for one upstream call's full retry schedule).
+    :param on_error: Callable (item, exception) -> result used when fetch raises
+                     or times out. If omitted, the exception is re-raised.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    max_workers = max_workers or MAX_CONCURRENT_REQUESTS
+    timeout = FETCH_TIMEOUT if timeout is None else timeout
+
+    def failed(index, error):
+        if on_error is None:
+            raise error
+        return on_error(items[index], error)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        # Each worker runs in a copy of the caller's context so trace spans nest correctly
+        futures = {
+            executor.submit(contextvars.copy_context().run, fetch, item): i
+            for i, item in enumerate(items)
+        }
+        # Items queued behind the concurrency limit get their own timeout window
+        rounds = -(-len(items) // max_workers)
+        pending = set(futures)
+        done = as_completed(futures, timeout=timeout * rounds)
+        while pending:
+            try:
+                future = next(done)
+            except FuturesTimeoutError:
+                for future in sorted(pending, key=futures.get):
+                    future.cancel()
+                    yield futures[future], failed(futures[future], TimeoutError(f"Timed out after {timeout}s"))
+                return
+            pending.discard(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = failed(futures[future], e)
+            yield futures[future], result
+    finally:
+        # Never block the caller on a hung worker
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_all(fetch, items, max_workers=None, timeout=None, on_error=None):
+    """
+    Runs fetch(item) for every item on a bounded thread pool and returns the
+    results in the same order as items. Wall-clock time follows the slowest
+    item instead of the sum of all of them. Arguments are as for iter_fetch.
+
+    :return: List of results, one per item, in input order.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for index, result in iter_fetch(fetch, items, max_workers, timeout, on_error):
+        results[index] = result
+    return results
+
+class RateLimiter:
+    """
+    Token bucket per key (e.g. per API key): acquire(key) blocks until that key
+    may make another call without exceeding rate_per_minute.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(rate_per_minute / 60.0, 1.0)
+        self._buckets = {}  # key -> (tokens, last_refill)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(key, (self.capacity, now))
+                tokens = min(self.capacity, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[key] = (tokens - 1, now)
+                    return
+                self._buckets[key] = (tokens, now)
+                delay = (1 - tokens) / self.rate
+            time.sleep(delay)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs fn and
+    every caller that arrives while it is in flight waits for the same result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Returns (result, shared) where shared is True when this caller attached
+        to a call that was already in flight. Exceptions propagate to all callers.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from api.cache import response_cache
+from api.telemetry import span
+from config import (
+    FILE_TEXT_MAX_CHARS,
+    FILE_SCAN_MAX_CHARS,
+    FILE_EXTRACTION_WORKERS,
+    FILE_EXTRACTION_TIMEOUT,
+    CACHE_TTL_FILE_TEXT,
+)
+
+TXT_CHUNK_CHARS = 64 * 1024
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+HEADING = re.compile(r"^\s*(?:\d+(?:\.\d+)*\.?|[IVX]+\.)?\s*([A-Z][A-Za-z &]{2,40})\s*$")
+INLINE_ABSTRACT = re.compile(r"^\s*abstract\s*[-—:.]\s*(.+)$", re.IGNORECASE)
+SECTION_NAMES = {"abstract", "introduction"}
+
+_pool = None
+
+# Span label values for the upload's format; anything else is reported as "other"
+FORMAT_LABELS = {".pdf": "pdf", ".docx": "docx", ".txt": "txt"}
+
+class ExtractionError(Exception):
+    """Raised by extract_text_from_file when no text can be taken from an upload."""
+
+class UnsupportedFormatError(ExtractionError):
+    """Raised for uploads that are not .txt, .docx or .pdf files."""
+
+def iter_pages(file_path):
+    """
+    Yields the text of a .pdf, .docx or .txt file one page (or chunk) at a time,
+    so callers can stop reading as soon as they have enough text.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == ".txt":
+        with open(file_path, "r", encoding="utf-8") as f:
+            while True:
+                chunk = f.read(TXT_CHUNK_CHARS)
+                if not chunk:
+                    return
+                yield chunk
+
+    elif file_extension == ".docx":
+        import docx
+
+        # python-docx parses the whole document up front; paragraphs are still
+        # yielded lazily so nothing past the budget is joined or copied.
+        doc = docx.Document(file_path)
+        paragraphs = []
+        for para in doc.paragraphs:
+            paragraphs.append(para.text)
+            if len(paragraphs) == DOCX_PARAGRAPHS_PER_PAGE:
+                yield "\n".join(paragraphs)
+                paragraphs = []
+        if paragraphs:
+            yield "\n".join(paragraphs)
+
+    elif file_extension == ".pdf":
+        import fitz  # PyMuPDF for PDFs
+
+        # Pages are loaded one at a time rather than all at once
+        with fitz.open(file_path) as pdf_document:
+            for page in pdf_document:
+                yield page.get_text()
+
+    else:
+        raise UnsupportedFormatError(f"Unsupported file format: {file_extension or 'no extension'}")
+
+def select_sections(text, max_chars):
+    """
+    Picks the most informative parts of a paper-like document: the title
+    (first lines), the abstract and the introduction, in that order, up to
+    max_chars. Falls back to the leading text when no headings are found.
+    """
+    lines = text.splitlines()
+    sections = {}
+    current = None
+    front_matter = len(lines)
+    for index, line in enumerate(lines):
+        inline = INLINE_ABSTRACT.match(line)
+        if inline and "abstract" not in sections:
+            # e.g. "Abstract—We propose ..." on a single line
+            current = "abstract"
+            sections[current] = [inline.group(1)]
+            front_matter = min(front_matter, index)
+            continue
+        match = HEADING.match(line)
+        if match:
+            name = match.group(1).strip().lower()
+            current = name if name in SECTION_NAMES else None
+            if current:
+                sections.setdefault(current, [])
+                front_matter = min(front_matter, index)
+                continue
+        if current:
+            sections[current].append(line)
+
+    if not sections:
+        return text[:max_chars]
+
+    # Title and authors are whatever precedes the first recognised section
+    title = "\n".join(line for line in lines[:min(front_matter, 5)] if line.strip())[:300]
+    parts = [title] + ["\n".join(sections[name]).strip() for name in ("abstract", "introduction") if name in sections]
+    return "\n\n".join(part for part in parts if part)[:max_chars]
+
+def extract_text(file_path, max_chars=FILE_TEXT_MAX_CHARS, scan_chars=FILE_SCAN_MAX_CHARS):
+    """
+    Reads pages lazily until scan_chars characters have been seen, then keeps
+    the title/abstract/introduction (or the leading text) within max_chars.
+    """
+    pages = []
+    seen = 0
+    for page in iter_pages(file_path):
+        pages.append(page)
+        seen += len(page)
+        if seen >= scan_chars:
+            break
+    return select_sections("\n".join(pages), max_chars)
+
+def file_hash(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=FILE_EXTRACTION_WORKERS)
+    return _pool
+
+def extract_text_from_file(file_path):
+    """
+    Extracts a bounded amount of text from a given file (.txt, .docx, .pdf).
+    Parsing runs in a worker process, and results are cached by file content
+    hash so re-uploading the same document is free.
+
+    :raises ExtractionError: With a message for the user when the file cannot
+                             be read (unsupported format, encoding, no text).
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        with span("file_extraction", format=FORMAT_LABELS.get(extension, "other")) as current:
+            digest = file_hash(file_path)
+            key = f"{digest}:{extension}:{FILE_TEXT_MAX_CHARS}"
+            current.set(cache_hit=response_cache.contains("file_text", key))
+            text = response_cache.get_or_fetch(
+                "file_text", key,
+                lambda: get_pool().submit(extract_text, file_path).result(timeout=FILE_EXTRACTION_TIMEOUT),
+                ttl=CACHE_TTL_FILE_TEXT
+            )
+            current.set(chars=len(text))
+    except UnsupportedFormatError as e:
+        raise UnsupportedFormatError(f"{str(e)}. Please upload a .txt, .docx or .pdf file.") from e
+    except UnicodeDecodeError as e:
+        raise ExtractionError("The text file is not UTF-8 encoded. Please save it as UTF-8 and upload it again.") from e
+    except Exception as e:
+        raise ExtractionError(f"Could not extract text: {str(e)}") from e
+    if not text.strip() and extension == ".pdf":
+        raise ExtractionError("No extractable text found in the PDF.")
+    return text
@@ -0,0 +1,264 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.telemetry import span
+
+from config import (
+    UPSTREAM_BASE_URL,
+    UPSTREAM_CONNECT_TIMEOUT,
+    REQUEST_TIMEOUT,
+    UPSTREAM_POOL_SIZE,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_BACKOFF_BASE,
+    UPSTREAM_BACKOFF_MAX,
+    UPSTREAM_DEADLINE,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while the upstream is considered down."""
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and fails fast until
+    `reset_timeout` seconds have passed. Then a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def record_abort(self, error):
+        """
+        Settles a call that ended with an error the retry loop does not handle.
+        Exceptions (e.g. ChunkedEncodingError) count as failures; cancellation
+        (e.g. asyncio.wait_for) gives no verdict and only frees the trial slot,
+        so a half-open circuit is never left waiting for a trial that is gone.
+        """
+        if isinstance(error, Exception):
+            self.record_failure()
+            return
+        with self._lock:
+            self.trial_in_flight = False
+
+def backoff_delay(attempt, retry_after, base, maximum):
+    """Exponential backoff with full jitter, honouring a numeric Retry-After header."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), maximum)
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+class UpstreamClient:
+    """
+    Shared HTTP client for recommendpapers.xyz with connection pooling, keep-alive,
+    connect/read timeouts, retries with exponential backoff and full jitter on
+    429/5xx and connection errors, and a circuit breaker. With `deadline`, one
+    call (attempts and backoff together) gives up after about that many seconds,
+    so callers waiting on it (e.g. fetch_all) see its real outcome.
+    Point base_url at a local stub server to exercise it offline.
+    """
+
+    def __init__(self, base_url=UPSTREAM_BASE_URL, connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout=REQUEST_TIMEOUT, max_retries=UPSTREAM_MAX_RETRIES,
+                 backoff_base=UPSTREAM_BACKOFF_BASE, backoff_max=UPSTREAM_BACKOFF_MAX,
+                 pool_size=UPSTREAM_POOL_SIZE, breaker=None, deadline=UPSTREAM_DEADLINE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt, response=None):
+        # Honour Retry-After from 429/503 responses when the upstream sends one
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        return backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max)
+
+    def get(self, path, params=None):
+        """
+        Sends a GET request to base_url + path, retrying transient failures.
+        Returns the final response (callers decide how to treat 4xx), or raises
+        requests.RequestException once retries are exhausted.
+        """
+        with span("upstream", path=path) as current:
+            if not self.breaker.allow():
+                current.set(status="circuit_open")
+                raise CircuitOpenError(f"Upstream {self.base_url} is unavailable (circuit open)")
+
+            url = path if path.startswith("http") else f"{self.base_url}{path}"
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    response = None
+                    timeout = self.timeout
+                    if self.deadline is not None:
+                        # requests has no total timeout; cap each socket wait by the time left
+                        remaining = max(self.deadline - (time.monotonic() - started), 0.001)
+                        timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+                    try:
+                        response = self.session.get(url, params=params, timeout=timeout)
+                        if response.status_code not in RETRY_STATUS_CODES:
+                            self.breaker.record_success()
+                            current.set(status=response.status_code, attempts=attempt + 1)
+                            return response
+                        error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+                    except (requests.ConnectionError, requests.Timeout) as e:
+                        error = e
+
+                    if attempt < self.max_retries:
+                        delay = self._backoff(attempt, response)
+                        if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                            break  # No time left for another attempt
+                        time.sleep(delay)
+            except BaseException as e:
+                self.breaker.record_abort(e)
+                raise
+
+            self.breaker.record_failure()
+            current.set(status=response.status_code if response is not None else type(error).__name__,
+                        attempts=attempt + 1)
+            if response is not None:
+                return response
+            raise error
+
+    def get_json(self, path, params=None):
+        """GET path and decode the JSON body, raising for non-2xx responses."""
+        response = self.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamClient built on aiohttp, with the same
+    timeouts and retry policy. Must be created inside a running event loop.
+    Failures are raised as requests.RequestException so callers handle sync
+    and async errors alike. With `deadline`, one call (attempts and backoff
+    together) never takes longer than that many seconds.
+    """
+
+    def __init__(self, base_url=UPSTREAM_BASE_URL, connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout=REQUEST_TIMEOUT, max_retries=UPSTREAM_MAX_RETRIES,
+                 backoff_base=UPSTREAM_BACKOFF_BASE, backoff_max=UPSTREAM_BACKOFF_MAX,
+                 pool_size=UPSTREAM_POOL_SIZE, breaker=None, deadline=None):
+        import aiohttp  # Only needed by the async server
+
+        self.aiohttp = aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+        )
+
+    async def get_json(self, path, params=None):
+        """GET path and decode the JSON body, retrying transient failures and raising for non-2xx."""
+        with span("upstream", path=path) as current:
+            if not self.breaker.allow():
+                current.set(status="circuit_open")
+                raise CircuitOpenError(f"Upstream {self.base_url} is unavailable (circuit open)")
+
+            url = path if path.startswith("http") else f"{self.base_url}{path}"
+            settled = False  # Whether the breaker already has this call's outcome
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    retry_after = None
+                    timeout = None
+                    if self.deadline is not None:
+                        # Bound this attempt by whatever is left of the call's budget
+                        timeout = self.aiohttp.ClientTimeout(
+                            total=max(self.deadline - (time.monotonic() - started), 0.001),
+                            sock_connect=self.timeout[0], sock_read=self.timeout[1],
+                        )
+                    try:
+                        async with self.session.get(url, params=params, timeout=timeout) as response:
+                            current.set(status=response.status, attempts=attempt + 1)
+                            if response.status not in RETRY_STATUS_CODES:
+                                if response.status >= 400:
+                                    self.breaker.record_success()
+                                    settled = True
+                                    raise requests.HTTPError(f"{response.status} from {url}")
+                                # Only a fully read and decoded body counts as a success; a
+                                # truncated one is retried and bad JSON is recorded as a failure
+                                data = await response.json(content_type=None)
+                                self.breaker.record_success()
+                                settled = True
+                                return data
+                            retry_after = response.headers.get("Retry-After")
+                            error = requests.HTTPError(f"{response.status} from {url}")
+                    except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        current.set(status=type(e).__name__, attempts=attempt + 1)
+                        error = requests.ConnectionError(str(e) or type(e).__name__)
+
+                    if attempt < self.max_retries:
+                        delay = backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max)
+                        if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                            break  # No time left for another attempt
+                        await asyncio.sleep(delay)
+            except BaseException as e:
+                if not settled:
+                    self.breaker.record_abort(e)
+                raise
+
+            self.breaker.record_failure()
+            raise error
+
+    async def aclose(self):
+        await self.session.close()
+
+# One pooled client shared by every api/ module
+upstream = UpstreamClient()
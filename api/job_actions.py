@@ -0,0 +1,97 @@
+"""
+The action buttons as background jobs (see api.jobs). Each runner takes the
+JSON parameters stored with the job and reports progress per paper.
+"""
+from api.bibtex import get_bibtex
+from api.compare import compare_papers, format_comparison_box
+from api.concurrency import iter_fetch
+from api.jobs import get_job_queue
+from api.paper import as_papers
+from api.summarizer import format_paper_summaries, format_summary_box, summarize_paper, summarize_papers, summary_error
+from config import SUMMARY_MODE, LLM_MAX_CONCURRENCY, LLM_TIMEOUT
+
+def job_params(paper_ids, paper_title_map, papers=()):
+    """What a runner needs from the session: the selection, its titles and (for BibTeX) its metadata."""
+    selected = set(paper_ids)
+    return {
+        "paper_ids": list(paper_ids),
+        "titles": {pid: paper_title_map.get(pid, "Unknown Title") for pid in paper_ids},
+        "papers": [paper for paper in papers if paper.get("id") in selected],
+    }
+
+def summarize_with_progress(paper_ids, titles, on_summary):
+    """
+    Runs the per-paper summaries concurrently, calling on_summary(done, summaries)
+    as each one lands. Returns the summaries and the errors of the failed papers.
+    """
+    summaries = ["⏳ Generating summary..."] * len(paper_ids)
+    errors = []
+
+    def on_error(pid, e):
+        errors.append(e)
+        return summary_error(pid, e)
+
+    for done, (index, summary) in enumerate(iter_fetch(
+        lambda pid: summarize_paper(pid, titles.get(pid, "Unknown Title")),
+        paper_ids,
+        max_workers=LLM_MAX_CONCURRENCY,
+        timeout=LLM_TIMEOUT,
+        on_error=on_error
+    ), 1):
+        summaries[index] = summary
+        on_summary(done, summaries)
+    return summaries, errors
+
+def check_summaries(errors, paper_ids):
+    # A job with a failed paper must fail, or its result would be reused for JOB_RESULT_TTL
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(paper_ids)} summaries failed: {str(errors[0])}")
+
+def run_summary(params, progress):
+    paper_ids, titles = params["paper_ids"], params["titles"]
+    if SUMMARY_MODE != "per_paper":
+        # One prompt for the whole selection: progress is the streamed text
+        progress(0, 1)
+        html = ""
+        for html in summarize_papers(paper_ids, titles, stream=True, mode=SUMMARY_MODE):
+            progress(0, 1, html)
+        return html
+
+    summaries, errors = summarize_with_progress(paper_ids, titles, lambda done, summaries: progress(
+        done, len(paper_ids), format_summary_box(format_paper_summaries(paper_ids, titles, summaries))
+    ))
+    check_summaries(errors, paper_ids)
+    return format_summary_box(format_paper_summaries(paper_ids, titles, summaries))
+
+def run_compare(params, progress):
+    paper_ids, titles = params["paper_ids"], params["titles"]
+    total = len(paper_ids) + 1 if SUMMARY_MODE == "per_paper" else 1
+    if SUMMARY_MODE == "per_paper":
+        # Summaries first, one step each; compare_papers then reads them from the LLM cache
+        _, errors = summarize_with_progress(paper_ids, titles, lambda done, summaries: progress(
+            done, total, format_comparison_box(f"⏳ Summarized {done} of {len(paper_ids)} papers...")
+        ))
+        check_summaries(errors, paper_ids)
+    html = ""
+    for html in compare_papers(paper_ids, titles, stream=True, mode=SUMMARY_MODE):
+        progress(total - 1, total, html)
+    return html
+
+def run_bibtex(params, progress):
+    return get_bibtex(params["paper_ids"], params["titles"], as_papers(params["papers"]), progress=progress)
+
+JOB_ACTIONS = {
+    "summary": run_summary,
+    "compare": run_compare,
+    "bibtex": run_bibtex,
+}
+
+def submit_job(action, paper_ids, paper_title_map, papers=()):
+    """Starts (or reuses) the job for action on the selection and returns its ID."""
+    return get_job_queue().submit(action, paper_ids, job_params(paper_ids, paper_title_map, papers))
+
+def register_job_actions(job_queue):
+    for action, runner in JOB_ACTIONS.items():
+        job_queue.register(action, runner)
+
+register_job_actions(get_job_queue())
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from api.serialization import dumps, loads
+from api.telemetry import metrics, span
+from config import JOBS_PATH, JOB_WORKERS, JOB_RESULT_TTL
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_FIELDS = ("action", "status", "done", "total", "result", "error", "created_at", "updated_at")
+
+metrics.describe("jobs_total", "Background jobs by action and outcome (submitted, reused, done, failed).")
+
+def job_key(action, paper_ids):
+    """The same action on the same selection (in any order) is the same job."""
+    material = "\x1f".join([action] + sorted(str(pid) for pid in paper_ids))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+class JobQueue:
+    """
+    Runs long actions (summaries, comparisons, BibTeX) on a few worker threads
+    instead of inside the request that asked for them, so a closed browser tab
+    does not lose the work.
+
+    Jobs are kept in SQLite with their parameters, progress and result, under
+    an ID derived from the action and the selection. Submitting a job that is
+    queued, running or finished within result_ttl returns the existing ID, so
+    any session asking for the same thing shares one run and its result. Jobs
+    left unfinished by a previous process are run again when workers start.
+    Finished jobs older than result_ttl are deleted on each submit.
+    """
+
+    def __init__(self, path=JOBS_PATH, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._actions = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._running = {}  # job id -> {"done", "total", "result"} of jobs running in this process
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, action TEXT NOT NULL, params TEXT NOT NULL, "
+                "status TEXT NOT NULL, done INTEGER NOT NULL, total INTEGER NOT NULL, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def register(self, action, fn):
+        """
+        Registers fn(params, progress) as the runner for action. fn returns the
+        result HTML and may call progress(done, total, partial_html) as it goes.
+        fn raises if any part of the result failed: the job is then marked failed
+        (keeping the last partial result for display) and never reused.
+        """
+        self._actions[action] = fn
+
+    def _purge(self, now):
+        # Finished rows past result_ttl would never be reused, only grow the table. Call with the lock held.
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, now - self.result_ttl)
+            )
+
+    def _start(self):
+        # Threads start on first submit so processes that only read jobs stay idle. Call with the lock held.
+        if self._threads:
+            return
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            for (job_id,) in self._conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)):
+                self._queue.put(job_id)
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, action, paper_ids, params):
+        """Queues action for paper_ids (unless an equivalent job exists) and returns the job ID."""
+        job_id = job_key(action, paper_ids)
+        now = time.time()
+        with self._lock:
+            self._start()
+            self._purge(now)
+            row = self._conn.execute("SELECT status, updated_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                status, updated_at = row
+                if status in (QUEUED, RUNNING) or (status == DONE and now - updated_at < self.result_ttl):
+                    metrics.inc("jobs_total", action=action, outcome="reused")
+                    return job_id
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (id, action, params, status, done, total, result, error, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 0, 0, NULL, NULL, ?, ?)",
+                    (job_id, action, dumps(params), QUEUED, now, now)
+                )
+        metrics.inc("jobs_total", action=action, outcome="submitted")
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns the job as a dict (see JOB_FIELDS, plus "id"), or None if there
+        is no such job. For a running job, "result" holds the partial result.
+        """
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            running = dict(self._running.get(job_id) or {})
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row), id=job_id)
+        # Streamed partial results are only kept in memory, so they are newer than the table
+        job.update(running)
+        return job
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT action, params FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)
+                ).fetchone()
+                if row is None:
+                    continue  # Already picked up or replaced
+                self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+                self._running[job_id] = {"done": 0, "total": 0, "result": None}
+            action, params = row[0], loads(row[1])
+            with span("job", action=action) as current:
+                try:
+                    if action not in self._actions:
+                        raise ValueError(f"Unknown job action: {action}")
+                    result = self._actions[action](params, lambda done, total, partial=None: self._progress(job_id, done, total, partial))
+                except Exception as e:
+                    current.set(error=str(e))
+                    self._finish(job_id, action, FAILED, error=str(e))
+                else:
+                    self._finish(job_id, action, DONE, result=result)
+
+    def _progress(self, job_id, done, total, partial=None):
+        with self._lock:
+            state = self._running[job_id]
+            advanced = (done, total) != (state["done"], state["total"])
+            state.update(done=done, total=total)
+            if partial is not None:
+                state["result"] = partial
+            if advanced:
+                # Written per step (not per streamed token) so other processes can follow along
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE jobs SET done = ?, total = ?, result = ?, updated_at = ? WHERE id = ?",
+                        (done, total, state["result"], time.time(), job_id)
+                    )
+
+    def _finish(self, job_id, action, status, result=None, error=None):
+        with self._lock, self._conn:
+            state = self._running.pop(job_id, {})
+            total = state.get("total") or 1
+            if status == FAILED:
+                result = state.get("result")  # What was shown before the failure
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, done = ?, total = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, total if status == DONE else state.get("done", 0), total, result, error, time.time(), job_id)
+            )
+        metrics.inc("jobs_total", action=action, outcome=status)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Returns the shared job queue, opening the job table on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -1,21 +1,23 @@
-import os
-from config import get_openai_api_key
+from config import KEYWORD_ENGINE, LOCAL_KEYWORD_MAX_CHARS, LOCAL_KEYWORD_MIN_WORDS
 
-# Set OpenAI API key as an environment variable
-os.environ["OPENAI_API_KEY"] = get_openai_api_key()
+from api.concurrency import SingleFlight
+from api.llm import complete
+from api.local_keywords import extract_keywords_local
+from api.prompts import fit
+from api.telemetry import metrics, span
 
-import openai
-from openai import OpenAI
+_in_flight = SingleFlight()
 
-# Initialize the OpenAI client
-client = OpenAI()
+def normalize_query(text):
+    """Case, whitespace and trailing punctuation do not change what a query asks for."""
+    return " ".join(text.lower().split()).rstrip("?.!")
 
-def extract_main_keyword(text):
+def extract_keyword_llm(text):
     """
     Extracts the main topic keyword from the given text using OpenAI's GPT-4 API.
     Returns only one keyword (e.g., "Deep Learning", "Natural Language Processing").
     """
-    prompt = (
+    instructions = (
         "You are an expert at understanding academic search queries and generating powerful multi-keyword research phrases.\n\n"
         "Given a user’s text, extract a **5–6 word search phrase** containing the most important and relevant keywords. "
         "You must understand the user’s intent and choose keywords that help retrieve the most useful academic papers.\n\n"
@@ -31,17 +33,55 @@ def extract_main_keyword(text):
         "→ generative artificial intelligence ethics fairness\n\n"
         "User: Find papers on robotic surgery and computer vision.\n"
         "→ robotic surgery computer vision systems\n\n"
-        f"User: {text}\n"
-        "→"
     )
+    # Uploaded documents lead with their title, abstract and introduction, so
+    # cutting the end to the token budget keeps the most informative part
+    text = fit("keyword", text, instructions + "User: \n→")
+    prompt = instructions + f"User: {text}\n" + "→"
     
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        keyword = completion.choices[0].message.content.strip()
+        # Queries that only differ in case or spacing share a cache entry, and
+        # near-duplicate ones can be served by the semantic cache tier
+        keyword = complete(
+            "keyword", prompt, key_parts=[normalize_query(text)], template=instructions, semantic_text=text
+        ).strip()
     except Exception as e:
         keyword = f"Error extracting keyword: {str(e)}"
     
     return keyword
+
+def extract_keyword_local(text):
+    """Extracts a search phrase on the CPU only, with no LLM call."""
+    keyword, _, _ = extract_keywords_local(text)
+    return keyword or text.strip()
+
+def extract_keyword_hybrid(text):
+    """
+    Uses the local engine for short, clear queries and falls back to the LLM
+    for long inputs (e.g. uploaded documents), when too few keywords remain or
+    when the local phrase is partial (see extract_keywords_local).
+    """
+    if len(text) <= LOCAL_KEYWORD_MAX_CHARS:
+        keyword, word_count, partial = extract_keywords_local(text)
+        if word_count >= LOCAL_KEYWORD_MIN_WORDS and not partial:
+            return keyword
+    return extract_keyword_llm(text)
+
+KEYWORD_ENGINES = {
+    "llm": extract_keyword_llm,
+    "local": extract_keyword_local,
+    "hybrid": extract_keyword_hybrid,
+}
+
+def extract_main_keyword(text, engine=KEYWORD_ENGINE):
+    """
+    Turns a user query into a short search phrase with the configured engine
+    ("llm", "local" or "hybrid"). Concurrent calls for the same normalized
+    query (e.g. a class typing the same prompt) share one extraction.
+    """
+    with span("keyword_extraction", engine=engine) as current:
+        keyword, shared = _in_flight.do((engine, normalize_query(text)), lambda: KEYWORD_ENGINES[engine](text))
+        current.set(input_chars=len(text), shared=shared)
+        if shared:
+            metrics.inc("coalesced_calls_total", source="keyword_extraction")
+        return keyword
@@ -1,48 +1,60 @@
-import requests
+import logging
 
-def get_bibtex_reference(paper_id, paper_metadata):
-    """
-    Fetches the BibTeX reference for a given paper ID. If BibTeX is not found,
-    constructs a reference using available metadata.
-    """
-    lookup_bibtex_url = "http://recommendpapers.xyz/api/bibtex"
-    response = requests.get(f"{lookup_bibtex_url}?id=CorpusId:{paper_id}")
+from api.local_bibtex import citation_keys, format_bibtex
+from api.metadata import get_bibtex_entries
+from api.render import fragments, join, message, pane
+
+logger = logging.getLogger("research.bibtex")
 
-    if response.status_code == 200:
-        data = response.json()
-        papers = data.get("papers", [])
+def metadata_papers(paper_metadata):
+    """Turns {paper_id: metadata} into paper dicts that get_bibtex_entries can resolve."""
+    return [dict(metadata, id=pid) for pid, metadata in paper_metadata.items()]
 
-        # Check if "papers" exists and is not empty before accessing index 0
-        if papers and isinstance(papers, list) and len(papers) > 0:
-            if "bibtex" in papers[0]:  # Ensure BibTeX key exists
-                return papers[0]["bibtex"]
+def get_bibtex_reference(paper_id, paper_metadata, entries=None, keys=None):
+    """
+    Fetches the BibTeX reference for a given paper ID. If BibTeX is not found,
+    builds a BibTeX entry from the available metadata.
 
-    # If BibTeX is not found, construct a citation from metadata
-    metadata = paper_metadata.get(paper_id, {})
-    title = metadata.get("title", "Unknown Title")
-    authors = metadata.get("authors", "Unknown Authors")
-    journal = metadata.get("journal", "Unknown Journal")
-    year = metadata.get("year", "Unknown Year")
+    :param entries: Optional {paper_id: BibTeX} from get_bibtex_entries, to
+                    avoid a lookup per paper.
+    :param keys: Optional {paper_id: citation key} from citation_keys, to keep
+                 the keys of generated entries unique across the review.
+    """
+    if entries is None:
+        entries = get_bibtex_entries([paper_id], metadata_papers(paper_metadata))
+    bibtex = entries.get(str(paper_id))
+    if bibtex:
+        return bibtex
 
-    return f"{authors} ({year}). {title}. {journal}."
+    # If BibTeX is not found, build an entry from the metadata
+    return format_bibtex(dict(paper_metadata.get(paper_id, {}), id=paper_id), (keys or {}).get(str(paper_id)))
 
 def generate_literature_review(paper_ids, paper_metadata):
     """
     Generates a structured Literature Review using BibTeX references.
-    If BibTeX is unavailable, metadata is used instead.
+    If BibTeX is unavailable, entries are generated from the metadata instead.
+    References for all papers are fetched in one bulk lookup and kept in the original paper order.
     """
     if not paper_ids:
         return "<div>No papers available for Literature Review.</div>"
     
-    review_content = "<h2>Literature Review</h2><p>Below is the list of references for the papers found in your search results:</p>"
-    for pid in paper_ids:
-        bibtex_or_metadata = get_bibtex_reference(pid, paper_metadata)
-        review_content += f"<h3>{paper_metadata.get(pid, {}).get('title', 'Unknown Title')}</h3><pre>{bibtex_or_metadata}</pre><hr>"
+    try:
+        entries = get_bibtex_entries(paper_ids, metadata_papers(paper_metadata))
+    except Exception as e:
+        logger.warning("Bulk BibTeX lookup failed: %s", e)
+        entries = {}
+    keys = citation_keys([
+        dict(paper_metadata.get(pid, {}), id=pid) for pid in paper_ids if not entries.get(str(pid))
+    ])
+    references = join(
+        fragments.render(
+            "reference.html", f"review:{pid}",
+            heading=paper_metadata.get(pid, {}).get("title", "Unknown Title"),
+            text=get_bibtex_reference(pid, paper_metadata, entries, keys)
+        )
+        for pid in paper_ids
+    )
 
     # Wrap everything in a scrollable HTML box
-    html = f"""
-    <div style="border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;">
-        {review_content}
-    </div>
-    """
-    return html
\ No newline at end of file
+    intro = message("Below is the list of references for the papers found in your search results:")
+    return pane(join([intro, references]), "Literature Review")
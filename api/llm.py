@@ -0,0 +1,132 @@
+import logging
+
+from api.concurrency import SingleFlight
+from api.llm_cache import llm_cache
+from api.llm_pool import get_llm_pool
+from api.prompts import count_tokens, model_for, output_budget
+from api.telemetry import metrics, span
+from config import EMBEDDING_MODEL
+
+logger = logging.getLogger("research.llm")
+
+_in_flight = SingleFlight()
+
+def embed(text):
+    """Returns the embedding vector for text, or None if the call fails."""
+    try:
+        with span("embedding") as current:
+            response = get_llm_pool().embedding(model=EMBEDDING_MODEL, input=text)
+            if getattr(response, "usage", None) is not None:
+                current.set(prompt_tokens=response.usage.prompt_tokens)
+        return response.data[0].embedding
+    except Exception as e:
+        logger.warning("Embedding failed, skipping semantic cache: %s", e)
+        return None
+
+def record_usage(current, usage):
+    """Copies token counts from an OpenAI usage object onto a span and logs them."""
+    if usage is not None:
+        current.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        logger.info(
+            "%s on %s: %d prompt + %d completion tokens (estimated prompt: %s)",
+            current.labels.get("feature"), current.attributes.get("model"),
+            usage.prompt_tokens, usage.completion_tokens, current.attributes.get("estimated_prompt_tokens")
+        )
+
+def request_options(feature, kwargs):
+    """Adds the feature's max_tokens to kwargs unless the caller set one."""
+    if output_budget(feature) is not None:
+        kwargs.setdefault("max_tokens", output_budget(feature))
+    return kwargs
+
+def complete(feature, prompt, model=None, key_parts=None, template=None, semantic_text=None, cache=True, **kwargs):
+    """
+    Sends prompt as a single user message and returns the reply text.
+    Identical prompts (or identical key_parts sets) are answered from the LLM
+    cache; with semantic_text, near-duplicate queries can be answered too.
+    Cache misses go through the shared key pool. Errors that persist across
+    keys propagate to the caller and are not cached.
+
+    :param feature: Feature name used for hit-rate metrics (e.g. "summarize").
+    :param model: Defaults to the feature's tier (see api.prompts.model_for).
+    :param key_parts: Optional unordered key material replacing the prompt.
+    :param template: With key_parts, the fixed part of the prompt that versions
+                     the key (defaults to the whole prompt).
+    :param semantic_text: Optional user text for the embedding-similarity tier.
+    :param cache: False to skip storing the reply, e.g. when the prompt was
+                  built from partly failed inputs.
+    :param kwargs: Extra arguments for chat.completions.create (e.g. timeout);
+                   max_tokens defaults to the feature's output budget.
+    """
+    model = model or model_for(feature)
+    with span("llm", feature=feature) as current:
+        key = llm_cache.make_key(feature, model, prompt, key_parts, template)
+        hit, text = llm_cache.get(feature, key)
+        current.set(cache_hit=hit, model=model)
+        if hit:
+            return text
+
+        def generate():
+            vector = None
+            if semantic_text and llm_cache.semantic is not None:
+                vector = embed(semantic_text)
+                if vector is not None:
+                    hit, text = llm_cache.get_similar(feature, model, vector)
+                    if hit:
+                        current.set(semantic_hit=True)
+                        return text
+
+            current.set(estimated_prompt_tokens=count_tokens(prompt, model))
+            completion = get_llm_pool().chat_completion(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                **request_options(feature, kwargs)
+            )
+            record_usage(current, completion.usage)
+            text = completion.choices[0].message.content
+            if cache:
+                llm_cache.set(feature, model, key, text, vector)
+            return text
+
+        # Identical prompts already in flight share one completion
+        text, shared = _in_flight.do(key, generate)
+        current.set(shared=shared)
+        if shared:
+            metrics.inc("coalesced_calls_total", source=f"llm_{feature}")
+        return text
+
+def stream_complete(feature, prompt, model=None, key_parts=None, template=None, cache=True, **kwargs):
+    """
+    Streaming variant of complete(): yields the reply text accumulated so far
+    after every received chunk. A cached reply is yielded in one piece, and
+    the full reply is cached (unless cache is False) once the stream finishes.
+    """
+    model = model or model_for(feature)
+    with span("llm", feature=feature) as current:
+        key = llm_cache.make_key(feature, model, prompt, key_parts, template)
+        hit, text = llm_cache.get(feature, key)
+        current.set(cache_hit=hit, model=model, stream=True)
+        if hit:
+            yield text
+            return
+
+        current.set(estimated_prompt_tokens=count_tokens(prompt, model))
+        stream = get_llm_pool().stream_chat_completion(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            # The final chunk then carries token usage (with no choices)
+            stream_options={"include_usage": True},
+            **request_options(feature, kwargs)
+        )
+        text = ""
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                record_usage(current, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                text += delta
+                yield text
+        if cache:
+            llm_cache.set(feature, model, key, text)
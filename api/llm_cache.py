@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict
+
+from api.cache import create_backend
+from config import (
+    LLM_CACHE_BACKEND,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL,
+    LLM_SEMANTIC_CACHE,
+    LLM_SEMANTIC_THRESHOLD,
+    LLM_SEMANTIC_MAX_ENTRIES,
+)
+
+def normalize_prompt(prompt):
+    """Collapses whitespace so cosmetic differences do not change the cache key."""
+    return " ".join(prompt.split())
+
+class SemanticIndex:
+    """
+    Keeps the embeddings of recent cached queries per feature and finds the
+    closest one by cosine similarity. Entries point at exact-tier cache keys.
+    """
+
+    def __init__(self, threshold=LLM_SEMANTIC_THRESHOLD, max_entries=LLM_SEMANTIC_MAX_ENTRIES):
+        import numpy as np  # Only needed when the semantic tier is enabled
+
+        self.np = np
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = defaultdict(OrderedDict)  # (feature, model) -> {key: unit vector}
+        self._lock = threading.Lock()
+
+    def add(self, feature, model, key, vector):
+        vector = self.np.asarray(vector, dtype=self.np.float32)
+        vector /= self.np.linalg.norm(vector) or 1.0
+        with self._lock:
+            entries = self._entries[(feature, model)]
+            entries[key] = vector
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def nearest(self, feature, model, vector):
+        """Returns the cache key of the most similar entry above threshold, or None."""
+        with self._lock:
+            entries = self._entries.get((feature, model))
+            if not entries:
+                return None
+            keys = list(entries)
+            matrix = self.np.stack(list(entries.values()))
+        query = self.np.asarray(vector, dtype=self.np.float32)
+        query /= self.np.linalg.norm(query) or 1.0
+        scores = matrix @ query
+        best = int(scores.argmax())
+        return keys[best] if scores[best] >= self.threshold else None
+
+class LLMCache:
+    """
+    Caches LLM replies keyed on model plus normalized prompt (exact tier), with
+    an optional embedding-similarity tier, and counts hits per feature.
+    """
+
+    def __init__(self, backend=None, ttl=LLM_CACHE_TTL, semantic=None):
+        self.backend = backend if backend is not None else create_backend(
+            LLM_CACHE_BACKEND, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+        )
+        self.ttl = ttl
+        self.semantic = semantic
+        self._stats = defaultdict(lambda: {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+
+    def make_key(self, feature, model, prompt, key_parts=None, template=None):
+        """
+        Builds the exact-tier key. When key_parts is given (e.g. the selected
+        paper IDs) it replaces the prompt and is treated as an unordered set;
+        a hash of template (the fixed prompt text, or the prompt itself if
+        None) is added so editing a prompt does not serve replies to the old one.
+        """
+        if key_parts is not None:
+            version = hashlib.sha256(normalize_prompt(template if template is not None else prompt).encode("utf-8"))
+            material = [feature, model, sorted(str(part) for part in key_parts), version.hexdigest()[:16]]
+        else:
+            material = [model, normalize_prompt(prompt)]
+        return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()
+
+    def _count(self, feature, counter):
+        with self._lock:
+            self._stats[feature][counter] += 1
+
+    def contains(self, key):
+        """Checks for a cached reply without counting a hit or miss."""
+        return self.backend.get(f"llm:{key}")[0]
+
+    def get(self, feature, key):
+        hit, value = self.backend.get(f"llm:{key}")
+        if hit:
+            self._count(feature, "exact_hits")
+        return hit, value
+
+    def get_similar(self, feature, model, vector):
+        if self.semantic is None:
+            return False, None
+        key = self.semantic.nearest(feature, model, vector)
+        if key is None:
+            return False, None
+        hit, value = self.backend.get(f"llm:{key}")
+        if hit:
+            self._count(feature, "semantic_hits")
+        return hit, value
+
+    def set(self, feature, model, key, value, vector=None):
+        self._count(feature, "misses")
+        self.backend.set(f"llm:{key}", value, self.ttl)
+        if self.semantic is not None and vector is not None:
+            self.semantic.add(feature, model, key, vector)
+
+    def stats(self):
+        """Returns {feature: {"exact_hits", "semantic_hits", "misses", "hit_rate"}}."""
+        with self._lock:
+            stats = {}
+            for feature, counts in self._stats.items():
+                total = sum(counts.values())
+                hits = counts["exact_hits"] + counts["semantic_hits"]
+                stats[feature] = dict(counts, hit_rate=hits / total if total else 0.0)
+            return stats
+
+# Shared cache for every GPT call in api/
+llm_cache = LLMCache(semantic=SemanticIndex() if LLM_SEMANTIC_CACHE else None)
@@ -0,0 +1,249 @@
+import re
+import threading
+import time
+
+import openai
+from openai import OpenAI
+
+from api.concurrency import RateLimiter
+from api.http_client import backoff_delay
+from api.telemetry import metrics
+from config import (
+    OPENAI_API_KEYS,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_POOL_MAX_ATTEMPTS,
+    LLM_POOL_QUEUE_TIMEOUT,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_QUOTA_COOLDOWN,
+)
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+metrics.describe("llm_pool_failovers_total", "GPT calls retried on another key, by reason.")
+metrics.describe("llm_pool_wait_seconds", "Time GPT calls waited for a key with capacity.")
+
+class LLMPoolExhausted(openai.OpenAIError):
+    """Raised when no key regains capacity within the queue timeout."""
+
+def parse_duration(value):
+    """Parses OpenAI reset durations such as "1s", "6m0s" or "20ms" into seconds."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class KeyState:
+    """One API key with its client, in-flight count and last known rate-limit headroom."""
+
+    def __init__(self, name, api_key, client):
+        self.name = name  # e.g. "key1"; the key itself never appears in metrics or logs
+        self.api_key = api_key
+        self.client = client
+        self.in_flight = 0
+        self.limit_requests = None
+        self.remaining_requests = None
+        self.limit_tokens = None
+        self.remaining_tokens = None
+        self.reset_at = 0.0        # when the remaining counts next refill
+        self.cooldown_until = 0.0  # set after a 429/5xx
+
+    def exhausted(self, now):
+        empty = self.remaining_requests == 0 or self.remaining_tokens == 0
+        return empty and now < self.reset_at
+
+    def ready_at(self, now):
+        """Earliest time this key can take another call."""
+        ready = max(now, self.cooldown_until)
+        return max(ready, self.reset_at) if self.exhausted(now) else ready
+
+    def headroom(self):
+        """Share of the request/token limits still left, from 0 to 1 (1 when unknown)."""
+        shares = [
+            remaining / limit
+            for remaining, limit in ((self.remaining_requests, self.limit_requests),
+                                     (self.remaining_tokens, self.limit_tokens))
+            if remaining is not None and limit
+        ]
+        return min(shares, default=1.0)
+
+    def update(self, headers, now):
+        """Reads x-ratelimit-* headers from an OpenAI response."""
+        if headers is None:
+            return
+        for attr, header in (("limit_requests", "x-ratelimit-limit-requests"),
+                             ("remaining_requests", "x-ratelimit-remaining-requests"),
+                             ("limit_tokens", "x-ratelimit-limit-tokens"),
+                             ("remaining_tokens", "x-ratelimit-remaining-tokens")):
+            value = header_int(headers, header)
+            if value is not None:
+                setattr(self, attr, value)
+        resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+        resets = [reset for reset in resets if reset is not None]
+        if resets:
+            self.reset_at = now + max(resets)
+
+class LLMClientPool:
+    """
+    One OpenAI client per API key. Each call goes to the key with the fewest
+    calls in flight (ties broken by rate-limit headroom from the response
+    headers). A 429, 5xx or connection error puts the key on cooldown and the
+    call is retried on another key with backoff. When every key is saturated,
+    callers wait for the first one to free up, up to LLM_POOL_QUEUE_TIMEOUT.
+    """
+
+    def __init__(self, api_keys=None, max_attempts=LLM_POOL_MAX_ATTEMPTS,
+                 queue_timeout=LLM_POOL_QUEUE_TIMEOUT, base_url=None):
+        api_keys = list(api_keys if api_keys is not None else OPENAI_API_KEYS)
+        if not api_keys:
+            raise ValueError("No OpenAI API keys found in the environment variables.")
+        # The pool does its own retries across keys, so the SDK must not retry on one key
+        self.keys = [
+            KeyState(f"key{i}", key, OpenAI(api_key=key, base_url=base_url, max_retries=0))
+            for i, key in enumerate(api_keys, 1)
+        ]
+        self.max_attempts = max_attempts
+        self.queue_timeout = queue_timeout
+        # Client-side requests-per-minute cap per key, on top of the server's limits
+        self.rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE)
+        self.queued = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [state for state in self.keys if state.ready_at(now) <= now]
+                if ready:
+                    state = min(ready, key=lambda s: (s.in_flight, -s.headroom()))
+                    state.in_flight += 1
+                    if state.remaining_requests:
+                        state.remaining_requests -= 1  # Until the response brings fresh numbers
+                    break
+                if now >= deadline:
+                    raise LLMPoolExhausted(f"All {len(self.keys)} OpenAI keys are rate limited")
+                wake = min(state.ready_at(now) for state in self.keys)
+                self.queued += 1
+                try:
+                    # Woken early when any call finishes and frees capacity
+                    self._cond.wait(min(wake, deadline) - now)
+                finally:
+                    self.queued -= 1
+        metrics.observe("llm_pool_wait_seconds", time.monotonic() - start)
+        self.rate_limiter.acquire(state.api_key)
+        return state
+
+    def _release(self, state, headers=None, cooldown=0.0):
+        now = time.monotonic()
+        with self._cond:
+            state.in_flight -= 1
+            state.update(headers, now)
+            if cooldown:
+                state.cooldown_until = max(state.cooldown_until, now + cooldown)
+            self._cond.notify_all()
+
+    def _cooldown(self, error, attempt):
+        """Returns (reason, seconds) for a retryable error, or None if it should propagate."""
+        if isinstance(error, openai.RateLimitError):
+            if getattr(error, "code", None) == "insufficient_quota":
+                return "quota", LLM_QUOTA_COOLDOWN
+            headers = error.response.headers
+            retry_after_ms = header_int(headers, "retry-after-ms")
+            wait = (retry_after_ms / 1000 if retry_after_ms is not None else None) \
+                or parse_duration(headers.get("retry-after")) \
+                or parse_duration(headers.get("x-ratelimit-reset-requests")) \
+                or backoff_delay(attempt, None, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+            return "429", min(wait, LLM_BACKOFF_MAX)
+        if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+            return "5xx", backoff_delay(attempt, None, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+        if isinstance(error, openai.APIConnectionError):
+            return "connection", backoff_delay(attempt, None, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+        return None
+
+    def _call(self, operation):
+        """
+        Runs operation(client) -> raw response on the least-loaded key, failing
+        over to other keys on retryable errors. Returns (raw response, key state);
+        the caller must release the key.
+        """
+        error = None
+        for attempt in range(self.max_attempts):
+            state = self._acquire()
+            try:
+                return operation(state.client), state
+            except Exception as e:
+                retry = self._cooldown(e, attempt)
+                headers = e.response.headers if isinstance(e, openai.APIStatusError) else None
+                self._release(state, headers, retry[1] if retry else 0.0)
+                if retry is None:
+                    raise
+                metrics.inc("llm_pool_failovers_total", reason=retry[0])
+                error = e
+        raise error
+
+    def chat_completion(self, **kwargs):
+        """chat.completions.create on the pool; returns the parsed ChatCompletion."""
+        raw, state = self._call(lambda client: client.chat.completions.with_raw_response.create(**kwargs))
+        self._release(state, raw.headers)
+        return raw.parse()
+
+    def stream_chat_completion(self, **kwargs):
+        """
+        Streaming chat.completions.create on the pool, yielding chunks. The key
+        counts as busy until the stream ends. Failover only happens before the
+        first chunk, since a partial answer cannot be replayed on another key.
+        """
+        raw, state = self._call(lambda client: client.chat.completions.with_raw_response.create(stream=True, **kwargs))
+        try:
+            yield from raw.parse()
+        finally:
+            self._release(state, raw.headers)
+
+    def embedding(self, **kwargs):
+        """embeddings.create on the pool; returns the parsed response."""
+        raw, state = self._call(lambda client: client.embeddings.with_raw_response.create(**kwargs))
+        self._release(state, raw.headers)
+        return raw.parse()
+
+    def stats(self):
+        """Per-key load and headroom plus the number of queued calls."""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "queued": self.queued,
+                "keys": {
+                    state.name: {
+                        "in_flight": state.in_flight,
+                        "remaining_requests": state.remaining_requests,
+                        "remaining_tokens": state.remaining_tokens,
+                        "cooling_down": state.cooldown_until > now,
+                        "exhausted": state.exhausted(now),
+                    }
+                    for state in self.keys
+                },
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_llm_pool():
+    """Returns the shared pool, created on first use from OPENAI_API_KEY_<n>."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMClientPool()
+        return _pool
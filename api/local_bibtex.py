@@ -0,0 +1,171 @@
+import re
+import string
+import unicodedata
+from collections import Counter
+
+# Characters with a special meaning in BibTeX/LaTeX and their escaped forms
+SPECIAL_CHARS = {
+    "\\": r"\textbackslash{}",
+    "{": r"\{",
+    "}": r"\}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+SPECIAL = re.compile("|".join(re.escape(char) for char in SPECIAL_CHARS))
+# Words whose capitalisation BibTeX styles must not change (BERT, GPT-4, ImageNet)
+PROTECTED_WORD = re.compile(r"\S*[A-Za-z0-9]\S*[A-Z]\S*")
+CONFERENCE_VENUE = re.compile(r"\b(?:conference|proceedings|symposium|workshop|meeting)\b", re.IGNORECASE)
+MISSING = ("unknown", "unknown title", "n/a", "")
+# Leading words skipped when picking the title word of a citation key
+KEY_SKIP_WORDS = {"a", "an", "the", "on", "of", "in", "for", "to", "and", "with", "towards", "toward"}
+PREPRINT_VENUES = {"arxiv", "arxiv.org", "biorxiv", "medrxiv", "ssrn"}
+
+def escape_bibtex(text):
+    """Escapes BibTeX/LaTeX special characters in a field value."""
+    return SPECIAL.sub(lambda m: SPECIAL_CHARS[m.group(0)], str(text))
+
+def protect_title(title):
+    """Escapes a title and braces mixed-case words so styles keep their capitalisation."""
+    return " ".join(
+        f"{{{word}}}" if PROTECTED_WORD.fullmatch(word) else word
+        for word in escape_bibtex(title).split()
+    )
+
+def ascii_fold(text):
+    """Lowercase ASCII letters and digits only, e.g. "Müller-Lyer" -> "mullerlyer"."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def known(value):
+    return value is not None and str(value).strip().lower() not in MISSING
+
+def split_name(name):
+    """Splits "First Middle Last" into ("Last", "First Middle")."""
+    parts = name.split()
+    if len(parts) < 2:
+        return name, ""
+    return parts[-1], " ".join(parts[:-1])
+
+def format_author(name):
+    last, first = split_name(name.strip())
+    return f"{escape_bibtex(last)}, {escape_bibtex(first)}" if first else escape_bibtex(last)
+
+def citation_key(paper):
+    """
+    Stable key of the form <first author surname><year><first title word>
+    (e.g. "vaswani2017attention"). Falls back to the paper ID when no part of
+    it is known, so the same paper always gets the same key.
+    """
+    authors = [a for a in paper.get("authors") or [] if known(a)]
+    surname = ascii_fold(split_name(authors[0])[0]) if authors else ""
+    year = str(paper["year"]) if known(paper.get("year")) else ""
+    title_word = ""
+    if known(paper.get("title")):
+        words = [ascii_fold(word) for word in paper["title"].split()]
+        title_word = next((word for word in words if word and word not in KEY_SKIP_WORDS), "")
+    key = f"{surname}{year}{title_word}"
+    return key or f"paper{ascii_fold(str(paper.get('id', '')))[:12]}"
+
+def key_suffix(index):
+    """"a", "b", ..., "z", then "aa", "bb", ..."""
+    return string.ascii_lowercase[index % 26] * (index // 26 + 1)
+
+def citation_keys(papers):
+    """
+    Citation keys for the papers of one export, by paper ID. Papers that would
+    share a key (e.g. two 2020 papers by Smith on "Learning ...") all get "a",
+    "b", ... suffixes in export order, so every key in the export is unique.
+    """
+    unique = list({str(paper.get("id")): paper for paper in papers}.items())
+    keys = [citation_key(paper) for _, paper in unique]
+    counts = Counter(keys)
+    used = Counter()
+    result = {}
+    for (pid, _), key in zip(unique, keys):
+        if counts[key] > 1:
+            suffix = key_suffix(used[key])
+            used[key] += 1
+            key += suffix
+        result[pid] = key
+    return result
+
+def entry_type(paper):
+    """Picks @inproceedings, @article or @misc from the publication types and venue."""
+    types = set(paper.get("publication_types") or [])
+    venue = paper.get("venue") or ""
+    if venue.lower() in PREPRINT_VENUES or str(paper.get("journal") or "").lower() in PREPRINT_VENUES:
+        return "misc"
+    if "Conference" in types or (venue and CONFERENCE_VENUE.search(venue)):
+        return "inproceedings"
+    if "JournalArticle" in types or known(paper.get("journal")):
+        return "article"
+    return "misc"
+
+def missing_fields(paper):
+    """Required fields the local entry cannot fill, e.g. ["author", "year"]."""
+    missing = []
+    if not known(paper.get("title")):
+        missing.append("title")
+    if not any(known(a) for a in paper.get("authors") or []):
+        missing.append("author")
+    if not known(paper.get("year")):
+        missing.append("year")
+    return missing
+
+def format_bibtex(paper, key=None):
+    """
+    Builds a BibTeX entry from a paper dict returned by search_papers, using
+    only the metadata it already carries (no network or LLM call).
+
+    :param key: Citation key from citation_keys; defaults to citation_key(paper).
+    """
+    kind = entry_type(paper)
+    external_ids = paper.get("external_ids") or {}
+    venue = paper.get("venue")
+    journal = paper.get("journal") if known(paper.get("journal")) else venue
+
+    fields = []
+    if known(paper.get("title")):
+        fields.append(("title", protect_title(paper["title"])))
+    authors = [a for a in paper.get("authors") or [] if known(a)]
+    if authors:
+        fields.append(("author", " and ".join(format_author(a) for a in authors)))
+    if kind == "inproceedings" and known(venue):
+        fields.append(("booktitle", escape_bibtex(venue)))
+    if kind == "article" and known(journal):
+        fields.append(("journal", escape_bibtex(journal)))
+        if known(paper.get("volume")):
+            fields.append(("volume", escape_bibtex(paper["volume"])))
+        if known(paper.get("pages")):
+            # BibTeX page ranges use an en dash ("--")
+            fields.append(("pages", re.sub(r"\s*[-–]+\s*", "--", escape_bibtex(paper["pages"]).strip())))
+    if known(paper.get("year")):
+        fields.append(("year", str(paper["year"])))
+
+    doi = external_ids.get("DOI")
+    arxiv = external_ids.get("ArXiv")
+    # DOIs, eprints and URLs are verbatim fields, so they are not escaped
+    if doi:
+        fields.append(("doi", doi))
+    if arxiv:
+        fields.append(("eprint", arxiv))
+        fields.append(("archivePrefix", "arXiv"))
+    if doi:
+        url = f"https://doi.org/{doi}"
+    elif arxiv:
+        url = f"https://arxiv.org/abs/{arxiv}"
+    else:
+        pdf = paper.get("pdf") or ""
+        url = pdf if pdf.startswith("http") else ""
+    if url:
+        fields.append(("url", url))
+    if kind == "misc" and arxiv:
+        fields.append(("howpublished", f"arXiv preprint arXiv:{escape_bibtex(arxiv)}"))
+
+    body = ",\n".join(f"  {name} = {{{value}}}" for name, value in fields)
+    return f"@{kind}{{{key or citation_key(paper)},\n{body}\n}}"
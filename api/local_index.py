@@ -0,0 +1,198 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # The vector tier is skipped without numpy; BM25 still works
+    np = None
+
+from api.local_keywords import STOPWORDS
+from api.paper import Paper
+from api.serialization import dumps, loads
+from config import (
+    LOCAL_INDEX_PATH,
+    LOCAL_INDEX_MIN_COVERAGE,
+    LOCAL_INDEX_MIN_RESULTS,
+    LOCAL_INDEX_VECTOR_WEIGHT,
+)
+
+EMBEDDING_DIM = 256
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Hashed embeddings of unrelated titles still overlap a little; ignore that noise
+VECTOR_MIN_SIMILARITY = 0.3
+
+def tokenize(text):
+    """Lowercased content words with a light plural strip, shared by documents and queries."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+def embed_tokens(tokens):
+    """
+    Hashed bag-of-words plus character-trigram embedding. It needs no model or
+    network and is good enough to rank near matches (e.g. "network" vs "networks").
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in tokens:
+        features = [token] + [token[i:i + 3] for i in range(len(token) - 2)]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % EMBEDDING_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def document_text(paper):
+    return f"{paper.get('title', '')} {' '.join(paper.get('authors', []))}"
+
+class LocalPaperIndex:
+    """
+    Local store of every paper the search API has returned. Papers are kept in
+    SQLite; on load an in-memory inverted index (BM25) and a NumPy embedding
+    matrix (cosine similarity) are rebuilt from it.
+    """
+
+    def __init__(self, path=LOCAL_INDEX_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.papers = []            # doc number -> paper dict
+        self.doc_ids = {}           # paper id -> doc number
+        self.postings = defaultdict(dict)  # term -> {doc number: term frequency}
+        self.doc_lengths = []
+        self.vectors = []
+        self._matrix = None
+
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS papers (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            rows = self._conn.execute("SELECT data FROM papers ORDER BY rowid").fetchall()
+            for (data,) in rows:
+                self._add(Paper.from_dict(loads(data)))
+
+    def __len__(self):
+        return len(self.papers)
+
+    def _add(self, paper):
+        pid = str(paper.get("id"))
+        if pid in self.doc_ids:
+            # Refresh metadata (e.g. citation count) but keep the indexed terms
+            self.papers[self.doc_ids[pid]] = paper
+            return
+        doc = len(self.papers)
+        tokens = tokenize(document_text(paper))
+        self.doc_ids[pid] = doc
+        self.papers.append(paper)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings[term][doc] = tf
+        if np is not None:
+            self.vectors.append(embed_tokens(tokens))
+            self._matrix = None
+
+    def get(self, pid):
+        """Returns the indexed paper with this ID, or None."""
+        with self._lock:
+            doc = self.doc_ids.get(str(pid))
+            return self.papers[doc] if doc is not None else None
+
+    def ingest(self, papers):
+        """Adds or refreshes papers returned by search_papers."""
+        if not isinstance(papers, list) or not papers:
+            return
+        with self._lock, self._conn:
+            for paper in papers:
+                if not isinstance(paper, (dict, Paper)) or paper.get("id") is None:
+                    continue
+                if isinstance(paper, dict):
+                    paper = Paper.from_dict(paper)
+                self._add(paper)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO papers (id, data) VALUES (?, ?)",
+                    (paper.id, dumps(paper))
+                )
+
+    def search(self, query, limit=10):
+        """
+        Returns up to limit (score, coverage, paper) tuples ranked by a blend of
+        normalized BM25 and embedding cosine similarity. coverage is the
+        IDF-weighted share of query terms found in the paper, so missing a rare
+        term (one the index has never seen counts as rarest) costs far more
+        than missing a common one.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not terms or not self.papers:
+                return []
+            total = len(self.papers)
+            avg_length = sum(self.doc_lengths) / total or 1.0
+
+            bm25 = defaultdict(float)
+            matched = defaultdict(float)  # doc -> summed IDF of the query terms it contains
+            query_weight = 0.0
+            for term in terms:
+                postings = self.postings.get(term) or {}
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                query_weight += idf
+                for doc, tf in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc] / avg_length
+                    bm25[doc] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                    matched[doc] += idf
+
+            docs = set(bm25)
+            cosine = {}
+            if np is not None:
+                if self._matrix is None:
+                    self._matrix = np.vstack(self.vectors)
+                scores = self._matrix @ embed_tokens(terms)
+                # Vector candidates catch papers that share no exact term with the query
+                nearest = np.argpartition(-scores, limit)[:limit] if len(scores) > limit else range(len(scores))
+                docs.update(int(doc) for doc in nearest if scores[doc] >= VECTOR_MIN_SIMILARITY)
+                cosine = {doc: float(scores[doc]) for doc in docs}
+            if not docs:
+                return []
+
+            top_bm25 = max(bm25.values(), default=0.0) or 1.0
+            candidates = [(doc, self.papers[doc]) for doc in docs]
+
+        weight = LOCAL_INDEX_VECTOR_WEIGHT if np is not None else 0.0
+        results = [
+            (
+                (1 - weight) * bm25.get(doc, 0.0) / top_bm25 + weight * cosine.get(doc, 0.0),
+                matched.get(doc, 0.0) / query_weight,
+                paper
+            )
+            for doc, paper in candidates
+        ]
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results[:limit]
+
+    def lookup(self, query, limit=10):
+        """
+        Answers a search locally when enough indexed papers cover the query;
+        returns the papers, or None if the API should be asked instead.
+        """
+        results = self.search(query, limit * 3)
+        confident = [paper for _, coverage, paper in results if coverage >= LOCAL_INDEX_MIN_COVERAGE]
+        return confident[:limit] if len(confident) >= LOCAL_INDEX_MIN_RESULTS else None
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_local_index():
+    """Returns the shared index, loading it from disk on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LocalPaperIndex()
+        return _index
@@ -0,0 +1,151 @@
+import re
+
+# Abbreviations expanded before scoring, as the LLM prompt asks for
+ABBREVIATIONS = {
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "nlp": "natural language processing",
+    "nlu": "natural language understanding",
+    "nlg": "natural language generation",
+    "cv": "computer vision",
+    "rl": "reinforcement learning",
+    "llm": "large language model",
+    "llms": "large language models",
+    "gan": "generative adversarial network",
+    "gans": "generative adversarial networks",
+    "cnn": "convolutional neural network",
+    "cnns": "convolutional neural networks",
+    "rnn": "recurrent neural network",
+    "rnns": "recurrent neural networks",
+    "gnn": "graph neural network",
+    "gnns": "graph neural networks",
+    "lstm": "long short-term memory",
+    "nn": "neural network",
+    "ir": "information retrieval",
+    "qa": "question answering",
+    "asr": "automatic speech recognition",
+    "tts": "text to speech",
+    "ner": "named entity recognition",
+    "iot": "internet of things",
+    "hci": "human computer interaction",
+    "vr": "virtual reality",
+    "ar": "augmented reality",
+    "xai": "explainable artificial intelligence",
+    "slam": "simultaneous localization and mapping",
+    "mri": "magnetic resonance imaging",
+    "svm": "support vector machine",
+    "vae": "variational autoencoder",
+    "rag": "retrieval augmented generation",
+}
+
+STOPWORDS = {
+    "a", "about", "above", "after", "all", "also", "am", "an", "and", "any", "are", "around", "as", "at",
+    "be", "been", "being", "between", "both", "but", "by", "can", "could", "did", "do", "does", "doing",
+    "for", "from", "further", "get", "had", "has", "have", "having", "he", "her", "here", "him", "his",
+    "how", "i", "if", "in", "into", "is", "it", "its", "just", "like", "me", "more", "most", "my", "of",
+    "on", "or", "other", "our", "out", "over", "please", "she", "should", "so", "some", "such", "than",
+    "that", "the", "their", "them", "then", "there", "these", "they", "this", "those", "through", "to",
+    "too", "under", "up", "us", "very", "was", "we", "were", "what", "when", "where", "which", "while",
+    "who", "why", "will", "with", "would", "you", "your",
+    # Words that describe the request rather than the topic
+    "find", "search", "show", "give", "want", "need", "looking", "look", "interested", "study", "studies",
+    "paper", "papers", "article", "articles", "research", "work", "works", "related", "regarding",
+    "recent", "latest", "new", "good", "best", "some", "topic", "topics", "learn", "know", "read",
+}
+
+NEGATION = re.compile(
+    r"\b(?:but\s+)?(?:not|no|without|excluding|except|exclude|avoid|"
+    r"(?:don'?t|do\s+not)\s+(?:include|want|need))\s+"
+    r"([^,.;!?]+?)(?=\s+(?:and|but|or)\b|[,.;!?]|$)",
+    re.IGNORECASE,
+)
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9\-]*")
+
+def expand_abbreviations(text):
+    return WORD.sub(lambda m: ABBREVIATIONS.get(m.group(0).lower(), m.group(0)), text)
+
+def drop_negations(text):
+    """
+    Removes "not X"-style clauses. Only the negated clause goes: its words stay
+    usable elsewhere, as in "reinforcement learning, not deep learning".
+    """
+    return NEGATION.sub(" , ", text)
+
+def candidate_phrases(text):
+    """Splits text into runs of content words (RAKE candidates) at stopwords and punctuation."""
+    phrases = []
+    current = []
+    for token in re.findall(r"[A-Za-z][A-Za-z0-9\-]*|[^\sA-Za-z]", text):
+        word = token.lower()
+        if not WORD.fullmatch(token) or word in STOPWORDS or len(word) < 2:
+            if current:
+                phrases.append(current)
+                current = []
+            continue
+        current.append(word)
+    if current:
+        phrases.append(current)
+    return phrases
+
+def expansion_words(text):
+    """Content words of every abbreviation expansion in text, one set per expansion."""
+    lowered = text.lower()
+    return [
+        {word for word in WORD.findall(expansion) if word not in STOPWORDS and len(word) >= 2}
+        for expansion in set(ABBREVIATIONS.values())
+        if re.search(rf"\b{re.escape(expansion)}\b", lowered)
+    ]
+
+def extract_keywords_local(text, max_words=6):
+    """
+    Builds a short search phrase locally: expands abbreviations, drops negated
+    topics, scores RAKE candidate phrases (word degree / frequency, with a small
+    bonus for appearing early) and keeps the best whole phrases in reading order.
+
+    Returns (phrase, word_count, partial). partial is True when the phrase is
+    likely to misrepresent the query: a single word, a candidate phrase cut to
+    fit max_words, or an expanded abbreviation that did not make it in whole.
+    Callers with an LLM at hand should use it for partial results.
+    """
+    text = drop_negations(expand_abbreviations(text))
+    phrases = candidate_phrases(text)
+    if not phrases:
+        return "", 0, True
+
+    frequency = {}
+    degree = {}
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word] = frequency.get(word, 0) + 1
+            degree[word] = degree.get(word, 0) + len(phrase)
+
+    scored = []
+    for position, phrase in enumerate(phrases):
+        score = sum(degree[word] / frequency[word] for word in phrase)
+        scored.append((score + 1.0 / (position + 1), position, phrase))
+
+    chosen = []
+    seen = set()  # Whole phrases, so a word shared by two phrases ("reality" in AR and VR) stays in both
+    word_count = 0
+    truncated = False
+    for _, position, phrase in sorted(scored, reverse=True):
+        if tuple(phrase) in seen:
+            continue
+        words = phrase
+        if word_count + len(words) > max_words:
+            # Skip phrases that would be cut in half, unless nothing fits at all
+            if chosen:
+                continue
+            words = words[:max_words]
+            truncated = True
+        chosen.append((position, words))
+        seen.add(tuple(phrase))
+        word_count += len(words)
+        if word_count >= max_words:
+            break
+
+    words = [word for _, phrase in sorted(chosen) for word in phrase]
+    kept = set(words)
+    partial = len(words) < 2 or truncated or any(not expansion <= kept for expansion in expansion_words(text))
+    return " ".join(words), len(words), partial
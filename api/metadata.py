@@ -0,0 +1,180 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from api.cache import response_cache
+from api.concurrency import fetch_all
+from api.http_client import upstream
+from api.local_index import get_local_index
+from api.paper import Paper
+from api.telemetry import span
+from config import (
+    BIBTEX_BATCH_SIZE,
+    CACHE_TTL_BIBTEX,
+    CACHE_TTL_BIBTEX_MISSING,
+    BIBTEX_PREFETCH_WAIT,
+)
+
+BIBTEX_PATH = "/api/bibtex"
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=2)
+_prefetching = {}  # corpus id -> Future of the prefetch batch that covers it
+_prefetch_lock = threading.Lock()
+
+def corpus_id_of(paper):
+    """Returns the CorpusId of a Paper from search_papers (or a paper dict), or None."""
+    corpus_id = (paper.get("external_ids") or {}).get("CorpusId")
+    return str(corpus_id) if corpus_id is not None else None
+
+def resolve_corpus_ids(paper_ids, papers=None):
+    """
+    Maps the paper IDs used by the UI (Semantic Scholar paperId hashes) to the
+    CorpusIds the BibTeX endpoint expects, using the external_ids returned by
+    search_papers or, failing that, the local paper index. Numeric IDs are
+    already CorpusIds.
+
+    :return: Dict paper_id -> CorpusId for every ID that could be resolved.
+    """
+    by_id = {str(p.get("id")): p for p in papers or [] if isinstance(p, (dict, Paper))}
+    index = None
+    resolved = {}
+    for pid in paper_ids:
+        pid = str(pid)
+        if pid.isdigit():
+            resolved[pid] = pid
+            continue
+        paper = by_id.get(pid)
+        if paper is None:
+            index = index or get_local_index()
+            paper = index.get(pid)
+        corpus_id = corpus_id_of(paper) if paper else None
+        if corpus_id:
+            resolved[pid] = corpus_id
+    return resolved
+
+def entry_corpus_id(entry):
+    for key in ("corpusId", "CorpusId", "corpus_id"):
+        if entry.get(key) is not None:
+            return str(entry[key])
+    corpus_id = (entry.get("externalIds") or {}).get("CorpusId")
+    return str(corpus_id) if corpus_id is not None else None
+
+def fetch_bibtex_chunk(corpus_ids, paper_ids=None):
+    """
+    Fetches BibTeX for several CorpusIds in one request. Entries without a
+    CorpusId are matched by their paperId; only entries that match neither are
+    looked up one by one (concurrently).
+
+    :param paper_ids: Optional dict paper_id -> CorpusId for the chunk.
+    :return: Dict corpus_id -> BibTeX string, or None when the endpoint has no
+             entry. CorpusIds whose lookup failed are left out.
+    """
+    data = upstream.get_json(BIBTEX_PATH, params={"id": ",".join(f"CorpusId:{cid}" for cid in corpus_ids)})
+    entries = data.get("papers") or []
+    if len(corpus_ids) == 1:
+        return {corpus_ids[0]: entries[0].get("bibtex") if entries else None}
+
+    found = {}
+    for entry in entries:
+        corpus_id = entry_corpus_id(entry) or (paper_ids or {}).get(str(entry.get("paperId")))
+        if corpus_id in corpus_ids:
+            found[corpus_id] = entry.get("bibtex")
+
+    unmatched = [cid for cid in corpus_ids if cid not in found]
+    found.update(fetch_bibtex_singles(unmatched))
+    return found
+
+def fetch_bibtex_singles(corpus_ids):
+    """Looks CorpusIds up one by one (concurrently), leaving out the ones whose lookup failed."""
+    found = {}
+    for single in fetch_all(lambda cid: fetch_bibtex_chunk([cid]), corpus_ids, on_error=lambda cid, e: {}):
+        found.update(single)
+    return found
+
+def fetch_bibtex_batch(corpus_ids, paper_ids=None):
+    """
+    Fetches and caches BibTeX for any number of CorpusIds in chunked bulk requests.
+
+    :param paper_ids: Optional dict paper_id -> CorpusId, used to match entries
+                      that come back without a CorpusId.
+    """
+    corpus_ids = list(dict.fromkeys(corpus_ids))
+    chunks = [corpus_ids[i:i + BIBTEX_BATCH_SIZE] for i in range(0, len(corpus_ids), BIBTEX_BATCH_SIZE)]
+    results = {}
+    # A failed bulk request (4xx, timeout) falls back to per-ID lookups for its chunk
+    for chunk_result in fetch_all(
+        lambda chunk: fetch_bibtex_chunk(chunk, paper_ids), chunks,
+        on_error=lambda chunk, e: fetch_bibtex_singles(chunk) if len(chunk) > 1 else {}
+    ):
+        results.update(chunk_result)
+    for corpus_id, bibtex in results.items():
+        # Misses are remembered briefly so they do not hit the endpoint on every click
+        ttl = CACHE_TTL_BIBTEX if bibtex else CACHE_TTL_BIBTEX_MISSING
+        response_cache.set("bibtex", corpus_id, bibtex, ttl)
+    return results
+
+def wait_for_prefetch(corpus_ids):
+    with _prefetch_lock:
+        futures = {_prefetching[cid] for cid in corpus_ids if cid in _prefetching}
+    if futures:
+        wait(futures, timeout=BIBTEX_PREFETCH_WAIT)
+
+def get_bibtex_entries(paper_ids, papers=None):
+    """
+    Returns {paper_id: BibTeX string or None} for a whole selection, served from
+    the cache (or an in-flight prefetch) where possible and with the rest
+    fetched in bulk. None means the endpoint has no entry for that paper.
+    """
+    with span("bibtex") as current:
+        corpus_ids = resolve_corpus_ids(paper_ids, papers)
+        wait_for_prefetch(corpus_ids.values())
+
+        bibtex_by_corpus_id = {}
+        missing = []
+        for corpus_id in set(corpus_ids.values()):
+            hit, bibtex = response_cache.get("bibtex", corpus_id)
+            if hit:
+                bibtex_by_corpus_id[corpus_id] = bibtex
+            else:
+                missing.append(corpus_id)
+        current.set(cache_hit=not missing, papers=len(paper_ids), unresolved=len(paper_ids) - len(corpus_ids),
+                    fetched=len(missing))
+        if missing:
+            bibtex_by_corpus_id.update(fetch_bibtex_batch(missing, corpus_ids))
+
+    return {str(pid): bibtex_by_corpus_id.get(corpus_ids.get(str(pid))) for pid in paper_ids}
+
+def prefetch_bibtex(papers, submit=None):
+    """
+    Starts fetching BibTeX for freshly returned search results in the
+    background, so "Get BibTeX Reference" finds it already cached.
+
+    :param submit: Optional executor-style submit(fn) returning a Future (e.g.
+                   the prefetch scheduler's); defaults to a small thread pool.
+    """
+    if not isinstance(papers, list):
+        return None
+    paper_ids = {
+        str(p.get("id")): corpus_id_of(p) for p in papers if isinstance(p, (dict, Paper)) and corpus_id_of(p)
+    }
+    corpus_ids = list(paper_ids.values())
+    if not corpus_ids:
+        return None
+
+    def run():
+        missing = [cid for cid in corpus_ids if not response_cache.contains("bibtex", cid)]
+        if missing:
+            fetch_bibtex_batch(missing, paper_ids)
+
+    def forget(future):
+        # Also runs when a queued prefetch is cancelled before it starts
+        with _prefetch_lock:
+            for cid in corpus_ids:
+                if _prefetching.get(cid) is future:
+                    del _prefetching[cid]
+
+    with _prefetch_lock:
+        future = (submit or _prefetch_executor.submit)(run)
+        for cid in corpus_ids:
+            _prefetching[cid] = future
+    future.add_done_callback(forget)
+    return future
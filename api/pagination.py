@@ -0,0 +1,18 @@
+import base64
+import json
+
+def encode_cursor(**state):
+    """Packs pagination state (e.g. query and offset) into an opaque URL-safe cursor."""
+    data = json.dumps(state, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Unpacks a cursor from encode_cursor, raising ValueError if it is malformed."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field, fields
+
+# The only external IDs anything downstream reads (BibTeX, local index); the
+# full map from the API (MAG, ACL, PubMed, ...) is dropped when parsing
+KEPT_EXTERNAL_IDS = ("CorpusId", "DOI", "ArXiv")
+
+@dataclass(slots=True)
+class Paper:
+    """
+    One search result. A slotted record instead of a dict keeps cached searches
+    small; get() and [] give the same read access as the old paper dicts.
+    """
+
+    id: str
+    title: str = "Unknown Title"
+    authors: tuple = ()
+    citations: int = 0
+    pdf: str = "No PDF available"
+    external_ids: dict = field(default_factory=dict)
+    # Bibliographic details used to build BibTeX entries locally
+    year: int = None
+    venue: str = ""
+    journal: str = ""
+    volume: str = ""
+    pages: str = ""
+    publication_types: tuple = ()
+
+    @classmethod
+    def from_api(cls, paper):
+        """Builds a Paper from one entry of the paper_search API response."""
+        external_ids = paper.get("externalIds") or {}
+        corpus_id = external_ids.get("CorpusId", "Unknown")
+
+        # Safe handling for missing PDF links
+        pdf_links = paper.get("pdfs", [])
+        journal = paper.get("journal") or {}
+
+        return cls(
+            id=str(paper.get("paperId", corpus_id)),  # Use paperId if available, else CorpusId
+            title=paper.get("title", "Unknown Title"),
+            authors=tuple(author.get("name", "Unknown") for author in paper.get("authors", [])),
+            citations=paper.get("citationCount", 0),
+            pdf=pdf_links[0] if pdf_links else "No PDF available",
+            external_ids={name: external_ids[name] for name in KEPT_EXTERNAL_IDS if name in external_ids},
+            year=paper.get("year"),
+            venue=paper.get("venue") or "",
+            journal=journal.get("name") or "",
+            volume=journal.get("volume") or "",
+            pages=journal.get("pages") or "",
+            publication_types=tuple(paper.get("publicationTypes") or ()),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a Paper from its to_dict() form (e.g. read back from SQLite or a backend response)."""
+        known = {name: data[name] for name in FIELD_NAMES if name in data}
+        known["id"] = str(data.get("id"))
+        for name in ("authors", "publication_types"):
+            if name in known:
+                known[name] = tuple(known[name] or ())
+        return cls(**known)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELD_NAMES}
+
+    def get(self, name, default=None):
+        return getattr(self, name) if name in FIELD_NAMES else default
+
+    def __getitem__(self, name):
+        if name not in FIELD_NAMES:
+            raise KeyError(name)
+        return getattr(self, name)
+
+FIELD_NAMES = frozenset(f.name for f in fields(Paper))
+
+def as_papers(items):
+    """Converts paper dicts (from a JSON cache or the backend) to Papers; Papers pass through."""
+    return [item if isinstance(item, Paper) else Paper.from_dict(item) for item in items if item]
@@ -1,46 +1,203 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
-PAPER_SEARCH_URL = "http://recommendpapers.xyz/api/paper_search"
+from api.cache import response_cache
+from api.http_client import upstream
+from api.local_index import get_local_index
+from api.pagination import decode_cursor, encode_cursor
+from api.paper import Paper, as_papers
+from api.telemetry import span
+from config import (
+    CACHE_TTL_SEARCH,
+    LOCAL_INDEX_MODE,
+    LOCAL_INDEX_MERGE_EXTRA,
+    SEARCH_PAGE_SIZE,
+    SEARCH_MAX_RESULTS,
+)
 
-def search_papers(query):
-    """Fetches and parses research papers from the API."""
-    params = {
+PAPER_SEARCH_PATH = "/api/paper_search"
+# Every field here is read by a view: labels and PDF links (title, authors,
+# citationCount), BibTeX (externalIds, year, venue, journal, publicationTypes)
+SEARCH_FIELDS = "title,authors,citationCount,externalIds,paperId,year,venue,journal,publicationTypes"
+
+# Background API refreshes for queries the local index answered
+_refresh_executor = ThreadPoolExecutor(max_workers=2)
+
+def search_params(query, offset=0):
+    return {
         "query": query,
-        "limit": 10,  # Fetch 3 results
-        "fields": "title,authors,citationCount,externalIds,paperId",
+        "offset": offset,
+        "limit": SEARCH_PAGE_SIZE,
+        "fields": SEARCH_FIELDS,
         "get_pdfs": "True"
     }
 
+def parse_papers(api_response):
+    """Parses the paper_search API response into Paper records, raising ValueError if malformed."""
+    # Ensure 'papers' key exists and is a list
+    if not isinstance(api_response.get("papers"), list):
+        raise ValueError("'papers' should be a list but got something else.")
+    return [Paper.from_api(paper) for paper in api_response["papers"]]
+
+def fetch_papers(query, offset=0):
+    """Fetches and parses one page of research papers from the API, raising on failure."""
+    # Fetch data from API
+    response = upstream.get(PAPER_SEARCH_PATH, params=search_params(query, offset))
+    response.raise_for_status()  # Raise error if request fails
+    return parse_papers(response.json())
+
+def fetch_and_index(query, offset=0):
+    """Fetches papers from the API and adds them to the local index."""
+    papers = fetch_papers(query, offset)
+    if LOCAL_INDEX_MODE != "off":
+        get_local_index().ingest(papers)
+    return papers
+
+def page_key(query, offset=0):
+    """
+    Cache key of a results page. Searches that differ only in case or spacing
+    share one cache entry, and one upstream call while it is in flight.
+    """
+    key = " ".join(query.lower().split())
+    return key if offset == 0 else f"{key}\x1foffset={offset}"
+
+def refresh_in_background(query):
+    """
+    Fetches the API's first page for a locally answered query in the background,
+    so the index picks up new papers and its answers do not go stale. A fresh
+    cached page means the index already has those papers, so nothing is sent.
+    """
+    def refresh():
+        try:
+            response_cache.get_or_fetch("search", page_key(query), lambda: fetch_and_index(query), ttl=CACHE_TTL_SEARCH)
+        except (requests.RequestException, ValueError):
+            pass  # The next search for this query tries again
+
+    _refresh_executor.submit(refresh)
+
+def merge_local(query, papers):
+    """Appends up to LOCAL_INDEX_MERGE_EXTRA locally indexed matches not already in papers."""
+    seen = {str(paper.get("id")) for paper in papers}
+    extra = [
+        paper for _, coverage, paper in get_local_index().search(query, len(papers) + LOCAL_INDEX_MERGE_EXTRA)
+        if coverage > 0 and str(paper.get("id")) not in seen
+    ]
+    return papers + extra[:LOCAL_INDEX_MERGE_EXTRA]
+
+def search_papers(query):
+    """
+    Fetches and parses research papers. With LOCAL_INDEX_MODE="first", queries the
+    local index answers confidently are returned without waiting for the network
+    (the API is still asked in the background); otherwise repeat queries are
+    served from the cache and new ones from the API.
+    """
+    papers, _ = search_first_page(query)
+    return papers
+
+def search_first_page(query):
+    """search_papers, also returning where the papers came from ("local_index" or "api")."""
+    with span("paper_search") as current:
+        if LOCAL_INDEX_MODE == "first":
+            papers = get_local_index().lookup(query)
+            if papers is not None:
+                current.set(source="local_index", results=len(papers))
+                refresh_in_background(query)
+                return papers, "local_index"
+
+        current.set(source="api", cache_hit=response_cache.contains("search", page_key(query)))
+        try:
+            # as_papers revives the dicts a JSON (SQLite) cache backend hands back
+            papers = as_papers(response_cache.get_or_fetch("search", page_key(query), lambda: fetch_and_index(query), ttl=CACHE_TTL_SEARCH))
+        except (requests.RequestException, ValueError) as e:
+            current.set(error=str(e))
+            return {"error": str(e)}, "api"
+
+        if LOCAL_INDEX_MODE == "merge":
+            papers = merge_local(query, papers)
+        current.set(results=len(papers))
+        return papers, "api"
+
+def next_cursor(query, offset, count):
+    """Cursor for the page after one of count papers at offset, or None once a short page or the result cap is reached."""
+    following = offset + SEARCH_PAGE_SIZE
+    if count < SEARCH_PAGE_SIZE or following + SEARCH_PAGE_SIZE > SEARCH_MAX_RESULTS:
+        return None
+    return encode_cursor(query=query, offset=following)
+
+def first_page(query, papers, source):
+    """The first-page response for papers from search_first_page (or its async variant)."""
+    if source == "local_index":
+        # The local index answered, not the API's first page, so "more"
+        # starts from the API's first page (callers drop duplicates)
+        return {"papers": papers, "next_cursor": encode_cursor(query=query, offset=0)}
+    return {"papers": papers, "next_cursor": next_cursor(query, 0, len(papers))}
+
+def search_papers_page(query=None, cursor=None):
+    """
+    Returns one page of results as {"papers": [...], "next_cursor": str or None}
+    (or {"error": ...}). Pass the query for the first page and the returned
+    next_cursor for the following ones. The cursor carries the query, so a
+    later page costs one upstream call (or a cache hit) and no keyword
+    extraction.
+    """
+    if not cursor:
+        papers, source = search_first_page(query)
+        if isinstance(papers, dict):
+            return papers
+        return first_page(query, papers, source)
+
     try:
-        # Fetch data from API
-        response = requests.get(PAPER_SEARCH_URL, params=params)
-        response.raise_for_status()  # Raise error if request fails
-        api_response = response.json()
-
-        # Ensure 'papers' key exists and is a list
-        if not isinstance(api_response.get("papers"), list):
-            return {"error": "'papers' should be a list but got something else."}
-
-        # Parse the papers
-        papers = []
-        for paper in api_response["papers"]:
-            external_ids = paper.get("externalIds", {})
-            corpus_id = external_ids.get("CorpusId", "Unknown")
-
-            # Safe handling for missing PDF links
-            pdf_links = paper.get("pdfs", [])
-            pdf_url = pdf_links[0] if pdf_links else "No PDF available"
-
-            papers.append({
-                "id": paper.get("paperId", corpus_id),  # Use paperId if available, else CorpusId
-                "title": paper.get("title", "Unknown Title"),
-                "authors": [author.get("name", "Unknown") for author in paper.get("authors", [])],
-                "citations": paper.get("citationCount", 0),
-                "pdf": pdf_url,  # Safe PDF handling
-                "external_ids": external_ids  # Include all external IDs (ArXiv, DOI, etc.)
-            })
-
-        return papers
-
-    except requests.RequestException as e:
-        return {"error": str(e)}
+        state = decode_cursor(cursor)
+        query, offset = state["query"], int(state["offset"])
+    except (ValueError, KeyError, TypeError):
+        return {"error": "Invalid cursor"}
+
+    with span("paper_search", page="next") as current:
+        current.set(source="api", cache_hit=response_cache.contains("search", page_key(query, offset)))
+        try:
+            papers = as_papers(response_cache.get_or_fetch(
+                "search", page_key(query, offset),
+                lambda: fetch_and_index(query, offset),
+                ttl=CACHE_TTL_SEARCH
+            ))
+        except (requests.RequestException, ValueError) as e:
+            current.set(error=str(e))
+            return {"error": str(e)}
+        current.set(results=len(papers))
+    return {"papers": papers, "next_cursor": next_cursor(query, offset, len(papers))}
+
+async def async_search_papers(query, client):
+    """
+    Non-blocking variant of search_first_page for the async server: returns
+    the papers (or {"error": ...}) and their source ("local_index" or "api").
+
+    :param client: An api.http_client.AsyncUpstreamClient.
+    """
+    with span("paper_search") as current:
+        # The local index is SQLite, so it runs in a worker thread to keep the event loop free
+        if LOCAL_INDEX_MODE == "first":
+            papers = await asyncio.to_thread(get_local_index().lookup, query)
+            if papers is not None:
+                current.set(source="local_index", results=len(papers))
+                refresh_in_background(query)
+                return papers, "local_index"
+
+        async def fetch():
+            papers = parse_papers(await client.get_json(PAPER_SEARCH_PATH, params=search_params(query)))
+            if LOCAL_INDEX_MODE != "off":
+                await asyncio.to_thread(get_local_index().ingest, papers)
+            return papers
+
+        current.set(source="api", cache_hit=response_cache.contains("search", page_key(query)))
+        try:
+            papers = as_papers(await response_cache.get_or_fetch_async("search", page_key(query), fetch, ttl=CACHE_TTL_SEARCH))
+        except (requests.RequestException, ValueError) as e:
+            current.set(error=str(e))
+            return {"error": str(e)}, "api"
+
+        if LOCAL_INDEX_MODE == "merge":
+            papers = await asyncio.to_thread(merge_local, query, papers)
+        current.set(results=len(papers))
+        return papers, "api"
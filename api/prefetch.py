@@ -0,0 +1,177 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+from api.cache import response_cache
+from api.citations import fetch_citations
+from api.metadata import prefetch_bibtex
+from api.paper import Paper
+from api.summarizer import is_summary_cached, summarize_paper
+from config import (
+    PREFETCH_ENABLED,
+    PREFETCH_TOP_K,
+    PREFETCH_WORKERS,
+    PREFETCH_SUMMARIES,
+    PREFETCH_LLM_BUDGET,
+)
+
+# Lower runs first: one bulk BibTeX request, then citations, then LLM summaries
+PRIORITY_BIBTEX = 0
+PRIORITY_CITATIONS = 1
+PRIORITY_SUMMARY = 2
+
+class LLMBudget:
+    """
+    Caps speculative LLM calls to limit completions in any rolling hour, so
+    prefetching never spends more than a fixed amount on summaries nobody reads.
+    A limit of 0 disables speculative LLM calls.
+    """
+
+    def __init__(self, limit, window=3600):
+        self.limit = limit
+        self.window = window
+        self._spent = deque()
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        """Records one call and returns True if the budget allows it, else False."""
+        now = time.monotonic()
+        with self._lock:
+            while self._spent and now - self._spent[0] >= self.window:
+                self._spent.popleft()
+            if len(self._spent) >= self.limit:
+                return False
+            self._spent.append(now)
+            return True
+
+    def remaining(self):
+        now = time.monotonic()
+        with self._lock:
+            return self.limit - sum(1 for spent in self._spent if now - spent < self.window)
+
+class PrefetchScheduler:
+    """
+    Warms the caches the action buttons read from right after a search:
+    BibTeX, citations and (optionally) per-paper summaries for the top results.
+
+    Work runs on a few daemon threads fed by a priority queue. Each search gets
+    a batch ID; a new search from the same session cancels the batch it
+    supersedes, so queued work for stale results never starts. Handlers pick
+    up results through the response/LLM caches, and calls still in flight are
+    shared with them by the caches' single-flight coalescing.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, budget=None):
+        self.workers = workers
+        self.budget = budget if budget is not None else LLMBudget(PREFETCH_LLM_BUDGET)
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()  # FIFO within a priority
+        self._batches = {}  # batch id -> futures still queued or running
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stats = {"scheduled": 0, "completed": 0, "failed": 0, "cancelled": 0, "over_budget": 0}
+
+    def _start(self):
+        # Threads start on first use so importing the module stays cheap
+        if not self._threads:
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            _, _, future, fn = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue  # Cancelled while queued
+            try:
+                future.set_result(fn())
+                self._count("completed")
+            except BaseException as e:
+                future.set_exception(e)
+                self._count("failed")
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            self._stats[counter] += n
+
+    def submit(self, batch_id, priority, fn):
+        """Queues fn under batch_id and returns a Future for its result."""
+        future = Future()
+        with self._lock:
+            self._start()
+            self._batches.setdefault(batch_id, set()).add(future)
+            self._stats["scheduled"] += 1
+        future.add_done_callback(lambda f: self._forget(batch_id, f))
+        self._queue.put((priority, next(self._order), future, fn))
+        return future
+
+    def _forget(self, batch_id, future):
+        with self._lock:
+            futures = self._batches.get(batch_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._batches[batch_id]
+
+    def cancel(self, batch_id):
+        """
+        Cancels the queued work of a superseded batch. Calls already running
+        are left to finish, since their results are cached for later use.
+        """
+        if not batch_id:
+            return 0
+        with self._lock:
+            futures = list(self._batches.get(batch_id, ()))
+        cancelled = sum(1 for future in futures if future.cancel())
+        self._count("cancelled", cancelled)
+        return cancelled
+
+    def schedule(self, papers, supersedes=None, top_k=PREFETCH_TOP_K, summaries=PREFETCH_SUMMARIES):
+        """
+        Queues prefetches for the top_k papers of a search and cancels the batch
+        it supersedes. Returns the new batch ID (kept in the session), or None
+        when prefetching is disabled or there is nothing to fetch.
+        """
+        self.cancel(supersedes)
+        if not PREFETCH_ENABLED or not isinstance(papers, list):
+            return None
+        top = [paper for paper in papers if isinstance(paper, (dict, Paper)) and paper.get("id") is not None][:top_k]
+        if not top:
+            return None
+
+        batch_id = uuid.uuid4().hex
+        prefetch_bibtex(top, submit=lambda fn: self.submit(batch_id, (PRIORITY_BIBTEX, 0), fn))
+        for rank, paper in enumerate(top):
+            pid = str(paper["id"])
+            if not response_cache.contains("citations", pid):
+                self.submit(batch_id, (PRIORITY_CITATIONS, rank), lambda pid=pid: fetch_citations(pid))
+            if summaries and not is_summary_cached(pid):
+                title = paper.get("title", "Unknown Title")
+                self.submit(batch_id, (PRIORITY_SUMMARY, rank), lambda pid=pid, title=title: self._summarize(pid, title))
+        return batch_id
+
+    def _summarize(self, pid, title):
+        # The budget is checked when the call is about to run, not when queued,
+        # so cancelled or already cached summaries never use it up
+        if is_summary_cached(pid):
+            return None
+        if not self.budget.try_spend():
+            self._count("over_budget")
+            return None
+        return summarize_paper(pid, title)
+
+    def stats(self):
+        """Returns task counters plus the queue depth and remaining LLM budget."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["llm_budget_remaining"] = self.budget.remaining()
+        return stats
+
+# Shared scheduler used by the frontend
+prefetcher = PrefetchScheduler()
@@ -0,0 +1,78 @@
+"""
+Token budgets for GPT prompts. Tokens are counted locally with tiktoken when
+it is installed (pip install tiktoken), or estimated from the text length.
+"""
+import logging
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from config import LLM_MODEL, LLM_MODEL_FAST, LLM_FAST_FEATURES, LLM_INPUT_TOKENS, LLM_OUTPUT_TOKENS
+
+logger = logging.getLogger("research.llm")
+
+# Rough average for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+def get_encoding(model):
+    """Returns the tiktoken encoding for model, or None to fall back to estimates."""
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The BPE files are downloaded on first use, which fails offline
+            logger.warning("tiktoken unavailable, estimating token counts: %s", e)
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text, model=LLM_MODEL):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens, model=LLM_MODEL):
+    """Keeps the leading max_tokens tokens of text."""
+    max_tokens = max(max_tokens, 0)
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+def model_for(feature):
+    """Cheap tasks (LLM_FAST_FEATURES) run on LLM_MODEL_FAST, everything else on LLM_MODEL."""
+    return LLM_MODEL_FAST if feature in LLM_FAST_FEATURES else LLM_MODEL
+
+def output_budget(feature):
+    """max_tokens for a reply of feature, or None for no limit."""
+    return LLM_OUTPUT_TOKENS.get(feature)
+
+def fit(feature, text, reserved=""):
+    """
+    Truncates text so that it fits the input budget of feature together with
+    reserved, the fixed part of the prompt (instructions and examples). Text
+    should already lead with its most informative part, as extracted files do.
+    """
+    budget = LLM_INPUT_TOKENS.get(feature)
+    if budget is None:
+        return text
+    model = model_for(feature)
+    return truncate_tokens(text, budget - count_tokens(reserved, model), model)
+
+def fit_each(feature, texts, reserved=""):
+    """Like fit(), with the budget shared equally between texts (e.g. one per paper)."""
+    budget = LLM_INPUT_TOKENS.get(feature)
+    if budget is None or not texts:
+        return list(texts)
+    model = model_for(feature)
+    share = (budget - count_tokens(reserved, model)) // len(texts)
+    return [truncate_tokens(text, share, model) for text in texts]
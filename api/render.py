@@ -0,0 +1,148 @@
+"""
+Compiled templates for the result panes. Fragments (one paper or citation in
+one view) are rendered once and cached; panes are assembled by joining the
+cached fragments. ".html" and ".md" templates escape every value, so titles,
+authors, contexts and GPT output can never inject markup. ".txt" templates
+(selector labels, which Gradio shows as text) are left as they are.
+"""
+import threading
+from collections import OrderedDict
+
+from jinja2 import ChainableUndefined, DictLoader, Environment, select_autoescape
+from markupsafe import Markup
+
+from config import RENDER_CACHE_MAX_ENTRIES
+
+PANE_STYLE = "border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;"
+PDF_BOX_STYLE = (
+    "border: 2px solid #334155; border-radius: 10px; padding: 16px; background-color: #1e293b; "
+    "color: #e2e8f0; margin-top: 50px; max-height: 200px; overflow-y: auto;"
+)
+
+TEMPLATES = {
+    # Fragments
+    "paper_label.txt": (
+        "📄 {{ p.title }}\n👥 {{ p.authors | join(', ') }}\n📈 Citations: {{ p.citations }}"
+        "{% if p.pdf.startswith('http') %}\n🔗 [PDF]({{ p.pdf }}){% endif %}"
+    ),
+    "pdf_link.html": (
+        "{% if p.pdf.strip().startswith('http') %}"
+        "<li><a href='{{ p.pdf.strip() }}' target='_blank' style='color: #93c5fd;'>{{ p.title }}</a></li>"
+        "{% else %}<li>{{ p.title }} <span style='color: #94a3b8;'>(No PDF available)</span></li>{% endif %}"
+    ),
+    "paper.md": (
+        "**{{ p.title }}**\n"
+        "🔗 {% if p.pdf != 'No PDF available' %}[PDF Available]({{ p.pdf }}){% else %}No PDF available{% endif %}\n"
+        "👥 Authors: {{ p.authors | join(', ') }}\n"
+        "📊 Citations: {{ p.citations }}\n\n"
+    ),
+    "citation.html": (
+        "<p>* <strong>{{ c.citingPaper.title or 'No Title' }}</strong><br>"
+        "&nbsp;&nbsp;Authors: {{ (c.citingPaper.authors or []) | map(attribute='name', default='Unknown') | join(', ') }}<br>"
+        "&nbsp;&nbsp;Contexts:<br>"
+        "{% for context in c.contexts or [] %}{% if not loop.first %}<br>{% endif %}&nbsp;&nbsp;- {{ context }}"
+        "{% else %}&nbsp;&nbsp;- No context provided.{% endfor %}</p>"
+    ),
+    "related.html": (
+        "<p>* <strong>{{ r.title }}</strong><br>&nbsp;&nbsp;Authors: {{ r.authors[:5] | join(', ') or 'Unknown' }}<br>"
+        "&nbsp;&nbsp;Citations: {{ r.citations }} · Cites {{ r.links }} explored paper(s)</p>"
+    ),
+    "reference.html": "<h3>{{ heading }}</h3><pre>{{ text }}</pre><hr>",
+    "section.html": "<h3>{{ heading }}</h3>{{ content }}{% if rule %}<hr>{% endif %}",
+    "message.html": "<p>{{ message }}</p>{% if rule %}<hr>{% endif %}",
+    # Panes
+    "pane.html": "<div style=\"{{ style }}\">{% if heading %}<h2>{{ heading }}</h2>{% endif %}{{ content }}</div>",
+    "text_pane.html": "<div style=\"{{ style }}\"><h2>{{ heading }}</h2><pre>{{ text }}</pre></div>",
+    "pdf_links.html": (
+        "<div id='pdf-box' style='{{ style }}'><h3 style='margin-top: 0;'>🔗 PDF Links for Papers</h3>"
+        "{% if content %}<ul style='padding-left: 20px; margin: 0;'>{{ content }}</ul>"
+        "{% else %}<p style='color: #cbd5e1;'>No PDF links available for these results.</p>{% endif %}</div>"
+    ),
+}
+
+env = Environment(
+    loader=DictLoader(TEMPLATES),
+    autoescape=select_autoescape(enabled_extensions=("html", "md"), default=False),
+    # Citation dicts from the API often lack fields; missing ones render as empty
+    undefined=ChainableUndefined,
+    keep_trailing_newline=True,
+)
+# Compiled once here, not per render
+compiled = {name: env.get_template(name) for name in TEMPLATES}
+
+def render(view, **values):
+    """Renders a template; escaped views return Markup so they can be nested without double escaping."""
+    text = compiled[view].render(**values)
+    return Markup(text) if not view.endswith(".txt") else text
+
+def join(fragments):
+    """Joins rendered fragments into one Markup string (plain strings are escaped)."""
+    return Markup("").join(fragments)
+
+def same_values(old, new):
+    # The same Paper object is usually passed again, which skips comparing every field
+    for name, value in new.items():
+        cached = old.get(name)
+        if cached is not value and cached != value:
+            return False
+    return len(old) == len(new)
+
+class FragmentCache:
+    """
+    LRU cache of rendered fragments keyed by (view, key), e.g. ("pdf_link.html",
+    paper ID). The values a fragment was rendered from are kept with it, and a
+    lookup only counts as a hit if they are still equal, so a paper whose
+    citation count changed is simply rendered again.
+    """
+
+    def __init__(self, max_entries=RENDER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def render(self, view, key, **values):
+        # Hits take no lock: single OrderedDict operations are atomic under the GIL
+        # (so the hit counter is approximate under contention)
+        entry = self._entries.get((view, key))
+        if entry is not None and same_values(entry[0], values):
+            try:
+                self._entries.move_to_end((view, key))
+            except KeyError:
+                pass  # Evicted meanwhile; the fragment is still valid
+            self._stats["hits"] += 1
+            return entry[1]
+        fragment = render(view, **values)
+        with self._lock:
+            self._stats["misses"] += 1
+            self._entries[(view, key)] = (values, fragment)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats = {"hits": 0, "misses": 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+fragments = FragmentCache()
+
+def paper_fragment(view, paper):
+    """The cached fragment of one paper (a Paper or paper dict) in view."""
+    return fragments.render(view, str(paper.get("id")), p=paper)
+
+def pane(content, heading=None, style=PANE_STYLE):
+    """The scrollable details pane around already rendered content."""
+    return str(render("pane.html", style=style, heading=heading, content=Markup(content)))
+
+def text_pane(heading, text):
+    """A details pane showing text (e.g. GPT markdown) verbatim, escaped."""
+    return str(render("text_pane.html", style=PANE_STYLE, heading=heading, text=text))
+
+def message(text, rule=False):
+    """An escaped one-line message fragment, optionally followed by a rule."""
+    return render("message.html", message=text, rule=rule)
@@ -0,0 +1,25 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard json module
+    orjson = None
+
+def to_jsonable(obj):
+    """json default hook: records with a to_dict() method (e.g. api.paper.Paper) become dicts."""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
+
+def dumps(obj):
+    """Serializes obj to a JSON string, with orjson when it is installed."""
+    if orjson is not None:
+        # orjson serializes dataclasses (including slotted ones) natively
+        return orjson.dumps(obj, default=to_jsonable).decode("utf-8")
+    return json.dumps(obj, default=to_jsonable, separators=(",", ":"))
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,19 +1,114 @@
-from config import get_openai_api_key
-from openai import OpenAI
-import os
+from config import SUMMARY_MODE, LLM_MAX_CONCURRENCY, LLM_TIMEOUT
 
-os.environ["OPENAI_API_KEY"] = get_openai_api_key()
-client = OpenAI()
+from api.concurrency import fetch_all, iter_fetch
+from api.llm import complete, stream_complete
+from api.llm_cache import llm_cache
+from api.prompts import fit, model_for
+from api.render import text_pane
 
-def summarize_papers(paper_ids, paper_title_map):
+def format_summary_box(summary):
+    return text_pane("Paper Key Points", summary)
+
+PAPER_SUMMARY_INSTRUCTIONS = (
+    "You are an academic research assistant. Your goal is to generate a structured summary of the following paper given its title. "
+    "Do not invent specific data or hallucinate, but you can analyse its **general methods, contributions, and challenges** based on research.\n\n"
+    "**Instructions:**\n"
+    "1. Use clear, readable markdown formatting with bullet points.\n"
+    "2. Do not repeat the paper title.\n"
+    "3. Structure the summary with these sections:\n"
+    "   - **Research Focus**\n"
+    "   - **Methodologies or Approaches**\n"
+    "   - **Expected Results or Applications**\n"
+    "   - **Challenges or Limitations**\n\n"
+)
+PAPER_SUMMARY_CLOSING = "Generate the markdown-formatted summary below."
+
+def stream_summary(prompt, selected_ids, template):
+    """
+    Yields the summary pane as HTML, growing as GPT streams its answer. On an
+    error, yields the pane with the error appended and then re-raises it.
+    """
+    summary = ""
+    try:
+        for summary in stream_complete("summarize", prompt, key_parts=selected_ids, template=template):
+            yield format_summary_box(summary)
+    except Exception as e:
+        yield format_summary_box(f"{summary}\n\n❌ Error generating summary: {str(e)}")
+        raise
+
+def summarize_paper(pid, title):
+    """
+    Summarizes a single paper. The result is cached by paper ID, so any later
+    selection (or comparison) containing this paper reuses it.
+    """
+    template = PAPER_SUMMARY_INSTRUCTIONS + PAPER_SUMMARY_CLOSING
+    title = fit("paper_summary", title, template)
+    prompt = PAPER_SUMMARY_INSTRUCTIONS + f"### Paper:\n- {title}\n\n" + PAPER_SUMMARY_CLOSING
+    return complete("paper_summary", prompt, key_parts=[pid], template=template)
+
+def is_summary_cached(pid):
+    """True when summarize_paper(pid, ...) would be answered from the cache."""
+    return llm_cache.contains(llm_cache.make_key(
+        "paper_summary", model_for("paper_summary"), None, [pid], PAPER_SUMMARY_INSTRUCTIONS + PAPER_SUMMARY_CLOSING
+    ))
+
+def summary_error(pid, e):
+    return f"❌ Error generating summary: {str(e)}"
+
+def summarize_each(paper_ids, paper_title_map):
+    """
+    Summarizes every paper in its own concurrent LLM call and returns the
+    summaries in paper order. A failed paper only loses its own summary.
+    """
+    return fetch_all(
+        lambda pid: summarize_paper(pid, paper_title_map.get(pid, "Unknown Title")),
+        paper_ids,
+        max_workers=LLM_MAX_CONCURRENCY,
+        timeout=LLM_TIMEOUT,
+        on_error=summary_error
+    )
+
+def format_paper_summaries(paper_ids, paper_title_map, summaries):
+    return "\n\n".join(
+        f"### {paper_title_map.get(pid, 'Unknown Title')}\n{summary}"
+        for pid, summary in zip(paper_ids, summaries)
+    )
+
+def stream_paper_summaries(paper_ids, paper_title_map):
+    """Yields the summary pane as HTML, filling in each paper as its summary finishes."""
+    summaries = ["⏳ Generating summary..."] * len(paper_ids)
+    yield format_summary_box(format_paper_summaries(paper_ids, paper_title_map, summaries))
+    for index, summary in iter_fetch(
+        lambda pid: summarize_paper(pid, paper_title_map.get(pid, "Unknown Title")),
+        paper_ids,
+        max_workers=LLM_MAX_CONCURRENCY,
+        timeout=LLM_TIMEOUT,
+        on_error=summary_error
+    ):
+        summaries[index] = summary
+        yield format_summary_box(format_paper_summaries(paper_ids, paper_title_map, summaries))
+
+def summarize_papers(paper_ids, paper_title_map, stream=False, mode=SUMMARY_MODE):
+    """
+    Summarizes the selected papers with GPT. With stream=True, returns a generator
+    that yields partial HTML as tokens arrive instead of the finished HTML.
+    In "per_paper" mode each paper is summarized in its own cached, concurrent
+    call and the results are assembled in order; "single" uses one prompt.
+    """
     selected_ids = paper_ids
 
+    if mode == "per_paper":
+        if stream:
+            return stream_paper_summaries(selected_ids, paper_title_map)
+        summaries = summarize_each(selected_ids, paper_title_map)
+        return format_summary_box(format_paper_summaries(selected_ids, paper_title_map, summaries))
+
     paper_infos = []
     for pid in selected_ids:
         title = paper_title_map.get(pid, "Unknown Title")
         paper_infos.append(f"- {title}")
 
-    prompt = (
+    instructions = (
         "You are an academic research assistant. Your goal is to generate structured summaries for each of the following papers given their titles. "
         "Do not invent specific data or hallucinate, but you can analyse their **general methods, contributions, and challenges** based on research.\n\n"
         "**Instructions:**\n"
@@ -24,23 +119,18 @@ def summarize_papers(paper_ids, paper_title_map):
         "   - **Methodologies or Approaches**\n"
         "   - **Expected Results or Applications**\n"
         "   - **Challenges or Limitations**\n\n"
-        f"### Papers:\n" + "\n".join(paper_infos) +
-        "\n\nGenerate the markdown-formatted summaries below."
     )
+    closing = "\n\nGenerate the markdown-formatted summaries below."
+    papers = fit("summarize", "\n".join(paper_infos), instructions + closing)
+    prompt = instructions + "### Papers:\n" + papers + closing
+
+    if stream:
+        return stream_summary(prompt, selected_ids, instructions + closing)
     
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        summary = completion.choices[0].message.content
+        # The same selection in any order maps to the same cached summary
+        summary = complete("summarize", prompt, key_parts=selected_ids, template=instructions + closing)
     except Exception as e:
         summary = f"❌ Error generating summary: {str(e)}"
 
-    html = f"""
-    <div style="border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;">
-        <h2>Paper Key Points</h2>
-        <pre>{summary}</pre>
-    </div>
-    """
-    return html
+    return format_summary_box(summary)
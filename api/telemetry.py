@@ -0,0 +1,248 @@
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import PROFILE_SAMPLE_RATE, PROFILE_DIR
+
+logger = logging.getLogger("research.trace")
+
+METRIC_PREFIX = "research"
+# Seconds; covers local cache hits up to slow GPT calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_ATTRIBUTES = ("prompt_tokens", "completion_tokens")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms, rendered in the Prometheus
+    text exposition format. Metrics are created on first use.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._help = {}
+        self._counters = defaultdict(lambda: defaultdict(float))    # name -> labels -> value
+        self._histograms = defaultdict(dict)                         # name -> labels -> [counts, sum, count]
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[name][label_key(labels)] += value
+
+    def observe(self, name, value, **labels):
+        key = label_key(labels)
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Returns all metrics as Prometheus text (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                full = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, (counts, total, count) in sorted(series.items()):
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        lines.append(f"{full}_bucket{format_labels(key, [('le', f'{bound:g}')])} {bucket_count}")
+                    lines.append(f"{full}_bucket{format_labels(key, [('le', '+Inf')])} {count}")
+                    lines.append(f"{full}_sum{format_labels(key)} {total:.6f}")
+                    lines.append(f"{full}_count{format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("span_duration_seconds", "Latency of each traced step of the request path.")
+metrics.describe("span_cache_total", "Cache lookups made by a traced step, by result.")
+metrics.describe("span_status_total", "Response status codes seen by a traced step.")
+metrics.describe("llm_tokens_total", "Tokens used by GPT calls.")
+metrics.describe("coalesced_calls_total", "Calls saved by attaching to an identical call already in flight, by source.")
+
+class Span:
+    """One timed step. Attributes set with set() are logged and feed the counters."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.attributes = {}
+        self.parent = _current_span.get()
+        self.span_id = uuid.uuid4().hex[:16]
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+@contextmanager
+def trace(trace_id=None):
+    """
+    Starts (or continues, e.g. from an X-Trace-Id header) a trace. Spans opened
+    inside share its ID in the trace log. Yields the trace ID.
+    """
+    token = _trace_id.set(trace_id or uuid.uuid4().hex)
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+def current_trace_id():
+    return _trace_id.get()
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times a step of the request path. labels (e.g. feature="summarize") must be
+    low-cardinality since they become metric labels. Inside the block, call
+    .set() on the yielded span to record cache_hit, status or token counts.
+    """
+    current = Span(name, labels)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield current
+    except GeneratorExit:
+        outcome = "cancelled"  # A streaming consumer stopped early
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            pass  # Generator resumed in another context (e.g. a Gradio worker thread)
+        record(current, duration, outcome)
+
+def record(current, duration, outcome):
+    labels = dict(current.labels, span=current.name)
+    attributes = current.attributes
+    metrics.observe("span_duration_seconds", duration, outcome=outcome, **labels)
+    if "cache_hit" in attributes:
+        metrics.inc("span_cache_total", result="hit" if attributes["cache_hit"] else "miss", **labels)
+    if "status" in attributes:
+        metrics.inc("span_status_total", status=attributes["status"], **labels)
+    for kind in TOKEN_ATTRIBUTES:
+        if attributes.get(kind):
+            metrics.inc("llm_tokens_total", attributes[kind], type=kind.split("_")[0], **labels)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({
+            "trace_id": _trace_id.get(),
+            "span_id": current.span_id,
+            "parent_id": current.parent.span_id if current.parent else None,
+            "span": current.name,
+            "duration_ms": round(duration * 1000, 2),
+            "outcome": outcome,
+            **current.labels,
+            **attributes,
+        }, default=str))
+
+class Profiler:
+    """
+    Samples requests with cProfile. The sample rate can be changed while the
+    server runs (see the /debug/profile routes); 0 turns profiling off. Only
+    one request is profiled at a time, and under asyncio the profile also
+    includes other coroutines running on the event loop meanwhile.
+    """
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, output_dir=PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self._busy = threading.Lock()
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        return self.sample_rate
+
+    @contextmanager
+    def profile(self, name):
+        if not self.sample_rate or random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            yield None
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                yield profile
+            finally:
+                profile.disable()
+            self.save(name, profile)
+        finally:
+            self._busy.release()
+
+    def save(self, name, profile):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{name}-{int(time.time() * 1000)}-{_trace_id.get() or 'none'}.prof")
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(15)
+        logger.info("Saved profile of %s to %s\n%s", name, path, summary.getvalue())
+
+profiler = Profiler()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serves /metrics from a background thread, for processes without their own
+    HTTP routes (the Gradio frontend). Returns the server, or None if port is 0.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
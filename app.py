@@ -1,38 +1,82 @@
-from flask import Flask, request, jsonify
+import logging
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from api.paper_search import search_papers
+from api.jobs import get_job_queue
+from api.paper_search import search_papers, search_papers_page
+from api.render import paper_fragment
+from api.serialization import dumps
+from api.telemetry import metrics, profiler, span, trace
+from config import LOG_LEVEL
+
+logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
-def handle_intents(user_message):
-    print("Received query:", user_message)
-    papers = search_papers(user_message)
-    print("Papers returned:", papers)
+def build_response(papers):
+    """Builds the /chatbot JSON payload (markdown summary plus papers) for a search result."""
     if not papers or ("error" in papers):
         response_text = "❌ Sorry, I couldn't find any papers on that topic."
     else:
-        response_text = "**Here are some relevant research papers:**\n\n"
-        for i, paper in enumerate(papers, 1):
-            response_text += (
-                f"**{i}. {paper['title']}**\n"
-                f"🔗 {'[PDF Available]('+paper['pdf']+')' if paper['pdf'] != 'No PDF available' else 'No PDF available'}\n"
-                f"👥 Authors: {', '.join(paper['authors'])}\n"
-                f"📊 Citations: {paper['citations']}\n\n"
-            )
+        # Per-paper markdown is cached, so only the numbering is built per response
+        response_text = "**Here are some relevant research papers:**\n\n" + "".join(
+            f"{i}. {paper_fragment('paper.md', paper)}" for i, paper in enumerate(papers, 1)
+        )
     return {"response": response_text, "papers": papers}
 
+def handle_intents(user_message, papers_only=False, cursor=None):
+    if papers_only:
+        page = search_papers_page(user_message, cursor)
+        logger.info("query=%r page=%s", user_message[:100], "error" if "error" in page else len(page["papers"]))
+        return page
+    papers = search_papers(user_message)
+    # Log a summary only; whole payloads made the log the bottleneck
+    logger.info("query=%r papers=%s", user_message[:100], "error" if "error" in papers else len(papers))
+    return build_response(papers)
+
 @app.route("/chatbot", methods=["POST"])
 def chatbot():
-    """Handles user queries and executes the search function."""
+    """
+    Handles user queries and executes the search function. With "papers_only": true
+    in the body, only the structured papers are returned, without the markdown text,
+    plus a "next_cursor" to send back as "cursor" for the next page of results.
+    """
     data = request.get_json()
     if not data or "message" not in data:
         return jsonify({"error": "No message provided"}), 400
 
     user_message = data["message"]
-    response = handle_intents(user_message)
-    return jsonify(response)
+    with trace(request.headers.get("X-Trace-Id")), span("chatbot"), profiler.profile("chatbot"):
+        response = handle_intents(user_message, papers_only=bool(data.get("papers_only")), cursor=data.get("cursor"))
+    # Papers are slotted records; dumps serializes them in one pass (orjson when installed)
+    return Response(dumps(response), mimetype="application/json")
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status, progress and result (partial while running) of a background job started by the frontend."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(dumps(job), mimetype="application/json")
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Latency histograms and counters for the request path, in Prometheus format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profile", methods=["GET", "POST"])
+def profile_settings():
+    """Reads or sets (POST {"sample_rate": 0.1}) the share of requests profiled with cProfile."""
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.set_sample_rate(data.get("sample_rate", 0))
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_rate must be a number between 0 and 1"}), 400
+    return jsonify({"sample_rate": profiler.sample_rate, "output_dir": profiler.output_dir})
 
 if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL)
     app.run(debug=True)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+
+from api.http_client import AsyncUpstreamClient
+from api.jobs import get_job_queue
+from api.paper_search import async_search_papers, first_page, search_papers_page
+from api.serialization import dumps
+from api.telemetry import metrics, profiler, span, trace
+from app import build_response
+from config import (
+    ASGI_HOST,
+    ASGI_PORT,
+    ASGI_WORKERS,
+    ASGI_MAX_CONCURRENCY,
+    ASGI_MAX_QUEUE,
+    ASGI_REQUEST_TIMEOUT,
+    ASGI_UPSTREAM_DEADLINE,
+    ASGI_SHUTDOWN_TIMEOUT,
+    LOG_LEVEL,
+)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"POST, OPTIONS"),
+    (b"access-control-allow-headers", b"Content-Type"),
+]
+
+class Backpressure:
+    """
+    Admits at most max_concurrency requests at a time plus max_queue waiting
+    ones. Anything beyond that is rejected immediately so callers get a 503
+    instead of piling up behind a slow upstream.
+    """
+
+    def __init__(self, max_concurrency=ASGI_MAX_CONCURRENCY, max_queue=ASGI_MAX_QUEUE):
+        self.limit = max_concurrency + max_queue
+        self.admitted = 0
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def try_admit(self):
+        if self.admitted >= self.limit:
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.admitted -= 1
+
+state = {"upstream": None, "backpressure": None}
+
+async def read_json(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+async def send_body(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())] + CORS_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def send_json(send, status, payload):
+    await send_body(send, status, dumps(payload).encode("utf-8"), b"application/json")
+
+def header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+async def chatbot(scope, receive, send):
+    """Same contract as the Flask /chatbot route, with non-blocking upstream I/O."""
+    with trace(header(scope, b"x-trace-id")), span("chatbot") as current:
+        backpressure = state["backpressure"]
+        if not backpressure.try_admit():
+            current.set(status=503)
+            await send_json(send, 503, {"error": "Server is busy, please retry"})
+            return
+
+        try:
+            data = await read_json(receive)
+            if not data or "message" not in data:
+                current.set(status=400)
+                await send_json(send, 400, {"error": "No message provided"})
+                return
+
+            cursor = data.get("cursor") if data.get("papers_only") else None
+            try:
+                async with backpressure.semaphore:
+                    with profiler.profile("chatbot"):
+                        if cursor:
+                            # Later pages are rare and cached; the blocking client is fine off-loop
+                            search = asyncio.to_thread(search_papers_page, cursor=cursor)
+                        else:
+                            search = async_search_papers(data["message"], state["upstream"])
+                        result = await asyncio.wait_for(search, timeout=ASGI_REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                current.set(status=504)
+                await send_json(send, 504, {"error": "Paper search timed out"})
+                return
+            current.set(status=200)
+            if cursor:
+                payload = result
+            else:
+                papers, source = result
+                if not data.get("papers_only"):
+                    payload = build_response(papers)
+                else:
+                    # papers_only skips the markdown text, which the frontend does not use;
+                    # the cursor is built as in search_papers_page
+                    payload = papers if isinstance(papers, dict) else first_page(data["message"], papers, source)
+            await send_json(send, 200, payload)
+        finally:
+            backpressure.release()
+
+async def profile_settings(scope, receive, send):
+    """Reads or sets (POST {"sample_rate": 0.1}) the share of requests profiled with cProfile."""
+    if scope["method"] == "POST":
+        data = await read_json(receive) or {}
+        try:
+            profiler.set_sample_rate(data.get("sample_rate", 0))
+        except (TypeError, ValueError):
+            await send_json(send, 400, {"error": "sample_rate must be a number between 0 and 1"})
+            return
+    await send_json(send, 200, {"sample_rate": profiler.sample_rate, "output_dir": profiler.output_dir})
+
+async def job_status(scope, send):
+    """Same contract as the Flask /jobs/<job_id> route."""
+    job = await asyncio.to_thread(get_job_queue().get, scope["path"][len("/jobs/"):])
+    if job is None:
+        await send_json(send, 404, {"error": "Job not found"})
+        return
+    await send_json(send, 200, job)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Per-worker pooled client with its own circuit breaker; its calls give up
+            # before ASGI_REQUEST_TIMEOUT so they are never cancelled mid-retry
+            state["upstream"] = AsyncUpstreamClient(pool_size=ASGI_MAX_CONCURRENCY, deadline=ASGI_UPSTREAM_DEADLINE)
+            state["backpressure"] = Backpressure()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await state["upstream"].aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    if scope["path"] == "/chatbot" and scope["method"] == "POST":
+        await chatbot(scope, receive, send)
+    elif scope["path"].startswith("/jobs/") and scope["method"] == "GET":
+        await job_status(scope, send)
+    elif scope["path"] == "/metrics" and scope["method"] == "GET":
+        await send_body(send, 200, metrics.render().encode("utf-8"), b"text/plain; version=0.0.4")
+    elif scope["path"] == "/debug/profile" and scope["method"] in ("GET", "POST"):
+        await profile_settings(scope, receive, send)
+    elif scope["method"] == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+    else:
+        await send_json(send, 404, {"error": "Not found"})
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=LOG_LEVEL)
+
+    # uvicorn stops accepting connections on SIGTERM/SIGINT and lets in-flight
+    # requests finish for up to ASGI_SHUTDOWN_TIMEOUT seconds.
+    uvicorn.run(
+        "asgi_app:app",
+        host=ASGI_HOST,
+        port=ASGI_PORT,
+        workers=ASGI_WORKERS,
+        timeout_graceful_shutdown=ASGI_SHUTDOWN_TIMEOUT,
+        log_level="warning",
+    )
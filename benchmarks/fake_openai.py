@@ -0,0 +1,167 @@
+"""
+Local stand-in for the OpenAI API, for exercising the key pool and the GPT
+features offline. Serves /v1/chat/completions (plain and streaming) and
+/v1/embeddings with per-key request limits, and sends the same
+x-ratelimit-* headers and 429 responses as the real API.
+
+    python benchmarks/fake_openai.py --port 8001 --rpm 30 --latency 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python gradio_frontend.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 8
+
+class FakeOpenAI:
+    """
+    Request accounting shared by the handler threads. Each API key gets
+    rpm requests per rolling window; key_rpm overrides it per key.
+    """
+
+    def __init__(self, rpm=60, key_rpm=None, window=60.0, latency=0.0, error_rate=0.0, tokens_per_minute=100000):
+        self.rpm = rpm
+        self.key_rpm = key_rpm or {}
+        self.window = window
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tokens_per_minute = tokens_per_minute
+        self.calls = defaultdict(deque)        # key -> request timestamps
+        self.counts = defaultdict(lambda: defaultdict(int))  # key -> status -> count
+        self.lock = threading.Lock()
+
+    def admit(self, key):
+        """Returns (status, headers) for a request on key, recording it if admitted."""
+        limit = self.key_rpm.get(key, self.rpm)
+        now = time.monotonic()
+        with self.lock:
+            calls = self.calls[key]
+            while calls and now - calls[0] >= self.window:
+                calls.popleft()
+            reset = self.window - (now - calls[0]) if calls else 0.0
+            if len(calls) >= limit:
+                status = 429
+            elif random.random() < self.error_rate:
+                status = 500
+            else:
+                calls.append(now)
+                status = 200
+            self.counts[key][status] += 1
+            headers = {
+                "x-ratelimit-limit-requests": str(limit),
+                "x-ratelimit-remaining-requests": str(max(limit - len(calls), 0)),
+                "x-ratelimit-reset-requests": f"{max(reset, 0.001):.3f}s",
+                "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+                "x-ratelimit-remaining-tokens": str(self.tokens_per_minute),
+                "x-ratelimit-reset-tokens": "0s",
+            }
+            if status == 429:
+                headers["retry-after-ms"] = str(int(reset * 1000) + 1)
+            return status, headers
+
+    def summary(self):
+        with self.lock:
+            return {key: dict(counts) for key, counts in self.counts.items()}
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, headers):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_chunk(self, data):
+            encoded = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(encoded), encoded))
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            key = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            status, headers = fake.admit(key)
+            if status == 429:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, headers)
+                return
+            if status == 500:
+                self.send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}}, headers)
+                return
+            time.sleep(fake.latency)
+
+            if self.path.endswith("/embeddings"):
+                vector = [random.random() for _ in range(EMBEDDING_DIM)]
+                self.send_json(200, {
+                    "object": "list", "model": body.get("model", "fake"),
+                    "data": [{"object": "embedding", "index": 0, "embedding": vector}],
+                    "usage": {"prompt_tokens": 5, "total_tokens": 5},
+                }, headers)
+                return
+
+            prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+            words = ["Fake", " answer", " for", f" {len(prompt)}", " characters."]
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(words), "total_tokens": len(prompt) // 4 + len(words)}
+            if not body.get("stream"):
+                self.send_json(200, {
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+                    "usage": usage,
+                }, headers)
+                return
+
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "fake")}
+            for word in words:
+                self.send_chunk(json.dumps(dict(base, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}])))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self.send_chunk(json.dumps(dict(base, choices=[], usage=usage)))
+            self.send_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+def start(port=0, **options):
+    """Starts the fake API on a background thread; returns (base_url, FakeOpenAI)."""
+    fake = FakeOpenAI(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1", fake
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rpm", type=int, default=60, help="Requests per key per window")
+    parser.add_argument("--window", type=float, default=60.0, help="Rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every successful call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with a 500")
+    args = parser.parse_args()
+
+    base_url, _ = start(args.port, rpm=args.rpm, window=args.window, latency=args.latency, error_rate=args.error_rate)
+    print(f"Fake OpenAI API listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Replays recorded recommendpapers.xyz responses for benchmarks and offline
+runs. Serves /api/paper_search, /api/lookup_citations and /api/bibtex from
+fixtures/upstream.json with the same offset/limit and bulk-ID behaviour as
+the real API, plus a configurable latency.
+
+    python benchmarks/fixture_upstream.py --port 8002 --latency 0.3
+    UPSTREAM_BASE_URL=http://127.0.0.1:8002 python gradio_frontend.py
+
+Queries that were not recorded are answered with one of the recorded result
+sets (chosen by a hash of the query), so any keyword gets realistic papers.
+To refresh the fixtures from the live API:
+
+    python benchmarks/fixture_upstream.py --record "graph neural networks drug discovery" ...
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "upstream.json")
+RECORD_PAPERS = 20
+RECORD_CITATIONS = 10
+
+def load_fixtures(path=FIXTURES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_fixtures(fixtures, path=FIXTURES_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        f.write("\n")
+
+class FixtureStore:
+    """Answers upstream requests from recorded fixtures."""
+
+    def __init__(self, fixtures):
+        self.searches = fixtures["paper_search"]
+        self.citations = fixtures["lookup_citations"]
+        self.bibtex = fixtures["bibtex"]
+        self.queries = sorted(self.searches)
+
+    def paper_search(self, params):
+        query = params.get("query", "")
+        if query not in self.searches:
+            query = self.queries[zlib.crc32(query.encode("utf-8")) % len(self.queries)]
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 10))
+        papers = self.searches[query]["papers"]
+        return {"total": len(papers), "offset": offset, "papers": papers[offset:offset + limit]}
+
+    def lookup_citations(self, params):
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 10))
+        citations = self.citations.get(params.get("id", ""), {}).get("citations", [])
+        return {"offset": offset, "citations": citations[offset:offset + limit]}
+
+    def bibtex_entries(self, params):
+        entries = []
+        for item in params.get("id", "").split(","):
+            corpus_id = item.split(":")[-1]
+            if corpus_id in self.bibtex:
+                entries.append({"corpusId": int(corpus_id), "bibtex": self.bibtex[corpus_id]})
+        return {"papers": entries}
+
+    def answer(self, path, params):
+        """Returns the JSON body for path, or None for an unknown endpoint."""
+        handler = {
+            "/api/paper_search": self.paper_search,
+            "/api/lookup_citations": self.lookup_citations,
+            "/api/bibtex": self.bibtex_entries,
+        }.get(path)
+        return handler(params) if handler else None
+
+def make_handler(store, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            body = store.answer(url.path, params)
+            time.sleep(latency)
+            status = 200 if body is not None else 404
+            data = json.dumps(body if body is not None else {"error": "Not found"}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+def start(port=0, latency=0.0, path=FIXTURES_PATH):
+    """Starts the replay server on a background thread; returns (base_url, server)."""
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(FixtureStore(load_fixtures(path)), latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def record(base_url, queries, path=FIXTURES_PATH):
+    """Records search results, citations and BibTeX for queries from the live API."""
+    from api.paper_search import SEARCH_FIELDS
+
+    fixtures = {"paper_search": {}, "lookup_citations": {}, "bibtex": {}}
+    session = requests.Session()
+    for query in queries:
+        search = session.get(f"{base_url}/api/paper_search", params={
+            "query": query, "limit": RECORD_PAPERS, "fields": SEARCH_FIELDS, "get_pdfs": "True"
+        }, timeout=60)
+        search.raise_for_status()
+        papers = search.json().get("papers", [])
+        fixtures["paper_search"][query] = {"papers": papers}
+        print(f"{query}: {len(papers)} papers")
+
+        for paper in papers:
+            citations = session.get(f"{base_url}/api/lookup_citations", params={
+                "id": paper["paperId"], "offset": 0, "limit": RECORD_CITATIONS, "fields": "contexts,title,authors,citationCount"
+            }, timeout=60)
+            if citations.ok:
+                fixtures["lookup_citations"][paper["paperId"]] = {"citations": citations.json().get("citations", [])}
+
+        corpus_ids = [str(paper["externalIds"]["CorpusId"]) for paper in papers if (paper.get("externalIds") or {}).get("CorpusId")]
+        for corpus_id in corpus_ids:
+            bibtex = session.get(f"{base_url}/api/bibtex", params={"id": f"CorpusId:{corpus_id}"}, timeout=60)
+            entries = bibtex.json().get("papers") if bibtex.ok else None
+            if entries and entries[0].get("bibtex"):
+                fixtures["bibtex"][corpus_id] = entries[0]["bibtex"]
+
+    save_fixtures(fixtures, path)
+    print(f"Saved {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--record", nargs="+", metavar="QUERY", help="Record these queries from --upstream instead of serving")
+    parser.add_argument("--upstream", default="http://recommendpapers.xyz")
+    args = parser.parse_args()
+
+    if args.record:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        record(args.upstream, args.record, args.fixtures)
+        return
+
+    base_url, _ = start(args.port, args.latency, args.fixtures)
+    print(f"Replaying {args.fixtures} on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
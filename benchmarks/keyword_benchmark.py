@@ -0,0 +1,89 @@
+"""
+Compares the keyword extraction engines on a fixed query set.
+
+For every query it reports the phrase each engine produced, its latency and,
+unless --skip-search is given, the overlap (Jaccard) of the papers that
+search_papers returns for the two phrases. The LLM engine and the search
+need OpenAI keys and network access.
+
+    python benchmarks/keyword_benchmark.py
+    python benchmarks/keyword_benchmark.py --skip-search --engines local
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "I want to study the ethics of generative AI but not NLP.",
+    "Find papers on robotic surgery and computer vision.",
+    "Find papers on NLP",
+    "transformers for protein folding, excluding RL",
+    "graph neural networks for drug discovery",
+    "How do LLMs hallucinate in question answering?",
+    "privacy preserving federated learning on mobile devices",
+    "explainable AI for medical diagnosis from MRI scans",
+    "reinforcement learning for autonomous driving but not simulation",
+    "sign language recognition using deep learning",
+    "energy efficient training of large language models",
+    "fairness and bias in face recognition systems",
+    "speech emotion recognition with CNNs",
+    "SLAM for drones in GPS-denied environments",
+    "retrieval augmented generation for legal documents",
+]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["llm", "local"], choices=["llm", "local", "hybrid"])
+    parser.add_argument("--skip-search", action="store_true", help="Only compare phrases and latency")
+    args = parser.parse_args()
+
+    from api.keyword_extraction import KEYWORD_ENGINES
+    from api.llm_cache import llm_cache
+
+    # Measure real LLM latency rather than cache hits
+    llm_cache.backend.clear()
+
+    latencies = {engine: [] for engine in args.engines}
+    overlaps = []
+    for query in QUERIES:
+        print(f"\n{query}")
+        paper_sets = {}
+        for engine in args.engines:
+            start = time.perf_counter()
+            phrase = KEYWORD_ENGINES[engine](query)
+            elapsed = time.perf_counter() - start
+            latencies[engine].append(elapsed)
+            print(f"  {engine:>6}: {elapsed * 1000:8.1f} ms  {phrase}")
+
+            if not args.skip_search:
+                from api.paper_search import search_papers
+
+                papers = search_papers(phrase)
+                paper_sets[engine] = {p["id"] for p in papers} if isinstance(papers, list) else set()
+
+        if len(paper_sets) == 2:
+            first, second = paper_sets.values()
+            union = first | second
+            overlap = len(first & second) / len(union) if union else 1.0
+            overlaps.append(overlap)
+            print(f"  paper overlap: {overlap:.2f}")
+
+    print("\nSummary")
+    for engine, values in latencies.items():
+        print(
+            f"  {engine:>6}: mean {statistics.mean(values) * 1000:8.1f} ms  "
+            f"p50 {percentile(values, 50) * 1000:8.1f} ms  p95 {percentile(values, 95) * 1000:8.1f} ms"
+        )
+    if overlaps:
+        print(f"  mean paper overlap ({' vs '.join(args.engines)}): {statistics.mean(overlaps):.2f}")
+
+if __name__ == "__main__":
+    main()
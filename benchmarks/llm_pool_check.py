@@ -0,0 +1,75 @@
+"""
+Exercises the OpenAI key pool against the local fake API (fake_openai.py).
+
+Key 1 gets a small request limit and key 2 a larger one. Concurrent
+completions are sent through api.llm_pool.LLMClientPool, once with only key 1
+(the old one-key-per-process behaviour) and once with both keys, and the
+script reports successes, errors, how the fake API saw each key and how many
+calls failed over.
+
+    python benchmarks/llm_pool_check.py --calls 60 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Only the fake API's limits should apply, not the client-side per-key cap
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+
+import fake_openai
+from api.llm_pool import LLMClientPool
+from api.telemetry import metrics
+
+KEYS = ["sk-fake-small", "sk-fake-large"]
+
+def run(pool, calls, concurrency):
+    def call(i):
+        try:
+            pool.chat_completion(model="fake", messages=[{"role": "user", "content": f"question {i}"}])
+            return None
+        except Exception as e:
+            return type(e).__name__
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        errors = [error for error in executor.map(call, range(calls)) if error]
+    return time.perf_counter() - start, errors
+
+def failovers():
+    for line in metrics.render().splitlines():
+        if line.startswith("research_llm_pool_failovers_total"):
+            yield line
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--small-rpm", type=int, default=10, help="Request limit of key 1 per window")
+    parser.add_argument("--large-rpm", type=int, default=100, help="Request limit of key 2 per window")
+    parser.add_argument("--window", type=float, default=5.0, help="Fake rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--queue-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    for label, keys in (("single key", KEYS[:1]), ("key pool", KEYS)):
+        base_url, fake = fake_openai.start(
+            rpm=args.large_rpm, key_rpm={KEYS[0]: args.small_rpm}, window=args.window, latency=args.latency
+        )
+        pool = LLMClientPool(keys, base_url=base_url, queue_timeout=args.queue_timeout)
+        elapsed, errors = run(pool, args.calls, args.concurrency)
+        print(f"\n{label}: {args.calls - len(errors)}/{args.calls} succeeded in {elapsed:.2f}s")
+        if errors:
+            print(f"  errors: {', '.join(sorted(set(errors)))} x{len(errors)}")
+        for key, counts in fake.summary().items():
+            print(f"  {key}: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    print("\nFailovers (both runs):")
+    for line in failovers():
+        print(f"  {line}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Load-test harness for the /chatbot backend.
+
+Starts a stub paper_search upstream with configurable latency, boots the
+backend (async ASGI or the Flask dev server) pointed at it, fires concurrent
+/chatbot requests and reports requests/sec and latency percentiles.
+
+    python benchmarks/load_test.py --target asgi --requests 1000 --concurrency 100
+    python benchmarks/load_test.py --target flask --requests 1000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB_PAPERS = {
+    "papers": [
+        {
+            "paperId": f"stub{i}",
+            "title": f"Stub Paper {i}",
+            "authors": [{"name": "Ada Lovelace"}, {"name": "Alan Turing"}],
+            "citationCount": i * 10,
+            "externalIds": {"CorpusId": 1000 + i, "DOI": f"10.0000/stub.{i}"},
+            "pdfs": [f"https://example.org/stub{i}.pdf"],
+        }
+        for i in range(10)
+    ]
+}
+
+def start_stub_upstream(latency):
+    body = json.dumps(STUB_PAPERS).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Backend did not start on port {port}")
+
+def start_backend(target, port, upstream_url, workers, workdir):
+    env = dict(
+        os.environ, UPSTREAM_BASE_URL=upstream_url, ASGI_PORT=str(port), ASGI_WORKERS=str(workers),
+        LOCAL_INDEX_MODE="off",  # Every query reaches the stub; no answers carried over from earlier runs
+    )
+    # Isolated on-disk state, so throughput never depends on what a previous run cached
+    for name, file_name in (("CACHE_PATH", "responses.sqlite3"), ("LLM_CACHE_PATH", "llm.sqlite3"),
+                            ("LOCAL_INDEX_PATH", "papers.sqlite3"), ("CITATION_GRAPH_PATH", "citations.sqlite3"),
+                            ("JOBS_PATH", "jobs.sqlite3"), ("PROFILE_DIR", "profiles")):
+        env[name] = os.path.join(workdir, file_name)
+    if target == "asgi":
+        cmd = [sys.executable, "asgi_app.py"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--with-threads"]
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+async def run_load(url, total, concurrency, distinct):
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"load test query {i if distinct else 0}")
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        async def worker():
+            while not queue.empty():
+                message = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json={"message": message}) as response:
+                        await response.read()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, latencies, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["asgi", "flask"], default="asgi")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="ASGI worker processes")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="Stub upstream latency in seconds")
+    parser.add_argument("--repeat-query", action="store_true", help="Send the same query every time (exercises the cache)")
+    args = parser.parse_args()
+
+    stub = start_stub_upstream(args.upstream_latency)
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        backend = start_backend(args.target, port, f"http://127.0.0.1:{stub.server_port}", args.workers, workdir)
+        try:
+            elapsed, latencies, statuses = asyncio.run(
+                run_load(f"http://127.0.0.1:{port}/chatbot", args.requests, args.concurrency, not args.repeat_query)
+            )
+        finally:
+            backend.terminate()
+            backend.wait()
+            stub.shutdown()
+
+    print(f"target:       {args.target}")
+    print(f"requests:     {len(latencies)} (concurrency {args.concurrency}, upstream latency {args.upstream_latency}s)")
+    print(f"statuses:     {statuses}")
+    print(f"requests/sec: {len(latencies) / elapsed:.1f}")
+    print(f"p50 latency:  {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"p99 latency:  {percentile(latencies, 99) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
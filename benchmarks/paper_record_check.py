@@ -0,0 +1,109 @@
+"""
+Compares the old paper dicts with api.paper.Paper records: memory held by
+cached searches and the time to serialize them for a /chatbot response.
+
+Builds synthetic paper_search responses shaped like the real API (including
+the full externalIds map), parses them both ways and reports peak traced
+memory per cached search and per-response JSON encoding time.
+
+    python benchmarks/paper_record_check.py --searches 200 --papers 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.paper_search import parse_papers
+from api.serialization import dumps, orjson
+
+def api_response(search, count):
+    return {
+        "papers": [
+            {
+                "paperId": f"{search:04x}{i:036x}",
+                "title": f"A Study of Topic {search} Number {i} in Neural Information Retrieval",
+                "authors": [{"authorId": str(1000 + a), "name": f"Author {a} Surname"} for a in range(4)],
+                "citationCount": i * 7,
+                "externalIds": {
+                    "CorpusId": search * 100 + i, "DOI": f"10.1000/{search}.{i}", "ArXiv": f"2101.{search:05d}",
+                    "MAG": str(3000000000 + i), "DBLP": f"journals/x/{search}{i}", "PubMed": str(30000000 + i),
+                    "PubMedCentral": str(7000000 + i), "ACL": f"2021.acl-{i}",
+                },
+                "pdfs": [f"https://example.org/{search}/{i}.pdf"],
+                "year": 2021,
+                "venue": "Annual Meeting of the Association for Computational Linguistics",
+                "journal": {"name": "ACL", "volume": "1", "pages": "100-110"},
+                "publicationTypes": ["JournalArticle", "Conference"],
+            }
+            for i in range(count)
+        ]
+    }
+
+def parse_dicts(api_response):
+    """The paper dicts search_papers returned before Paper records."""
+    papers = []
+    for paper in api_response["papers"]:
+        external_ids = paper.get("externalIds", {})
+        pdf_links = paper.get("pdfs", [])
+        journal = paper.get("journal") or {}
+        papers.append({
+            "id": paper.get("paperId", external_ids.get("CorpusId", "Unknown")),
+            "title": paper.get("title", "Unknown Title"),
+            "authors": [author.get("name", "Unknown") for author in paper.get("authors", [])],
+            "citations": paper.get("citationCount", 0),
+            "pdf": pdf_links[0] if pdf_links else "No PDF available",
+            "external_ids": external_ids,
+            "year": paper.get("year"),
+            "venue": paper.get("venue") or "",
+            "journal": journal.get("name") or "",
+            "volume": journal.get("volume") or "",
+            "pages": journal.get("pages") or "",
+            "publication_types": paper.get("publicationTypes") or [],
+        })
+    return papers
+
+def measure_memory(parse, responses):
+    # Responses are decoded fresh per search, as they are after an HTTP call
+    raw = [json.dumps(response) for response in responses]
+    tracemalloc.start()
+    cache = [parse(json.loads(body)) for body in raw]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cache
+    return current / len(responses)
+
+def measure_encoding(encode, searches, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for papers in searches:
+            encode({"papers": papers})
+    return (time.perf_counter() - start) / (repeat * len(searches))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--papers", type=int, default=10, help="Papers per search")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    responses = [api_response(search, args.papers) for search in range(args.searches)]
+    dict_searches = [parse_dicts(response) for response in responses]
+    record_searches = [parse_papers(response) for response in responses]
+
+    dict_memory = measure_memory(parse_dicts, responses)
+    record_memory = measure_memory(parse_papers, responses)
+    dict_time = measure_encoding(json.dumps, dict_searches, args.repeat)
+    record_time = measure_encoding(dumps, record_searches, args.repeat)
+
+    print(f"{args.searches} searches x {args.papers} papers (serializer: {'orjson' if orjson else 'json'})")
+    print(f"  memory per cached search: dicts {dict_memory / 1024:.1f} KiB, Paper {record_memory / 1024:.1f} KiB "
+          f"({1 - record_memory / dict_memory:.0%} less)")
+    print(f"  encode per response:      dicts {dict_time * 1e6:.1f} us, Paper {record_time * 1e6:.1f} us "
+          f"({dict_time / record_time:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
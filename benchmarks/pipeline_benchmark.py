@@ -0,0 +1,329 @@
+"""
+Benchmarks the research pipeline end to end, offline and reproducibly.
+
+The upstream API is replayed from recorded fixtures (fixture_upstream.py) and
+GPT calls go to the fake OpenAI API (fake_openai.py), each with its own
+latency. Scenarios call the same functions as the Gradio handlers:
+
+  search          keyword extraction + search_papers
+  citations@N     Get Citations with N selected papers (also bibtex, summary, compare)
+  file_*          text extraction from generated PDF, DOCX and TXT documents
+  users@N         N concurrent users each searching, then running every action
+
+For every scenario it reports throughput, p50/p95/p99 latency, errors and the
+peak Python heap (tracemalloc, measured on a separate run so it does not
+slow the timed iterations). Caches are cleared before every iteration unless
+--cache warm is given.
+
+    python benchmarks/pipeline_benchmark.py
+    python benchmarks/pipeline_benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmarks/pipeline_benchmark.py --baseline benchmarks/baseline.json
+    python benchmarks/pipeline_benchmark.py --scenarios search bibtex --iterations 50
+
+With --baseline the run is compared scenario by scenario, and the exit status
+is 1 if p95 latency or peak memory grew (or throughput fell) by more than
+--tolerance.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+sys.path.insert(0, BENCHMARKS)
+
+import fake_openai
+import fixture_upstream
+
+QUERIES = [
+    "Find papers on graph neural networks for drug discovery",
+    "retrieval augmented generation for question answering",
+    "privacy preserving federated learning on mobile devices",
+    "How do message passing networks predict molecular properties?",
+]
+ACTIONS = ("citations", "bibtex", "summary", "compare")
+SAMPLE_TEXT = os.path.join(BENCHMARKS, "fixtures", "sample_paper.txt")
+DOCUMENT_PAGES = 12
+
+def configure(upstream_url, openai_url, workdir):
+    """Points the app at the local servers. Must run before any api module is imported."""
+    os.environ.update(
+        UPSTREAM_BASE_URL=upstream_url,
+        OPENAI_BASE_URL=openai_url,
+        OPENAI_API_KEY_1="sk-bench",
+        LLM_REQUESTS_PER_MINUTE="0",  # Only the fake API's limits apply
+        PREFETCH_ENABLED="false",     # Background work would blur per-action timings
+    )
+    for i in range(2, 10):
+        os.environ[f"OPENAI_API_KEY_{i}"] = ""  # Keep real keys from .env away from the fake API
+    # Isolated on-disk state; the backends themselves can still be chosen via the environment
+    os.environ.setdefault("LOCAL_INDEX_MODE", "off")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for name, file_name in (("CACHE_PATH", "responses.sqlite3"), ("LLM_CACHE_PATH", "llm.sqlite3"),
+                            ("LOCAL_INDEX_PATH", "papers.sqlite3"), ("CITATION_GRAPH_PATH", "citations.sqlite3"),
+                            ("JOBS_PATH", "jobs.sqlite3"), ("PROFILE_DIR", "profiles")):
+        os.environ[name] = os.path.join(workdir, file_name)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def failed(result):
+    """The pipeline reports most failures inline in its HTML rather than raising."""
+    if isinstance(result, dict):
+        return "error" in result
+    return isinstance(result, str) and ("❌" in result or "Error retrieving" in result)
+
+def summarize(latencies, errors, wall, peak):
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+def peak_memory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(operation, iterations, reset, warmup=1):
+    """Runs operation(i) serially; reset() runs before each call, outside the timing."""
+    for i in range(warmup):
+        reset()
+        operation(i)
+    latencies, errors = [], 0
+    for i in range(iterations):
+        reset()
+        start = time.perf_counter()
+        try:
+            errors += failed(operation(i))
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    reset()
+    peak = peak_memory(lambda: operation(0))
+    return summarize(latencies, errors, sum(latencies), peak)
+
+def measure_concurrent(session, users, rounds, reset):
+    """Runs users concurrent sessions, rounds times each; latency is per session."""
+    def run_all():
+        latencies, errors = [], 0
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            for result in executor.map(timed, range(users * rounds)):
+                latencies.append(result[0])
+                errors += result[1]
+        return latencies, errors
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            errors = session(i)
+        except Exception:
+            errors = 1
+        return time.perf_counter() - start, errors
+
+    reset()
+    start = time.perf_counter()
+    latencies, errors = run_all()
+    wall = time.perf_counter() - start
+    reset()
+    peak = peak_memory(run_all)
+    return summarize(latencies, errors, wall, peak)
+
+def make_documents(directory):
+    """Writes the sample paper as PDF, DOCX and TXT; formats whose library is missing are skipped."""
+    with open(SAMPLE_TEXT, encoding="utf-8") as f:
+        text = f.read()
+    title, body = text.split("\n", 1)
+    documents = {}
+
+    path = os.path.join(directory, "sample.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(title + "\n" + body * DOCUMENT_PAGES)
+    documents["file_txt"] = path
+
+    try:
+        import fitz
+
+        path = os.path.join(directory, "sample.pdf")
+        with fitz.open() as pdf:
+            for page_number in range(DOCUMENT_PAGES):
+                page = pdf.new_page()
+                page.insert_textbox(fitz.Rect(50, 50, 550, 800), (title + "\n" if page_number == 0 else "") + body, fontsize=8)
+            pdf.save(path)
+        documents["file_pdf"] = path
+    except ImportError:
+        print("PyMuPDF is not installed; skipping the PDF scenario")
+
+    try:
+        import docx
+
+        path = os.path.join(directory, "sample.docx")
+        document = docx.Document()
+        document.add_paragraph(title)
+        for _ in range(DOCUMENT_PAGES):
+            for line in body.splitlines():
+                document.add_paragraph(line)
+        document.save(path)
+        documents["file_docx"] = path
+    except ImportError:
+        print("python-docx is not installed; skipping the DOCX scenario")
+    return documents
+
+def run_scenarios(args, workdir):
+    from api.bibtex import get_bibtex
+    from api.cache import response_cache
+    from api.citations import get_citations
+    from api.compare import compare_papers
+    from api.file_extraction import extract_text_from_file
+    from api.keyword_extraction import extract_main_keyword
+    from api.llm_cache import llm_cache
+    from api.paper_search import search_papers
+    from api.summarizer import summarize_papers
+
+    def reset():
+        if args.cache == "cold":
+            response_cache.backend.clear()
+            llm_cache.backend.clear()
+
+    def search(i):
+        return search_papers(extract_main_keyword(QUERIES[i % len(QUERIES)]))
+
+    papers = search(0)
+    if failed(papers) or not papers:
+        raise SystemExit(f"Search against the fixtures failed: {papers}")
+    title_map = {paper.id: paper.title for paper in papers}
+
+    def action(name, count):
+        ids = [paper.id for paper in papers[:count]]
+        return {
+            "citations": lambda i: get_citations(ids, title_map),
+            "bibtex": lambda i: get_bibtex(ids, title_map, papers),
+            "summary": lambda i: summarize_papers(ids, title_map),
+            "compare": lambda i: compare_papers(ids, title_map),
+        }[name]
+
+    def user_session(i):
+        results = search(i)
+        if failed(results):
+            return 1
+        ids = [paper.id for paper in results[:5]]
+        titles = {paper.id: paper.title for paper in results}
+        outputs = [
+            get_citations(ids, titles),
+            get_bibtex(ids, titles, results),
+            summarize_papers(ids, titles),
+            compare_papers(ids, titles),
+        ]
+        return sum(failed(output) for output in outputs)
+
+    scenarios = {}
+
+    def wanted(name):
+        return not args.scenarios or any(name == s or name.startswith(f"{s}@") or name.startswith(f"{s}_") for s in args.scenarios)
+
+    if wanted("search"):
+        scenarios["search"] = lambda: measure(search, args.iterations, reset)
+    for name in ACTIONS:
+        for count in args.selections:
+            if name == "compare" and count < 2:
+                continue  # The UI asks for at least 2 papers
+            if wanted(f"{name}@{count}"):
+                scenarios[f"{name}@{count}"] = lambda name=name, count=count: measure(action(name, count), args.iterations, reset)
+    documents = make_documents(workdir) if any(wanted(name) for name in ("file_txt", "file_pdf", "file_docx")) else {}
+    for name, path in documents.items():
+        if wanted(name):
+            scenarios[name] = lambda path=path: measure(lambda i: extract_text_from_file(path), args.iterations, reset)
+    for users in args.users:
+        if wanted(f"users@{users}"):
+            scenarios[f"users@{users}"] = lambda users=users: measure_concurrent(user_session, users, args.rounds, reset)
+
+    results = {}
+    for name, run in scenarios.items():
+        results[name] = run()
+        print(format_row(name, results[name]))
+    return results
+
+def format_row(name, stats):
+    return (f"{name:<14} {stats['throughput']:9.1f}/s  p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+            f"p99 {stats['p99_ms']:8.1f} ms  peak {stats['peak_kib']:9.1f} KiB  errors {stats['errors']}")
+
+def change(new, old):
+    return (new - old) / old if old else 0.0
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Prints the change per scenario and returns the names of regressed scenarios."""
+    regressions = []
+    print(f"\nCompared with baseline from {baseline.get('created', 'unknown')} (tolerance {tolerance:.0%})")
+    for name, stats in results.items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            print(f"{name:<14} not in baseline")
+            continue
+        p95 = change(stats["p95_ms"], old["p95_ms"])
+        throughput = change(stats["throughput"], old["throughput"])
+        peak = change(stats["peak_kib"], old["peak_kib"])
+        regressed = p95 > tolerance or peak > tolerance or throughput < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<14} p95 {p95:+7.1%}  throughput {throughput:+7.1%}  peak {peak:+7.1%}" + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", help="Scenario names or prefixes (search, citations, bibtex, summary, compare, file, users)")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per serial scenario")
+    parser.add_argument("--selections", type=int, nargs="+", default=[1, 5, 10], help="Selected papers per action")
+    parser.add_argument("--users", type=int, nargs="+", default=[5, 20], help="Concurrent users per scenario")
+    parser.add_argument("--rounds", type=int, default=2, help="Sessions per concurrent user")
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Fixture upstream latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake OpenAI latency in seconds")
+    parser.add_argument("--llm-rpm", type=int, default=10000, help="Fake OpenAI requests per minute per key")
+    parser.add_argument("--fixtures", default=fixture_upstream.FIXTURES_PATH)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    upstream_url, upstream_server = fixture_upstream.start(latency=args.upstream_latency, path=args.fixtures)
+    openai_url, _ = fake_openai.start(rpm=args.llm_rpm, latency=args.llm_latency)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure(upstream_url, openai_url, workdir)
+        scenarios = run_scenarios(args, workdir)
+    upstream_server.shutdown()
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "settings": {name: getattr(args, name) for name in ("iterations", "rounds", "cache", "upstream_latency", "llm_latency")},
+        "scenarios": scenarios,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {path}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(scenarios, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
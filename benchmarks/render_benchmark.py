@@ -0,0 +1,103 @@
+"""
+Measures how long the search result views take to render and how much they
+allocate: the selector labels, the PDF links box and the /chatbot markdown.
+Compares the old string concatenation with api.render templates, both cold
+(empty fragment cache) and warm (fragments cached, as on "Load More" or a
+repeated search).
+
+    python benchmarks/render_benchmark.py --sizes 10 100 1000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.paper_search import parse_papers
+from api.render import PDF_BOX_STYLE, fragments, join, paper_fragment, render
+from paper_record_check import api_response
+
+def concat_views(papers):
+    """The result views as search_and_update and build_response built them before templates."""
+    labels = []
+    for paper in papers:
+        label = f"📄 {paper.title}\n👥 {', '.join(paper.authors)}\n📈 Citations: {paper.citations}"
+        if paper.pdf:
+            label += f"\n🔗 [PDF]({paper.pdf})"
+        labels.append(label)
+
+    pdf_links_inner = ""
+    for paper in papers:
+        pdf = paper.pdf.strip()
+        if pdf.startswith("http"):
+            pdf_links_inner += f"<li><a href='{pdf}' target='_blank' style='color: #93c5fd;'>{paper.title}</a></li>"
+        else:
+            pdf_links_inner += f"<li>{paper.title} <span style='color: #94a3b8;'>(No PDF available)</span></li>"
+    pdf_box = f"<div id='pdf-box' style='{PDF_BOX_STYLE}'><h3 style='margin-top: 0;'>🔗 PDF Links for Papers</h3><ul>{pdf_links_inner}</ul></div>"
+
+    markdown = "**Here are some relevant research papers:**\n\n"
+    for i, paper in enumerate(papers, 1):
+        markdown += (
+            f"**{i}. {paper['title']}**\n"
+            f"🔗 {'[PDF Available]('+paper['pdf']+')' if paper['pdf'] != 'No PDF available' else 'No PDF available'}\n"
+            f"👥 Authors: {', '.join(paper['authors'])}\n"
+            f"📊 Citations: {paper['citations']}\n\n"
+        )
+    return labels, pdf_box, markdown
+
+def template_views(papers):
+    """The same views from cached fragments, as gradio_frontend and app.py build them now."""
+    labels = [paper_fragment("paper_label.txt", paper) for paper in papers]
+    links = join(paper_fragment("pdf_link.html", paper) for paper in papers)
+    pdf_box = str(render("pdf_links.html", style=PDF_BOX_STYLE, content=links))
+    markdown = "**Here are some relevant research papers:**\n\n" + "".join(
+        f"{i}. {paper_fragment('paper.md', paper)}" for i, paper in enumerate(papers, 1)
+    )
+    return labels, pdf_box, markdown
+
+def measure(views, papers, repeat, cold):
+    """Returns (seconds per render, peak bytes allocated by one render)."""
+    elapsed = 0.0
+    for _ in range(repeat):
+        if cold:
+            fragments.clear()
+        start = time.perf_counter()
+        views(papers)
+        elapsed += time.perf_counter() - start
+
+    if cold:
+        fragments.clear()
+    tracemalloc.start()
+    result = views(papers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed / repeat, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Papers per result set")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'papers':>7}  {'variant':<18}{'render':>12}{'peak alloc':>14}")
+    for size in args.sizes:
+        # api_response makes at most 10 papers per search, so build the set from several searches
+        papers = [paper for search in range(-(-size // 10)) for paper in parse_papers(api_response(search, 10))][:size]
+        repeat = max(1, args.repeat * 10 // size)
+        concat_time, concat_peak = measure(concat_views, papers, repeat, cold=False)
+        cold_time, cold_peak = measure(template_views, papers, repeat, cold=True)
+        template_views(papers)  # Warm the fragment cache
+        warm_time, warm_peak = measure(template_views, papers, repeat, cold=False)
+        for variant, seconds, peak in (
+            ("concatenation", concat_time, concat_peak),
+            ("templates, cold", cold_time, cold_peak),
+            ("templates, warm", warm_time, warm_peak),
+        ):
+            print(f"{size:>7}  {variant:<18}{seconds * 1e3:>9.3f} ms{peak / 1024:>10.1f} KiB")
+    print(f"fragment cache: {fragments.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,179 @@
 import os
-import random
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 load_dotenv()
 
-# Store API keys in a list
-OPENAI_API_KEYS = list(filter(None, [os.getenv("OPENAI_API_KEY_1"), os.getenv("OPENAI_API_KEY_2")]))
+# Store API keys in a list (OPENAI_API_KEY_1, OPENAI_API_KEY_2, ...); calls are
+# spread across all of them by api.llm_pool
+OPENAI_API_KEYS = list(filter(None, [os.getenv(f"OPENAI_API_KEY_{i}") for i in range(1, 10)]))
 
-def get_openai_api_key():
-    """Returns a random OpenAI API key to distribute requests."""
-    if not OPENAI_API_KEYS:
-        raise ValueError("No OpenAI API keys found in the environment variables.")
-    return random.choice(OPENAI_API_KEYS)
+# Concurrency settings for per-paper upstream lookups
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "15"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Upstream (recommendpapers.xyz) HTTP client settings
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL", "http://recommendpapers.xyz")
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "20"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Total time one upstream call may take, attempts and backoff included (REQUEST_TIMEOUT
+# is per attempt), and how long fetch_all waits per item; keep the latter above the former
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "30"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", str(UPSTREAM_DEADLINE + 5)))
+
+# Response cache settings ("memory" or "sqlite")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "cache/responses.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_TTL_SEARCH = float(os.getenv("CACHE_TTL_SEARCH", str(10 * 60)))
+CACHE_TTL_CITATIONS = float(os.getenv("CACHE_TTL_CITATIONS", str(6 * 60 * 60)))
+CACHE_TTL_BIBTEX = float(os.getenv("CACHE_TTL_BIBTEX", str(30 * 24 * 60 * 60)))
+
+# LLM settings and response cache ("memory" or "sqlite")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# Optional embedding-similarity tier for near-duplicate keyword queries (needs numpy)
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE", "false").lower() == "true"
+LLM_SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.95"))
+LLM_SEMANTIC_MAX_ENTRIES = int(os.getenv("LLM_SEMANTIC_MAX_ENTRIES", "1000"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Model tiering: features listed in LLM_FAST_FEATURES (simple rewriting tasks)
+# use LLM_MODEL_FAST instead of LLM_MODEL
+LLM_MODEL_FAST = os.getenv("LLM_MODEL_FAST", "gpt-4o-mini")
+LLM_FAST_FEATURES = set(filter(None, os.getenv("LLM_FAST_FEATURES", "keyword,bibtex").split(",")))
+# Token budgets per feature: prompt size (longer inputs are truncated) and max_tokens of the reply
+LLM_INPUT_TOKENS = {
+    "keyword": int(os.getenv("LLM_INPUT_TOKENS_KEYWORD", "2000")),
+    "bibtex": int(os.getenv("LLM_INPUT_TOKENS_BIBTEX", "600")),
+    "paper_summary": int(os.getenv("LLM_INPUT_TOKENS_PAPER_SUMMARY", "800")),
+    "summarize": int(os.getenv("LLM_INPUT_TOKENS_SUMMARIZE", "6000")),
+    "compare": int(os.getenv("LLM_INPUT_TOKENS_COMPARE", "8000")),
+}
+LLM_OUTPUT_TOKENS = {
+    "keyword": int(os.getenv("LLM_OUTPUT_TOKENS_KEYWORD", "32")),
+    "bibtex": int(os.getenv("LLM_OUTPUT_TOKENS_BIBTEX", "400")),
+    "paper_summary": int(os.getenv("LLM_OUTPUT_TOKENS_PAPER_SUMMARY", "600")),
+    "summarize": int(os.getenv("LLM_OUTPUT_TOKENS_SUMMARIZE", "2000")),
+    "compare": int(os.getenv("LLM_OUTPUT_TOKENS_COMPARE", "2500")),
+}
+
+# Per-paper (map-reduce) summarization: "per_paper" or "single" prompt
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "per_paper")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+
+# Async (ASGI) backend settings
+ASGI_HOST = os.getenv("ASGI_HOST", "127.0.0.1")
+ASGI_PORT = int(os.getenv("ASGI_PORT", "5000"))
+ASGI_WORKERS = int(os.getenv("ASGI_WORKERS", "1"))
+ASGI_MAX_CONCURRENCY = int(os.getenv("ASGI_MAX_CONCURRENCY", "64"))
+ASGI_MAX_QUEUE = int(os.getenv("ASGI_MAX_QUEUE", "256"))
+ASGI_REQUEST_TIMEOUT = float(os.getenv("ASGI_REQUEST_TIMEOUT", "30"))
+# Total time the async upstream client may spend on one call, retries and backoff
+# included; keep it below ASGI_REQUEST_TIMEOUT so calls fail cleanly instead of being cancelled
+ASGI_UPSTREAM_DEADLINE = float(os.getenv("ASGI_UPSTREAM_DEADLINE", "25"))
+ASGI_SHUTDOWN_TIMEOUT = float(os.getenv("ASGI_SHUTDOWN_TIMEOUT", "10"))
+
+# Number of Gradio handlers allowed to run at once per event
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "16"))
+
+# Uploaded file extraction: only this much text is kept for keyword extraction
+FILE_TEXT_MAX_CHARS = int(os.getenv("FILE_TEXT_MAX_CHARS", "6000"))
+FILE_SCAN_MAX_CHARS = int(os.getenv("FILE_SCAN_MAX_CHARS", "40000"))
+FILE_EXTRACTION_WORKERS = int(os.getenv("FILE_EXTRACTION_WORKERS", "2"))
+FILE_EXTRACTION_TIMEOUT = float(os.getenv("FILE_EXTRACTION_TIMEOUT", "30"))
+CACHE_TTL_FILE_TEXT = float(os.getenv("CACHE_TTL_FILE_TEXT", str(24 * 60 * 60)))
+
+# Keyword extraction engine: "llm", "local" or "hybrid" (local first, LLM fallback)
+KEYWORD_ENGINE = os.getenv("KEYWORD_ENGINE", "hybrid")
+LOCAL_KEYWORD_MAX_CHARS = int(os.getenv("LOCAL_KEYWORD_MAX_CHARS", "300"))
+LOCAL_KEYWORD_MIN_WORDS = int(os.getenv("LOCAL_KEYWORD_MIN_WORDS", "2"))
+
+# Local paper index: "off", "first" (answer locally when confident, refreshing
+# from the API in the background) or "merge" (API results plus local extras).
+# Coverage is the IDF-weighted share of query terms a paper matches
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "merge")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "cache/papers.sqlite3")
+LOCAL_INDEX_MIN_COVERAGE = float(os.getenv("LOCAL_INDEX_MIN_COVERAGE", "0.6"))
+LOCAL_INDEX_MIN_RESULTS = int(os.getenv("LOCAL_INDEX_MIN_RESULTS", "5"))
+LOCAL_INDEX_VECTOR_WEIGHT = float(os.getenv("LOCAL_INDEX_VECTOR_WEIGHT", "0.3"))
+LOCAL_INDEX_MERGE_EXTRA = int(os.getenv("LOCAL_INDEX_MERGE_EXTRA", "5"))
+
+# Batched BibTeX lookups: CorpusIds per bulk request, negative-result TTL, and
+# how long a BibTeX click waits for an in-flight prefetch before fetching itself
+BIBTEX_BATCH_SIZE = int(os.getenv("BIBTEX_BATCH_SIZE", "20"))
+CACHE_TTL_BIBTEX_MISSING = float(os.getenv("CACHE_TTL_BIBTEX_MISSING", str(60 * 60)))
+BIBTEX_PREFETCH_WAIT = float(os.getenv("BIBTEX_PREFETCH_WAIT", str(REQUEST_TIMEOUT)))
+
+# Missing BibTeX entries are built locally from search metadata; set to "true"
+# to let GPT write entries the metadata is too sparse for (no authors or year)
+BIBTEX_LLM_FALLBACK = os.getenv("BIBTEX_LLM_FALLBACK", "false").lower() == "true"
+
+# Background prefetch after each search: citations and BibTeX for the top
+# results, plus per-paper summaries if enabled (capped per rolling hour)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "5"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_SUMMARIES = os.getenv("PREFETCH_SUMMARIES", "false").lower() == "true"
+PREFETCH_LLM_BUDGET = int(os.getenv("PREFETCH_LLM_BUDGET", "30"))
+
+# Observability: log level for the span trace log ("DEBUG" logs every span),
+# share of backend requests profiled with cProfile (changeable at runtime via
+# /debug/profile) and the frontend's own /metrics port (0 disables it)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "cache/profiles")
+FRONTEND_METRICS_PORT = int(os.getenv("FRONTEND_METRICS_PORT", "0"))
+
+# OpenAI key pool: attempts across keys per call, how long a call may wait for
+# a key with capacity, backoff after 5xx/429 and the cooldown for a key whose
+# quota is used up
+LLM_POOL_MAX_ATTEMPTS = int(os.getenv("LLM_POOL_MAX_ATTEMPTS", "4"))
+LLM_POOL_QUEUE_TIMEOUT = float(os.getenv("LLM_POOL_QUEUE_TIMEOUT", "30"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_QUOTA_COOLDOWN = float(os.getenv("LLM_QUOTA_COOLDOWN", str(60 * 60)))
+
+# Where the frontend runs paper searches: "local" calls search_papers in-process,
+# "remote" POSTs to the /chatbot backend at BACKEND_URL (app.py or asgi_app.py)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "local")
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:5000")
+# How long the frontend waits for the backend: a little over ASGI_REQUEST_TIMEOUT,
+# so the backend's own 504 arrives first when it is merely slow
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", str(ASGI_REQUEST_TIMEOUT + 5)))
+
+# Pagination: papers per search page, the API's cap on offset + limit, and
+# citations fetched per paper per page
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+CITATIONS_PAGE_SIZE = int(os.getenv("CITATIONS_PAGE_SIZE", "3"))
+
+# Citation graph built from lookup_citations responses, and the "Explore
+# Citation Graph" expansion: levels of citing papers, citing papers fetched per
+# paper, papers visited per expansion and results shown
+CITATION_GRAPH_PATH = os.getenv("CITATION_GRAPH_PATH", "cache/citations.sqlite3")
+CITATION_GRAPH_HOPS = int(os.getenv("CITATION_GRAPH_HOPS", "2"))
+CITATION_GRAPH_FANOUT = int(os.getenv("CITATION_GRAPH_FANOUT", "10"))
+CITATION_GRAPH_MAX_NODES = int(os.getenv("CITATION_GRAPH_MAX_NODES", "200"))
+CITATION_GRAPH_RESULTS = int(os.getenv("CITATION_GRAPH_RESULTS", "15"))
+
+# Background jobs for the summary, comparison and BibTeX buttons: job table,
+# worker threads, how long a finished result is reused for the same selection
+# and how often the UI polls a running job
+JOBS_PATH = os.getenv("JOBS_PATH", "cache/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(24 * 60 * 60)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+# Rendered HTML/markdown fragments kept per (paper or citation, view)
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "20000"))
@@ -1,193 +1,287 @@
+import html
+import logging
+
 import gradio as gr
 import requests
-import os
-import fitz  # PyMuPDF for PDFs
-import docx
-
-from api.citations import get_citations  # Import our get_citations function
-from api.bibtex import get_bibtex  # Import the get_bibtex function
-from api.compare import compare_papers
-from api.summarizer import summarize_papers
+
+from api.citations import format_citations_box, get_citations_page
+from api.citation_graph import get_related_papers
+from api.job_actions import submit_job
+from api.jobs import DONE, FAILED, QUEUED, get_job_queue
 from api.literature_review import generate_literature_review
 from api.keyword_extraction import extract_main_keyword
+from api.file_extraction import ExtractionError, extract_text_from_file
+from api.paper import as_papers
+from api.paper_search import search_papers_page
+from api.prefetch import prefetcher
+from api.render import PDF_BOX_STYLE, join, message, paper_fragment, render
+from api.telemetry import current_trace_id, span, start_metrics_server, trace
+from config import (
+    GRADIO_CONCURRENCY_LIMIT,
+    FRONTEND_METRICS_PORT,
+    LOG_LEVEL,
+    SEARCH_MODE,
+    BACKEND_URL,
+    BACKEND_TIMEOUT,
+    JOB_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+def new_session():
+    """
+    Search and selection state for one browser session. Kept in gr.State so
+    concurrent users never see or overwrite each other's results.
+    """
+    return {
+        "paper_ids": [],              # List of paper IDs.
+        "paper_title_map": {},        # Mapping: paper_id -> paper title.
+        "cached_papers": [],          # Paper records, in result order
+        "selected_paper_ids": [],
+        "prefetch_batch": None,       # ID of the background prefetch for these results
+        "next_cursor": None,          # Cursor for the next page of results, None when there are no more
+        "citation_paper_ids": [],     # Papers whose citations are in citations_html
+        "citations_html": "",
+        "citation_offsets": {},       # Mapping: paper_id -> offset of its next citations page
+    }
+
+def find_papers(keyword, cursor=None):
+    """
+    Runs the paper search for keyword, or fetches the page after cursor. With
+    SEARCH_MODE="local" it runs in this process; "remote" keeps the hop to the
+    /chatbot backend and asks it for the papers only.
+    Returns (papers, next cursor, error message or None).
+    """
+    if SEARCH_MODE == "remote":
+        # The backend continues this trace, so its spans share the trace ID
+        headers = {"Content-Type": "application/json", "X-Trace-Id": current_trace_id()}
+        data = {"message": keyword, "papers_only": True, "cursor": cursor}  # Send extracted keyword instead of full query
+        with span("backend_request") as current:
+            try:
+                # Bounded, so a hung backend cannot hold this Gradio worker
+                response = requests.post(f"{BACKEND_URL}/chatbot", json=data, headers=headers, timeout=BACKEND_TIMEOUT)
+            except requests.Timeout:
+                current.set(status="timeout")
+                return None, None, f"The search backend did not answer within {BACKEND_TIMEOUT:g}s, please try again."
+            current.set(status=response.status_code)
+        if response.status_code != 200:
+            return None, None, f"Error: {response.status_code}"
+        page = response.json()
+    else:
+        page = search_papers_page(keyword, cursor)
 
-# Global variables to store search result data.
-paper_ids = []             # List of paper IDs.
-paper_title_map = {}       # Mapping: paper_id -> paper title.
-cached_papers = [] 
-selected_paper_ids = []
-formatted_label_to_id = {}
+    if "error" in page:
+        return None, None, f"Search failed: {page.get('error') or 'unknown error'}"
+    return as_papers(page.get("papers", [])), page.get("next_cursor"), None
 
-def extract_text_from_file(file_path):
+def paper_label(paper):
+    return paper_fragment("paper_label.txt", paper)
+
+def paper_choices(papers):
     """
-    Extracts text from a given file (.txt, .docx, .pdf).
+    CheckboxGroup choices as (label, paper ID) pairs, so selections come back
+    as IDs. Labels come from the fragment cache, so "Load More" only renders
+    the new papers, and are never stored in the session.
     """
-    file_extension = os.path.splitext(file_path)[1].lower()
-    
-    try:
-        if file_extension == ".txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
-        
-        elif file_extension == ".docx":
-            doc = docx.Document(file_path)
-            return "\n".join([para.text for para in doc.paragraphs])
-        
-        elif file_extension == ".pdf":
-            pdf_document = fitz.open(file_path)
-            text = "\n".join([page.get_text() for page in pdf_document])
-            return text if text else "No extractable text found in the PDF."
-        
-        else:
-            return "Unsupported file format."
-    
-    except Exception as e:
-        return f"Error extracting text: {str(e)}"
-
-def search_and_update(query, file) -> tuple:
+    return [(paper_label(paper), paper.id) for paper in papers]
+
+def pdf_links_box(papers):
+    # One cached <li> per paper, joined into the styled box
+    links = join(paper_fragment("pdf_link.html", paper) for paper in papers)
+    return str(render("pdf_links.html", style=PDF_BOX_STYLE, content=links))
+
+def add_papers(session, papers):
+    """Adds papers not already in the session's results; returns the ones added."""
+    added = []
+    for paper in papers:
+        if paper.id in session["paper_title_map"]:
+            continue  # Pages can overlap, e.g. after a local index answer
+        session["paper_ids"].append(paper.id)
+        session["paper_title_map"][paper.id] = paper.title
+        session["cached_papers"].append(paper)
+        added.append(paper)
+    return added
+
+def search_and_update(query, file, session) -> tuple:
     """
     Extracts the main topic keyword from the query (or uploaded file content),
     then passes the extracted keyword to the paper search API.
+    Results are stored in this user's session state. Each search is one trace.
     """
-    global paper_ids, paper_title_map
-    paper_ids = []
-    paper_title_map = {}
+    with trace(), span("search"):
+        return run_search(query, file, session)
+
+def run_search(query, file, session) -> tuple:
+    # Errors keep the previous results; a successful search replaces them
+    results = new_session()
 
     # If a file is uploaded, extract its content and append it to the query
     if file is not None:
-        file_text = extract_text_from_file(file.name)
-        if "Error" in file_text:
-            return file_text  # Display error message if file extraction fails
+        try:
+            file_text = extract_text_from_file(file.name)
+        except ExtractionError as e:
+            return gr.update(), str(message(f"❌ {str(e)}")), session  # Display error message if file extraction fails
         query += " " + file_text  # Append extracted content to query
 
     # Extract the main topic keyword from the query
     keyword = extract_main_keyword(query)
-    print(f"Extracted Keyword: {keyword}")  # Debugging log
-
-    url = "http://127.0.0.1:5000/chatbot"
-    headers = {"Content-Type": "application/json"}
-    data = {"message": keyword}  # Send extracted keyword instead of full query
+    logger.info("Extracted keyword: %r", keyword[:100])
 
     try:
-        response = requests.post(url, json=data, headers=headers)
-        if response.status_code == 200:
-            response_data = response.json()
-            markdown_text = response_data.get("response", "No response received")
-            papers = response_data.get("papers", [])
-
-            global cached_papers
-            cached_papers = papers
-
-            # Build global paper_ids and mapping from id to title.
-            for paper in papers:
-                if isinstance(paper, dict):
-                    pid = str(paper.get("id", "N/A"))
-                    title = paper.get("title", "Unknown Title")
-                    paper_ids.append(pid)
-                    paper_title_map[pid] = title
-            html_results = "<div style='line-height:1.8;'>"
-            
-            for paper in papers:
-                pid = str(paper.get("id", "N/A"))
-                title = paper.get("title", "Unknown Title")
-                html_results += f"""
-                    <div style='margin-bottom: 10px;'>
-                        <div style='padding:5px 10px; border:1px solid #999; background:#f8f8f8;'>
-                            📄 {title}
-                        </div>
-                    </div>
-                """
-            html_results += "</div>"
-
-            titles = []
-            global formatted_label_to_id
-            formatted_label_to_id = {}
-
-            for paper in papers:
-                title = paper.get("title", "Unknown Title")
-                authors = ", ".join(paper.get("authors", []))
-                citations = paper.get("citations", 0)
-                pdf_link = paper.get("pdf", None)
-
-                label = f"📄 {title}\n👥 {authors}\n📈 Citations: {citations}"
-                if pdf_link:
-                    label += f"\n🔗 [PDF]({pdf_link})"
-
-                titles.append(label)
-                formatted_label_to_id[label] = str(paper.get("id", "N/A"))
-
-            pdf_links_inner = ""
-            for paper in papers:
-                title = paper.get("title", "Unknown Title")
-                pdf = paper.get("pdf", "").strip()
-
-                if pdf.startswith("http"):
-                    pdf_links_inner += f"<li><a href='{pdf}' target='_blank' style='color: #93c5fd;'>{title}</a></li>"
-                else:
-                    pdf_links_inner += f"<li>{title} <span style='color: #94a3b8;'>(No PDF available)</span></li>"
-
-            if pdf_links_inner:
-                pdf_links_html = f"<ul style='padding-left: 20px; margin: 0;'>{pdf_links_inner}</ul>"
-            else:
-                pdf_links_html = "<p style='color: #cbd5e1;'>No PDF links available for these results.</p>"
-
-            # Safely wrap the links inside the outer styled box directly
-            wrapped_pdf_html = f"""
-            <div id='pdf-box' style='border: 2px solid #334155; border-radius: 10px; padding: 16px; background-color: #1e293b; color: #e2e8f0; margin-top: 50px; max-height: 200px; overflow-y: auto;'>
-                <h3 style='margin-top: 0;'>🔗 PDF Links for Papers</h3>
-                {pdf_links_html}
-            </div>
-            """
-
-            return (
-                gr.update(choices=titles, value=[]),
-                wrapped_pdf_html
-            )
-
-        else:
-            return f"Error: {response.status_code}"
+        papers, next_cursor, error = find_papers(keyword)
+        if error:
+            return gr.update(), str(message(error)), session
+
+        add_papers(results, papers)
+        results["next_cursor"] = next_cursor
+        # Warm BibTeX, citations and summaries while the user reads the results;
+        # queued work for this session's previous results is cancelled
+        results["prefetch_batch"] = prefetcher.schedule(papers, supersedes=session.get("prefetch_batch"))
+
+        return (
+            gr.update(choices=paper_choices(results["cached_papers"]), value=[]),
+            pdf_links_box(results["cached_papers"]),
+            results
+        )
     except Exception as e:
-        return f"Request failed: {str(e)}"
+        return gr.update(), str(message(f"Request failed: {str(e)}")), session
 
-def update_selection(selected_titles):
-    global selected_paper_ids
-    selected_paper_ids = [
-        formatted_label_to_id[label] for label in selected_titles if label in formatted_label_to_id
-    ]
-    return f"✅ Selected papers: {len(selected_paper_ids)}" 
+def load_more(session):
+    """
+    Appends the next page of results to the selector, keeping the current
+    selection. The cursor carries the extracted keyword, so this is one
+    search call (or a cache hit) and no GPT call.
+    """
+    cursor = session.get("next_cursor")
+    if not cursor:
+        return gr.update(), gr.update(), "ℹ️ No more results.", session
+    with trace(), span("load_more"):
+        try:
+            papers, next_cursor, error = find_papers("", cursor)
+        except Exception as e:
+            return gr.update(), gr.update(), f"⚠️ Request failed: {str(e)}", session
+        if error:
+            return gr.update(), gr.update(), f"⚠️ {error}", session
+
+        added = add_papers(session, papers)
+        session["next_cursor"] = next_cursor
+        if added:
+            session["prefetch_batch"] = prefetcher.schedule(added, supersedes=session.get("prefetch_batch"))
+
+    status = f"✅ Selected papers: {len(session['selected_paper_ids'])} · {len(added)} more results loaded"
+    return (
+        gr.update(choices=paper_choices(session["cached_papers"]), value=session["selected_paper_ids"]),
+        pdf_links_box(session["cached_papers"]),
+        status,
+        session
+    )
+
+def update_selection(selected_ids, session):
+    # Choices are (label, paper ID) pairs, so the selector already returns IDs
+    session["selected_paper_ids"] = [pid for pid in selected_ids if pid in session["paper_title_map"]]
+    return f"✅ Selected papers: {len(session['selected_paper_ids'])}", session
+
+def job_html(job):
+    """Progress line (while unfinished), the result so far and the job ID to fetch it again later."""
+    footer = f"<p style='color: #94a3b8;'>Job ID: {job['id']}</p>"
+    if job["status"] == FAILED:
+        # Submitting the same selection again starts a new run
+        return f"<div style='color:red;'>❌ Job failed: {html.escape(job['error'] or 'unknown error')}</div>" + (job["result"] or "") + footer
+    if job["status"] == DONE:
+        return (job["result"] or "") + footer
+    if job["status"] == QUEUED:
+        status = "⏳ Waiting for a free worker..."
+    else:
+        status = f"⏳ Working... {job['done']} of {job['total']} steps done" if job["total"] else "⏳ Working..."
+    return f"<p>{status}</p>" + (job["result"] or "") + footer
 
-def guarded_compare():
+def follow_job(job_id):
+    """
+    Returns the job's current HTML, the job ID to keep following (None once it
+    has finished) and the poll timer, active while the job is unfinished. Each
+    call is a single read, so no worker waits on a running job; the browser
+    polls again on the next timer tick. Closing the tab only stops following;
+    the job keeps running in the job queue.
+    """
+    if not job_id:
+        return gr.update(), None, gr.Timer(active=False)
+    job = get_job_queue().get(job_id.strip())
+    if job is None:
+        return "<div style='color:red;'>⚠️ No job with that ID.</div>", None, gr.Timer(active=False)
+    if job["status"] in (DONE, FAILED):
+        return job_html(job), None, gr.Timer(active=False)
+    return job_html(job), job["id"], gr.Timer(active=True)
+
+def stop_following():
+    """Stops polling the followed job, for actions that take over the details pane."""
+    return None, gr.Timer(active=False)
+
+def guarded_compare(session):
+    selected_paper_ids = session["selected_paper_ids"]
     if len(selected_paper_ids) < 2:
-        return "<div style='color:red;'>⚠️ Please select at least <b>2 papers</b> to compare.</div>"
-    return compare_papers(selected_paper_ids, paper_title_map)
+        return ("<div style='color:red;'>⚠️ Please select at least <b>2 papers</b> to compare.</div>",) + stop_following()
+    # Runs in the job queue; the pane follows its progress on each timer tick
+    return follow_job(submit_job("compare", selected_paper_ids, session["paper_title_map"]))
 
-def guarded_summary():
+def guarded_summary(session):
+    selected_paper_ids = session["selected_paper_ids"]
     if not selected_paper_ids:
-        return "<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to summarize.</div>"
-    return summarize_papers(selected_paper_ids, paper_title_map)
+        return ("<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to summarize.</div>",) + stop_following()
+    return follow_job(submit_job("summary", selected_paper_ids, session["paper_title_map"]))
 
-def guarded_bibtex():
+def guarded_bibtex(session):
+    selected_paper_ids = session["selected_paper_ids"]
     if not selected_paper_ids:
-        return "<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to generate BibTeX.</div>"
-    return get_bibtex(selected_paper_ids, paper_title_map, cached_papers)
+        return ("<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to generate BibTeX.</div>",) + stop_following()
+    return follow_job(submit_job("bibtex", selected_paper_ids, session["paper_title_map"], session["cached_papers"]))
 
-def guarded_citations():
+def guarded_citations(session):
+    selected_paper_ids = session["selected_paper_ids"]
+    if not selected_paper_ids:
+        return "<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to get citation contexts.</div>", session
+    citations_html, offsets = get_citations_page(selected_paper_ids, session["paper_title_map"])
+    session["citation_paper_ids"] = list(selected_paper_ids)
+    session["citations_html"] = citations_html
+    session["citation_offsets"] = offsets
+    return format_citations_box(citations_html), session
+
+def more_citations(session):
+    """Appends the next page of citations for the papers shown by the last "Get Citations"."""
+    if session["citation_paper_ids"] != session["selected_paper_ids"]:
+        return guarded_citations(session)  # Selection changed; start from the first page
+    offsets = session["citation_offsets"]
+    if all(offsets.get(pid) is None for pid in session["citation_paper_ids"]):
+        return format_citations_box(session["citations_html"] + "<p>No more citations.</p>"), session
+    citations_html, offsets = get_citations_page(session["citation_paper_ids"], session["paper_title_map"], offsets)
+    session["citations_html"] += citations_html
+    session["citation_offsets"] = offsets
+    return format_citations_box(session["citations_html"]), session
+
+def guarded_related(session):
+    selected_paper_ids = session["selected_paper_ids"]
     if not selected_paper_ids:
-        return "<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to get citation contexts.</div>"
-    return get_citations(selected_paper_ids, paper_title_map)
+        return "<div style='color:red;'>⚠️ Please select at least <b>1 paper</b> to explore its citation graph.</div>"
+    return get_related_papers(selected_paper_ids, session["paper_title_map"])
 
-def select_paper(paper_id):
+def select_paper(paper_id, session):
+    selected_paper_ids = session["selected_paper_ids"]
     if paper_id in selected_paper_ids:
         selected_paper_ids.remove(paper_id)
     else:
         selected_paper_ids.append(paper_id)
-    return f"✅ Selected papers: {len(selected_paper_ids)}"
+    return f"✅ Selected papers: {len(selected_paper_ids)}", session
 
 # For now, we leave other action functions as placeholders.
 def action_placeholder():
     return "Other actions not implemented yet."
 
 with gr.Blocks() as demo:
+    # Per-session search results and selection
+    session_state = gr.State(new_session())
+    # Job shown in the details pane while it runs, polled by the timer
+    job_state = gr.State(None)
+    job_timer = gr.Timer(JOB_POLL_INTERVAL, active=False)
+
     with gr.Row():
         # Left Column: Search and action buttons.
         with gr.Column(scale=1):
@@ -196,6 +290,7 @@ with gr.Blocks() as demo:
             upload_file = gr.File(label="Upload Document - .pdf, .docx, .txt (optional)")
             search_button = gr.Button("Search")
             paper_selector = gr.CheckboxGroup(choices=[], label="Select Papers", interactive=True)
+            load_more_button = gr.Button("Load More Papers")
 
             selected_display = gr.Markdown("✅ Selected papers: 0")
 
@@ -221,6 +316,12 @@ with gr.Blocks() as demo:
                 btn_summary = gr.Button("Explain Papers")
                 btn_bibtex = gr.Button("Get BibTeX Reference")
                 btn_compare = gr.Button("Compare Papers")
+            with gr.Row():
+                btn_more_citations = gr.Button("More Citations")
+                btn_related = gr.Button("Explore Citation Graph")
+            with gr.Row():
+                job_id_input = gr.Textbox(label="Job ID", placeholder="Paste a job ID to show its result")
+                btn_job = gr.Button("Show Job")
             
             details_html = gr.HTML(
                 "<div style='border: 2px solid #333; padding: 10px; height: 90vh; overflow-y: auto;'>Detailed Results will appear here.</div>",
@@ -231,22 +332,39 @@ with gr.Blocks() as demo:
     # Wire up the search button.
     search_button.click(
         fn=search_and_update,
-        inputs=[query_input, upload_file],
-        outputs=[paper_selector, pdf_links_display]
+        inputs=[query_input, upload_file, session_state],
+        outputs=[paper_selector, pdf_links_display, session_state]
+    )
+
+    load_more_button.click(
+        fn=load_more,
+        inputs=[session_state],
+        outputs=[paper_selector, pdf_links_display, selected_display, session_state]
     )
 
     paper_selector.change(
         fn=update_selection,
-        inputs=[paper_selector],
-        outputs=[selected_display]
+        inputs=[paper_selector, session_state],
+        outputs=[selected_display, session_state]
     )
         
     # Wire up the "Get Citations" button.
-    btn_citations.click(fn=guarded_citations, inputs=[], outputs=details_html)
+    btn_citations.click(fn=guarded_citations, inputs=[session_state], outputs=[details_html, session_state])
+    btn_more_citations.click(fn=more_citations, inputs=[session_state], outputs=[details_html, session_state])
+    btn_related.click(fn=guarded_related, inputs=[session_state], outputs=details_html)
+    for button in (btn_citations, btn_more_citations, btn_related):
+        button.click(fn=stop_following, outputs=[job_state, job_timer])
     
     # Other buttons remain placeholders for now.
-    btn_summary.click(fn=guarded_summary, inputs=[], outputs=details_html)
-    btn_bibtex.click(fn=guarded_bibtex, inputs=[], outputs=details_html)
-    btn_compare.click(fn=guarded_compare, inputs=[], outputs=details_html)
-    
+    job_outputs = [details_html, job_state, job_timer]
+    btn_summary.click(fn=guarded_summary, inputs=[session_state], outputs=job_outputs)
+    btn_bibtex.click(fn=guarded_bibtex, inputs=[session_state], outputs=job_outputs)
+    btn_compare.click(fn=guarded_compare, inputs=[session_state], outputs=job_outputs)
+    btn_job.click(fn=follow_job, inputs=[job_id_input], outputs=job_outputs)
+    job_timer.tick(fn=follow_job, inputs=[job_state], outputs=job_outputs, show_progress="hidden")
+
+# State is per session, so handlers from different users can run concurrently
+logging.basicConfig(level=LOG_LEVEL)
+start_metrics_server(FRONTEND_METRICS_PORT)  # Spans for file/keyword extraction and GPT calls
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT)
 demo.launch(share=True)
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Keep the caches, indexes and job table the app opens on import out of the repo
+_state_dir = tempfile.mkdtemp(prefix="research-tests-")
+for name, file_name in (("CACHE_PATH", "responses.sqlite3"), ("LLM_CACHE_PATH", "llm.sqlite3"),
+                        ("LOCAL_INDEX_PATH", "papers.sqlite3"), ("CITATION_GRAPH_PATH", "citations.sqlite3"),
+                        ("JOBS_PATH", "jobs.sqlite3"), ("PROFILE_DIR", "profiles")):
+    os.environ[name] = os.path.join(_state_dir, file_name)
+os.environ["PREFETCH_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+import time
+
+from api.jobs import DONE, JobQueue
+
+def wait_for(queue, job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job is not None and job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+def test_finished_jobs_are_deleted_after_result_ttl(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1, result_ttl=0.2)
+    queue.register("echo", lambda params, progress: params["text"])
+    old = queue.submit("echo", ["a"], {"text": "old"})
+    wait_for(queue, old, DONE)
+
+    time.sleep(0.3)
+    recent = queue.submit("echo", ["b"], {"text": "recent"})
+    assert queue.get(old) is None
+    assert wait_for(queue, recent, DONE)["result"] == "recent"
@@ -0,0 +1,39 @@
+import pytest
+
+from api import keyword_extraction
+from api.local_keywords import extract_keywords_local
+
+@pytest.mark.parametrize("query, expected", [
+    ("AR and VR", "augmented reality virtual reality"),
+    ("reinforcement learning for robotics, not deep learning", "reinforcement learning robotics"),
+    ("graph neural networks for drug discovery", "graph neural networks drug discovery"),
+])
+def test_whole_phrases_are_kept(query, expected):
+    assert extract_keywords_local(query) == (expected, len(expected.split()), False)
+
+@pytest.mark.parametrize("query, max_words", [
+    ("papers about transformers without attention", 6),  # Single word left after the negation
+    ("NLP for legal documents", 2),  # Expansion cut to fit
+    ("without attention", 6),  # Nothing left
+])
+def test_degenerate_results_are_partial(query, max_words):
+    _, _, partial = extract_keywords_local(query, max_words=max_words)
+    assert partial
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+    def fake_llm(text):
+        calls.append(text)
+        return "llm keyword"
+    monkeypatch.setattr(keyword_extraction, "extract_keyword_llm", fake_llm)
+    return calls
+
+def test_hybrid_keeps_clean_local_result(llm_calls):
+    assert keyword_extraction.extract_keyword_hybrid("AR and VR") == "augmented reality virtual reality"
+    assert llm_calls == []
+
+def test_hybrid_sends_degenerate_result_to_llm(llm_calls):
+    query = "papers about transformers without attention"
+    assert keyword_extraction.extract_keyword_hybrid(query) == "llm keyword"
+    assert llm_calls == [query]
@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+import pytest
+
+import asgi_app
+from api import paper_search
+from api.pagination import decode_cursor
+from api.paper import Paper
+from app import app
+
+class LocalIndex:
+    """Answers every lookup with the same few papers, as a confident local index would."""
+
+    def __init__(self, count):
+        self.papers = [Paper.from_dict({"id": f"local{i}", "title": f"Local paper {i}"}) for i in range(count)]
+
+    def lookup(self, query):
+        return self.papers
+
+@pytest.fixture
+def local_answers(monkeypatch):
+    def answer(count):
+        monkeypatch.setattr(paper_search, "LOCAL_INDEX_MODE", "first")
+        monkeypatch.setattr(paper_search, "get_local_index", lambda: LocalIndex(count))
+        monkeypatch.setattr(paper_search, "refresh_in_background", lambda query: None)
+    return answer
+
+def flask_page(query):
+    response = app.test_client().post("/chatbot", json={"message": query, "papers_only": True})
+    assert response.status_code == 200
+    return response.get_json()
+
+def asgi_page(query):
+    async def post():
+        asgi_app.state["backpressure"] = asgi_app.Backpressure()
+        asgi_app.state["upstream"] = None  # Never reached: the local index answers
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/chatbot", json={"message": query, "papers_only": True})
+
+    response = asyncio.run(post())
+    assert response.status_code == 200
+    return response.json()
+
+@pytest.mark.parametrize("count", [3, 10])
+def test_local_answer_cursor_matches_flask(local_answers, count):
+    local_answers(count)
+    query = "graph neural networks"
+
+    flask, asgi = flask_page(query), asgi_page(query)
+
+    assert [p["id"] for p in asgi["papers"]] == [p["id"] for p in flask["papers"]]
+    assert asgi["next_cursor"] == flask["next_cursor"]
+    # "Load more" continues with the API's first page, whatever the local hit count
+    assert decode_cursor(asgi["next_cursor"]) == {"query": query, "offset": 0}